@@ -27,13 +27,18 @@ def create_app(config_object='config.Config'):
     @app.context_processor
     def inject_invoice_alerts():
         """Inject invoice alert counts into all templates."""
+        from app.services.invoice_alerts_service import EMPTY_INVOICE_ALERTS
+        
+        # HTMX partials never render the navbar: skip the lookup entirely
+        if request.headers.get('HX-Request'):
+            return {'invoice_alerts': EMPTY_INVOICE_ALERTS}
+        
         try:
             from app.database import get_session
-            from app.services.invoice_alerts_service import get_invoice_alert_counts
-            from datetime import date
+            from app.services.invoice_alerts_service import get_cached_invoice_alert_counts
             
             db_session = get_session()
-            alerts = get_invoice_alert_counts(db_session, date.today())
+            alerts = get_cached_invoice_alert_counts(db_session)
             return {'invoice_alerts': alerts}
         except Exception as e:
             # If there's any error (e.g., DB not ready), rollback and return empty alerts
@@ -42,7 +47,7 @@ def create_app(config_object='config.Config'):
             except Exception:
                 pass  # Ignore rollback errors if session is already closed
             current_app.logger.warning(f"Error loading invoice alerts: {e}")
-            return {'invoice_alerts': {'due_tomorrow_count': 0, 'overdue_count': 0, 'total_critical': 0}}
+            return {'invoice_alerts': EMPTY_INVOICE_ALERTS}
     
     # Register blueprints
     from app.blueprints.auth import auth_bp
@@ -55,6 +60,7 @@ def create_app(config_object='config.Config'):
     from app.blueprints.settings import settings_bp
     from app.blueprints.quotes import quotes_bp  # MEJORA 13
     from app.blueprints.missing_products import missing_products_bp  # MEJORA 18
+    from app.blueprints.stock_count import stock_count_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
@@ -66,6 +72,11 @@ def create_app(config_object='config.Config'):
     app.register_blueprint(settings_bp)
     app.register_blueprint(quotes_bp)  # MEJORA 13
     app.register_blueprint(missing_products_bp)  # MEJORA 18
+    app.register_blueprint(stock_count_bp)
+    
+    # Maintenance CLI commands (flask <command>)
+    from app.commands import register_commands
+    register_commands(app)
     
     # MEJORA 8: Password protection middleware
     @app.before_request
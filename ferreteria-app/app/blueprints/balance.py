@@ -1,6 +1,9 @@
 """Balance blueprint for financial reporting."""
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, Response, stream_with_context
 from datetime import datetime, date
+import csv
+import io
+from sqlalchemy import tuple_
 from decimal import Decimal
 import decimal
 from app.database import get_session
@@ -8,7 +11,7 @@ from app.models import FinanceLedger, LedgerType, LedgerReferenceType, PaymentMe
 from app.services.balance_service import (
     get_balance_series, get_default_date_range, get_totals,
     get_available_years, get_available_months, get_month_date_range,
-    get_year_date_range, get_inventory_valuation, get_current_total_balance  # AGREGADO saldo
+    get_year_date_range, get_inventory_valuation_summary, get_current_balances  # AGREGADO saldo
 )
 
 balance_bp = Blueprint('balance', __name__, url_prefix='/balance')
@@ -200,7 +203,10 @@ def index():
         totals = get_totals(series)
         
         # MEJORA C: Get inventory valuation (Goodwill)
-        goodwill = get_inventory_valuation(db_session)
+        valuation = get_inventory_valuation_summary(db_session)
+        goodwill = valuation['sale_value']
+        goodwill_cost = valuation['cost_value']
+        goodwill_by_category = valuation['by_category']
         
         # Format dates for input fields
         start_str = start.strftime('%Y-%m-%d')
@@ -212,6 +218,8 @@ def index():
             series=series,
             totals=totals,
             goodwill=goodwill,  # MEJORA C
+            goodwill_cost=goodwill_cost,
+            goodwill_by_category=goodwill_by_category,
             start=start_str,
             end=end_str,
             available_years=available_years,
@@ -240,72 +248,206 @@ def index():
         )
 
 
+LEDGER_PER_PAGE = 100
+
+# Server-side cursor batch size for exports
+LEDGER_EXPORT_BATCH_SIZE = 1000
+
+
+def _parse_ledger_filters(args) -> dict:
+    """Read and validate the ledger list/export filters from request args."""
+    entry_type = args.get('type', '').upper()  # INCOME, EXPENSE
+    method = args.get('method', 'all').lower().strip()  # MEJORA 12
+    
+    return {
+        'entry_type': entry_type if entry_type in ['INCOME', 'EXPENSE'] else '',
+        'method': method if method in ['all', 'cash', 'transfer'] else 'all',
+        'start': args.get('start', '').strip(),
+        'end': args.get('end', '').strip()
+    }
+
+
+def _apply_ledger_filters(query, filters: dict):
+    """Apply ledger filters (and exclude soft-deleted rows) to a FinanceLedger query."""
+    query = query.filter(FinanceLedger.deleted_at.is_(None))
+    
+    # Filter by type
+    if filters['entry_type']:
+        query = query.filter(FinanceLedger.type == LedgerType[filters['entry_type']])
+    
+    # MEJORA 12: Filter by payment method
+    if filters['method'] == 'cash':
+        query = query.filter(FinanceLedger.payment_method == 'CASH')
+    elif filters['method'] == 'transfer':
+        query = query.filter(FinanceLedger.payment_method == 'TRANSFER')
+    # if 'all', no filter applied
+    
+    # Filter by date range
+    # MEJORA TZ: local (Argentina) dates are converted to UTC bounds so the
+    # comparison is on the raw column and uses idx_ledger_datetime
+    from app.utils.formatters import ar_date_to_utc_bounds
+    
+    def parse_date(value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+        except ValueError:
+            return None
+    
+    start_utc, end_utc = ar_date_to_utc_bounds(parse_date(filters['start']), parse_date(filters['end']))
+    
+    if start_utc:
+        query = query.filter(FinanceLedger.datetime >= start_utc)
+    
+    if end_utc:
+        query = query.filter(FinanceLedger.datetime < end_utc)
+    
+    return query
+
+
+def _parse_ledger_cursor(cursor: str):
+    """
+    Parse a keyset cursor '<iso datetime>_<id>' (last entry of the previous page).
+    
+    Returns:
+        tuple (datetime, ledger_id) or None if missing/invalid
+    """
+    if not cursor or '_' not in cursor:
+        return None
+    
+    dt_str, id_str = cursor.rsplit('_', 1)
+    if not id_str.isdigit():
+        return None
+    
+    try:
+        return datetime.fromisoformat(dt_str), int(id_str)
+    except ValueError:
+        return None
+
+
 @balance_bp.route('/ledger')
 def list_ledger():
-    """List all finance ledger entries for auditing."""
+    """List finance ledger entries for auditing (keyset pagination, infinite scroll)."""
     db_session = get_session()
     
     try:
-        # Get query params
-        entry_type = request.args.get('type', '').upper()  # INCOME, EXPENSE
-        start_str = request.args.get('start', '').strip()
-        end_str = request.args.get('end', '').strip()
-        method = request.args.get('method', 'all').lower().strip()  # MEJORA 12
-        
-        # Validate method
-        if method not in ['all', 'cash', 'transfer']:
+        if request.args.get('method', 'all').lower().strip() not in ['all', 'cash', 'transfer']:
             flash('Método de pago inválido. Mostrando todos.', 'info')
-            method = 'all'
-        
-        # Build query (exclude soft-deleted)
-        query = db_session.query(FinanceLedger).filter(FinanceLedger.deleted_at.is_(None))
         
-        # Filter by type
-        if entry_type and entry_type in ['INCOME', 'EXPENSE']:
-            query = query.filter(FinanceLedger.type == LedgerType[entry_type])
+        filters = _parse_ledger_filters(request.args)
         
-        # MEJORA 12: Filter by payment method
-        if method == 'cash':
-            query = query.filter(FinanceLedger.payment_method == 'CASH')
-        elif method == 'transfer':
-            query = query.filter(FinanceLedger.payment_method == 'TRANSFER')
-        # if 'all', no filter applied
+        # Keyset pagination (cursor = last entry of the previous page)
+        cursor = _parse_ledger_cursor(request.args.get('after', '').strip())
+        append_mode = request.args.get('append_mode') == 'true' and cursor is not None
         
-        # Filter by date range
-        # MEJORA TZ: Use local time for range comparison in DB
-        from sqlalchemy import func
-        local_dt_col = func.timezone('America/Argentina/Buenos_Aires', FinanceLedger.datetime)
-
-        if start_str:
-            try:
-                start_dt = datetime.strptime(start_str, '%Y-%m-%d')
-                query = query.filter(local_dt_col >= start_dt)
-            except ValueError:
-                pass
+        query = _apply_ledger_filters(db_session.query(FinanceLedger), filters)
         
-        if end_str:
-            try:
-                end_dt = datetime.strptime(end_str, '%Y-%m-%d')
-                end_dt = end_dt.replace(hour=23, minute=59, second=59)
-                query = query.filter(local_dt_col <= end_dt)
-            except ValueError:
-                pass
+        if cursor:
+            query = query.filter(tuple_(FinanceLedger.datetime, FinanceLedger.id) < tuple_(*cursor))
         
         # Order by datetime desc
-        entries = query.order_by(FinanceLedger.datetime.desc()).all()
+        entries = query.order_by(
+            FinanceLedger.datetime.desc(),
+            FinanceLedger.id.desc()
+        ).limit(LEDGER_PER_PAGE + 1).all()
+        
+        next_cursor = None
+        if len(entries) > LEDGER_PER_PAGE:
+            entries = entries[:LEDGER_PER_PAGE]
+            last = entries[-1]
+            next_cursor = f'{last.datetime.isoformat()}_{last.id}'
+        
+        is_htmx = request.headers.get('HX-Request') == 'true'
+        template = 'balance/_ledger_table.html' if is_htmx else 'balance/ledger_list.html'
         
         return render_template(
-            'balance/ledger_list.html',
+            template,
             entries=entries,
-            entry_type=entry_type,
-            selected_method=method,  # MEJORA 12
-            start=start_str,
-            end=end_str
+            entry_type=filters['entry_type'],
+            selected_method=filters['method'],  # MEJORA 12
+            start=filters['start'],
+            end=filters['end'],
+            next_cursor=next_cursor,
+            append_mode=append_mode
         )
         
     except Exception as e:
+        db_session.rollback()
         flash(f'Error al cargar libro mayor: {str(e)}', 'danger')
-        return render_template('balance/ledger_list.html', entries=[], entry_type='', start='', end='')
+        return render_template('balance/ledger_list.html', entries=[], entry_type='', start='', end='',
+                               selected_method='all', next_cursor=None, append_mode=False)
+
+
+@balance_bp.route('/ledger/export.csv')
+def export_ledger_csv():
+    """
+    Export the filtered ledger as CSV (streamed).
+    
+    Rows are read with a server-side cursor (yield_per) and written to the
+    response as they arrive, so memory stays flat regardless of the range.
+    Semicolon separator, decimal comma and UTF-8 BOM so it opens directly
+    in Excel with Argentine regional settings.
+    """
+    from app.utils.formatters import to_argentina
+    
+    db_session = get_session()
+    filters = _parse_ledger_filters(request.args)
+    
+    query = _apply_ledger_filters(
+        db_session.query(
+            FinanceLedger.id,
+            FinanceLedger.datetime,
+            FinanceLedger.type,
+            FinanceLedger.payment_method,
+            FinanceLedger.amount,
+            FinanceLedger.concept,
+            FinanceLedger.reference_type,
+            FinanceLedger.reference_id,
+            FinanceLedger.category,
+            FinanceLedger.notes
+        ),
+        filters
+    ).order_by(FinanceLedger.datetime, FinanceLedger.id).yield_per(LEDGER_EXPORT_BATCH_SIZE)
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        
+        def flush():
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return data
+        
+        yield '\ufeff'
+        writer.writerow(['ID', 'Fecha/Hora', 'Tipo', 'Método', 'Monto', 'Concepto',
+                         'Origen', 'Ref ID', 'Categoría', 'Notas'])
+        yield flush()
+        
+        for row in query:
+            writer.writerow([
+                row.id,
+                to_argentina(row.datetime).strftime('%Y-%m-%d %H:%M:%S'),
+                row.type.value,
+                row.payment_method,
+                str(row.amount).replace('.', ','),
+                row.concept,
+                row.reference_type.value,
+                row.reference_id or '',
+                row.category or '',
+                row.notes or ''
+            ])
+            # Send in chunks rather than one tiny write per row
+            if buffer.tell() > 64 * 1024:
+                yield flush()
+        
+        yield flush()
+    
+    filename = f"libro_mayor_{filters['start'] or 'inicio'}_{filters['end'] or 'hoy'}.csv"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 
 @balance_bp.route('/ledger/new', methods=['GET'])
@@ -316,8 +458,9 @@ def new_ledger():
     from app.utils.formatters import get_now_ar
     now_ar = get_now_ar()
     now_str = now_ar.strftime('%Y-%m-%dT%H:%M')
-    current_balance = get_current_total_balance(db_session)
-    return render_template('balance/ledger_form.html', now=now_str, current_balance=current_balance, is_edit=False)
+    current_balances = get_current_balances(db_session)
+    return render_template('balance/ledger_form.html', now=now_str, current_balance=current_balances['total'],
+                           current_balances=current_balances, is_edit=False)
 
 
 @balance_bp.route('/ledger/new', methods=['POST'])
@@ -428,12 +571,13 @@ def edit_ledger(ledger_id):
     dt_ar = to_argentina(ledger.datetime)
     now_str = dt_ar.strftime('%Y-%m-%dT%H:%M')
     
-    current_balance = get_current_total_balance(db_session)
+    current_balances = get_current_balances(db_session)
     
     return render_template('balance/ledger_form.html', 
                          ledger=ledger, 
                          now=now_str, 
-                         current_balance=current_balance,
+                         current_balance=current_balances['total'],
+                         current_balances=current_balances,
                          is_edit=True)
 
 
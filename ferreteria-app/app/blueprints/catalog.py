@@ -1,14 +1,31 @@
 """Catalog blueprint for products management."""
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import (
+    Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify,
+    Response, send_file, stream_with_context
+)
 from sqlalchemy import or_, func
 from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 import os
 from app.database import get_session
-from app.models import Product, ProductStock, UOM, Category, ProductUomPrice
+from app.models import Product, ProductStock, UOM, Category, ProductUomPrice, Supplier
 from app.services.stock_service import adjust_stock_to, get_recent_manual_adjustments
 from app.services.product_service import can_hard_delete_product, get_product_usage_summary
 from app.services.product_uom_service import create_or_update_uom_prices
+from app.services.product_search_service import build_product_search_filter
+from app.services.product_list_service import (
+    on_hand_expr, product_list_sort_keys, sort_keys_order, keyset_after,
+    count_products_cached, invalidate_product_counts
+)
+from app.services.product_lookup_service import invalidate_product, clear_product_lookup_cache
+from app.services.stock_history_service import get_stock_at_end_of_day
+from app.services.product_import_service import import_products, iter_products_csv, export_products_xlsx
+from app.services.price_update_service import (
+    ROUNDING_STEPS, build_price_rule, preview_price_update, apply_price_update, get_recent_price_updates
+)
+from app.services.reorder_service import (
+    get_reorder_report, get_reorder_suggestions, compute_reorder_suggestions
+)
 from app.utils.decimal_parser import parse_decimal_ar
 from decimal import Decimal
 import logging
@@ -21,6 +38,8 @@ catalog_bp = Blueprint('catalog', __name__, url_prefix='/products')
 ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png'}
 MAX_FILE_SIZE = 2 * 1024 * 1024  # 2MB
 
+PRODUCTS_PER_PAGE = 50
+
 
 def allowed_file(filename):
     """Check if file has allowed extension."""
@@ -74,16 +93,31 @@ def list_products():
         category_id = request.args.get('category_id', '').strip()
         stock_filter = request.args.get('stock_filter', '').strip()  # MEJORA 10
         
-        # Pagination parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = 50
-        append_mode = request.args.get('append_mode') == 'true'
-        
-        # Get all categories for the filter dropdown
-        categories = session.query(Category).order_by(Category.name).all()
-        
-        # Build query with left join to product_stock
-        query = session.query(Product).outerjoin(ProductStock)
+        # Keyset pagination (cursor = id of the last product of the previous page)
+        cursor = request.args.get('after', type=int)
+        append_mode = request.args.get('append_mode') == 'true' and cursor is not None
+        
+        # Get all categories for the filter dropdown (not needed for appended rows)
+        categories = [] if append_mode else session.query(Category).order_by(Category.name).all()
+        
+        # One query returning exactly the columns a list row shows
+        query = (
+            session.query(
+                Product.id,
+                Product.name,
+                Product.image_path,
+                Product.sale_price,
+                Product.min_stock_qty,
+                on_hand_expr().label('on_hand_qty'),
+                Category.name.label('category_name'),
+                UOM.name.label('uom_name'),
+                UOM.symbol.label('uom_symbol')
+            )
+            .select_from(Product)
+            .join(UOM, UOM.id == Product.uom_id)
+            .outerjoin(Category, Category.id == Product.category_id)
+            .outerjoin(ProductStock, ProductStock.product_id == Product.id)
+        )
         
         # Apply category filter if provided
         category_filter_applied = False
@@ -102,29 +136,19 @@ def list_products():
                 flash('ID de categoría inválido. Mostrando todos los productos.', 'warning')
                 category_id = ''  # Reset to show all
         
-        # Apply search filter if provided
-        if search_query:
-            search_filter = or_(
-                func.lower(Product.name).like(f'%{search_query.lower()}%'),
-                func.lower(Product.sku).like(f'%{search_query.lower()}%'),
-                func.lower(Product.barcode).like(f'%{search_query.lower()}%')
-            )
+        # Apply search filter if provided (trigram index, accent-insensitive)
+        search_filter = build_product_search_filter(search_query)
+        if search_filter is not None:
             query = query.filter(search_filter)
         
         # MEJORA 11: Apply stock filter if provided (using per-product min_stock_qty)
         if stock_filter:
             if stock_filter == 'out':
-                # Out of stock: stock <= 0 (including NULL treated as 0)
-                query = query.filter(
-                    func.coalesce(ProductStock.on_hand_qty, 0) <= 0
-                )
+                # Out of stock: stock <= 0 (idx_product_stock_out)
+                query = query.filter(ProductStock.stock_status == 'OUT')
             elif stock_filter == 'low':
-                # Low stock: 0 < stock <= min_stock_qty (only if min_stock_qty > 0)
-                query = query.filter(
-                    func.coalesce(ProductStock.on_hand_qty, 0) > 0,
-                    func.coalesce(Product.min_stock_qty, 0) > 0,
-                    func.coalesce(ProductStock.on_hand_qty, 0) <= func.coalesce(Product.min_stock_qty, 0)
-                )
+                # Low stock: 0 < stock <= min_stock_qty (idx_product_stock_low)
+                query = query.filter(ProductStock.stock_status == 'LOW')
             elif stock_filter == 'mayor_stock':
                 # Mayor stock: only products with stock > 0, sorted desc
                 query = query.filter(
@@ -135,20 +159,21 @@ def list_products():
                 flash('Filtro de stock inválido. Mostrando todos los productos.', 'info')
                 stock_filter = ''
         
-        import math
+        # The total is only shown on the first page
+        total_items = None
+        if not append_mode:
+            total_items = count_products_cached(query, search_query, category_id, stock_filter)
         
-        # Calculate pagination
-        total_items = query.count()
-        total_pages = math.ceil(total_items / per_page) if total_items > 0 else 1
+        sort_keys = product_list_sort_keys(stock_filter, search_query)
+        if cursor:
+            query = query.filter(keyset_after(sort_keys, cursor))
         
-        # Order by: if mayor_stock, sort by stock desc; otherwise by name
-        if stock_filter == 'mayor_stock':
-            products = query.order_by(
-                func.coalesce(ProductStock.on_hand_qty, 0).desc(),
-                Product.name
-            ).offset((page - 1) * per_page).limit(per_page).all()
-        else:
-            products = query.order_by(Product.name).offset((page - 1) * per_page).limit(per_page).all()
+        products = query.order_by(*sort_keys_order(sort_keys)).limit(PRODUCTS_PER_PAGE + 1).all()
+        
+        next_cursor = None
+        if len(products) > PRODUCTS_PER_PAGE:
+            products = products[:PRODUCTS_PER_PAGE]
+            next_cursor = products[-1].id
         
         # Check if request is from HTMX (live search)
         is_htmx = request.headers.get('HX-Request') == 'true'
@@ -161,9 +186,8 @@ def list_products():
                              categories=categories,
                              selected_category_id=category_id,
                              selected_stock_filter=stock_filter,
-                             page=page,
-                             total_pages=total_pages,
                              total_items=total_items,
+                             next_cursor=next_cursor,
                              append_mode=append_mode)
         
     except Exception as e:
@@ -187,9 +211,8 @@ def list_products():
                              categories=categories,
                              selected_category_id='',
                              selected_stock_filter='',
-                             page=1,
-                             total_pages=1,
                              total_items=0,
+                             next_cursor=None,
                              append_mode=False)
 
 
@@ -390,6 +413,7 @@ def create_product():
             return redirect(url_for('catalog.new_product_form'))
         
         session.commit()
+        invalidate_product_counts()
         
         # Note: product_stock is created automatically by database trigger (with qty=0)
         
@@ -634,6 +658,8 @@ def update_product(product_id):
             return redirect(url_for('catalog.list_products'))
         
         session.commit()
+        invalidate_product(product.id)  # Code, price or UOM prices may have changed
+        invalidate_product_counts()  # Category may have changed
         
         flash(f'Producto "{product.name}" actualizado exitosamente', 'success')
         return redirect(url_for('catalog.list_products'))
@@ -680,6 +706,7 @@ def toggle_active(product_id):
         
         product.active = not product.active
         session.commit()
+        invalidate_product(product.id)
         
         status = 'activado' if product.active else 'desactivado'
         flash(f'Producto "{product.name}" {status} exitosamente', 'success')
@@ -773,6 +800,8 @@ def delete_product(product_id):
             # Delete product (product_stock will be deleted automatically via cascade)
             session.delete(product)
             session.commit()
+            invalidate_product(product_id)
+            invalidate_product_counts()
             
             # If deletion succeeded, also delete the image file if exists
             if image_path:
@@ -859,6 +888,7 @@ def adjust_product_stock(product_id):
             new_qty=new_stock,
             notes=f'Ajuste manual desde edición de producto'
         )
+        invalidate_product(product_id)
         
         # Flash message with delta info
         delta = new_stock - current_stock
@@ -881,3 +911,277 @@ def adjust_product_stock(product_id):
         flash(f'Error al ajustar stock: {str(e)}', 'danger')
         return redirect(url_for('catalog.edit_product', product_id=product_id))
 
+
+
+@catalog_bp.route('/stock-at', methods=['GET'])
+def stock_at_date():
+    """
+    Stock per product at the close of a day (JSON), e.g. year-end inventory.
+    
+    Query params:
+        date: YYYY-MM-DD (Argentina local day)
+        product_id: Optional, may be repeated
+    """
+    from datetime import datetime
+    session = get_session()
+    
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Debe indicar una fecha válida (AAAA-MM-DD)'}), 400
+    
+    product_ids = request.args.getlist('product_id', type=int) or None
+    
+    try:
+        stock = get_stock_at_end_of_day(session, day, product_ids)
+        return jsonify({
+            'date': day.isoformat(),
+            'stock': [
+                {'product_id': product_id, 'on_hand_qty': str(qty)}
+                for product_id, qty in sorted(stock.items())
+            ]
+        })
+        
+    except Exception as e:
+        current_app.logger.error(f"Error computing stock at {day}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@catalog_bp.route('/reorder', methods=['GET'])
+def reorder_report():
+    """Products out of stock or below their minimum, grouped by last supplier."""
+    session = get_session()
+    status = request.args.get('status', '').strip().upper()
+    
+    try:
+        groups = get_reorder_report(session, status or None)
+        return render_template('products/reorder.html', groups=groups, status=status)
+        
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Error loading reorder report: {e}")
+        flash(f'Error al cargar el reporte de reposición: {str(e)}', 'danger')
+        return redirect(url_for('catalog.list_products'))
+
+
+@catalog_bp.route('/reorder/suggestions', methods=['GET'])
+def reorder_suggestions():
+    """Purchase suggestions by supplier (precomputed nightly from sales velocity)."""
+    session = get_session()
+    
+    try:
+        groups, computed_at = get_reorder_suggestions(session)
+        return render_template('products/reorder_suggestions.html',
+                             groups=groups,
+                             computed_at=computed_at,
+                             lead_time_days=current_app.config.get('REORDER_LEAD_TIME_DAYS', 7),
+                             cover_days=current_app.config.get('REORDER_COVER_DAYS', 30))
+        
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Error loading reorder suggestions: {e}")
+        flash(f'Error al cargar sugerencias de compra: {str(e)}', 'danger')
+        return redirect(url_for('catalog.reorder_report'))
+
+
+@catalog_bp.route('/reorder/suggestions/refresh', methods=['POST'])
+def refresh_reorder_suggestions():
+    """Recompute the purchase suggestions now (normally done nightly)."""
+    session = get_session()
+    
+    try:
+        count = compute_reorder_suggestions(session)
+        flash(f'Sugerencias recalculadas: {count} productos para comprar', 'success')
+        
+    except Exception as e:
+        current_app.logger.error(f"Error computing reorder suggestions: {e}")
+        flash(f'Error al recalcular sugerencias: {str(e)}', 'danger')
+    
+    return redirect(url_for('catalog.reorder_suggestions'))
+
+
+@catalog_bp.route('/import', methods=['GET'])
+def import_form():
+    """Bulk import / export screen."""
+    return render_template('products/import.html', result=None)
+
+
+@catalog_bp.route('/import', methods=['POST'])
+def import_products_file():
+    """Create or update products from a CSV / XLSX price list."""
+    session = get_session()
+    file = request.files.get('file')
+    
+    if not file or not file.filename:
+        flash('Seleccione un archivo para importar', 'danger')
+        return redirect(url_for('catalog.import_form'))
+    
+    encoding = 'latin-1' if request.form.get('encoding') == 'latin-1' else 'utf-8-sig'
+    
+    try:
+        result = import_products(
+            session,
+            file.stream,
+            file.filename,
+            encoding=encoding,
+            create_categories=request.form.get('create_categories') == 'on'
+        )
+        
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('catalog.import_form'))
+    
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Error importing products from {file.filename}: {e}")
+        flash(f'Error al importar productos: {str(e)}', 'danger')
+        return redirect(url_for('catalog.import_form'))
+    
+    finally:
+        clear_product_lookup_cache()  # Codes and prices may have changed
+        invalidate_product_counts()
+    
+    return render_template('products/import.html', result=result, filename=file.filename)
+
+
+@catalog_bp.route('/export', methods=['GET'])
+def export_products():
+    """Download the product list (CSV streamed, or XLSX)."""
+    session = get_session()
+    
+    if request.args.get('format') == 'xlsx':
+        try:
+            output = export_products_xlsx(session)
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('catalog.import_form'))
+        
+        return send_file(
+            output,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name='productos.xlsx'
+        )
+    
+    return Response(
+        stream_with_context(iter_products_csv(session)),
+        mimetype='text/csv; charset=utf-8',
+        headers={'Content-Disposition': 'attachment; filename=productos.csv'}
+    )
+
+
+def _price_update_form():
+    """
+    Read the bulk price update form (GET args or POST form).
+    
+    Returns:
+        (form, price_rule, criteria): raw values to refill the form, the
+        validated rule and the product selection
+    
+    Raises:
+        ValueError: If the rule or the filters are invalid
+    """
+    values = request.values
+    form = {
+        'rule': values.get('rule', 'PERCENT'),
+        'value': values.get('value', '').strip(),
+        'rounding_step': values.get('rounding_step', '0.01'),
+        'round_up': values.get('round_up') == 'on',
+        'category_id': values.get('category_id', '').strip(),
+        'supplier_id': values.get('supplier_id', '').strip(),
+        'q': values.get('q', '').strip(),
+        'include_inactive': values.get('include_inactive') == 'on'
+    }
+    
+    if not form['value']:
+        raise ValueError('Ingrese el porcentaje')
+    
+    price_rule = build_price_rule(
+        form['rule'],
+        parse_decimal_ar(form['value'], field_name='value'),
+        form['rounding_step'],
+        form['round_up']
+    )
+    
+    try:
+        criteria = {
+            'category_id': int(form['category_id']) if form['category_id'] else None,
+            'supplier_id': int(form['supplier_id']) if form['supplier_id'] else None,
+            'search_query': form['q'],
+            'include_inactive': form['include_inactive']
+        }
+    except ValueError:
+        raise ValueError('Filtro de categoría o proveedor inválido')
+    
+    return form, price_rule, criteria
+
+
+def _render_price_update(session, form, preview=None):
+    """Render the bulk price update screen."""
+    return render_template('products/price_update.html',
+                         form=form,
+                         preview=preview,
+                         categories=session.query(Category).order_by(Category.name).all(),
+                         suppliers=session.query(Supplier).order_by(Supplier.name).all(),
+                         rounding_steps=ROUNDING_STEPS,
+                         recent_updates=get_recent_price_updates(session))
+
+
+@catalog_bp.route('/prices', methods=['GET'])
+def price_update_form():
+    """Bulk price update screen (rule, product selection, recent updates)."""
+    session = get_session()
+    form = {'rule': 'PERCENT', 'rounding_step': '0.01', 'round_up': False}
+    return _render_price_update(session, form)
+
+
+@catalog_bp.route('/prices/preview', methods=['POST'])
+def preview_prices():
+    """Show the prices a bulk update would change (nothing is written)."""
+    session = get_session()
+    form = dict(request.form)
+    
+    try:
+        form, price_rule, criteria = _price_update_form()
+        preview = preview_price_update(session, price_rule, criteria)
+        if not preview['count']:
+            flash('Ningún precio cambia con esta regla y filtros', 'info')
+            preview = None
+        return _render_price_update(session, form, preview)
+        
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return _render_price_update(session, form)
+    
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Error previewing price update: {e}")
+        flash(f'Error al calcular la vista previa: {str(e)}', 'danger')
+        return _render_price_update(session, form)
+
+
+@catalog_bp.route('/prices/apply', methods=['POST'])
+def apply_prices():
+    """Apply a bulk price update (one transaction, recorded in price_history)."""
+    session = get_session()
+    form = dict(request.form)
+    
+    try:
+        form, price_rule, criteria = _price_update_form()
+        price_update = apply_price_update(
+            session, price_rule, criteria,
+            preview_token=request.form.get('preview_token', ''),
+            expected_count=request.form.get('expected_count', type=int)
+        )
+        clear_product_lookup_cache()  # Cached POS prices are stale
+        flash(f'Actualización #{price_update.id}: {price_update.item_count} precios modificados', 'success')
+        return redirect(url_for('catalog.price_update_form'))
+        
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return _render_price_update(session, form)
+    
+    except Exception as e:
+        current_app.logger.error(f"Error applying price update: {e}")
+        flash(f'Error al actualizar precios: {str(e)}', 'danger')
+        return _render_price_update(session, form)
@@ -4,13 +4,14 @@ from decimal import Decimal
 import decimal
 from datetime import datetime, date, timedelta
 import calendar
-from sqlalchemy import and_
+from sqlalchemy import and_, tuple_
+from sqlalchemy.orm import joinedload
 from app.database import get_session
 from app.models import PurchaseInvoice, Supplier, Product, InvoiceStatus, PurchaseInvoicePayment
 from sqlalchemy import func
 from app.services.invoice_service import create_invoice_with_lines, update_invoice_with_lines, delete_invoice
-from app.services.payment_service import pay_invoice, add_invoice_payment, get_invoice_balance
-from app.services.invoice_alerts_service import is_invoice_overdue
+from app.services.payment_service import pay_invoice, add_invoice_payment, get_invoice_balance, invoice_paid_subquery
+from app.services.invoice_alerts_service import is_invoice_overdue, invalidate_invoice_alerts
 from app.utils.number_format import parse_ar_number
 from app.utils.decimal_parser import parse_decimal_ar
 
@@ -58,9 +59,37 @@ def clear_invoice_draft():
     session.modified = True
 
 
+INVOICES_PER_PAGE = 50
+
+
+def _parse_invoice_cursor(cursor: str):
+    """
+    Parse a keyset cursor 'YYYY-MM-DD_<id>' (last invoice of the previous page).
+    
+    Returns:
+        tuple (invoice_date, invoice_id) or None if missing/invalid
+    """
+    if not cursor or '_' not in cursor:
+        return None
+    
+    date_str, id_str = cursor.split('_', 1)
+    if not id_str.isdigit():
+        return None
+    
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), int(id_str)
+    except ValueError:
+        return None
+
+
 @invoices_bp.route('/')
 def list_invoices():
-    """List all purchase invoices, ordered by due date."""
+    """
+    List purchase invoices, newest first (keyset pagination, infinite scroll).
+    
+    total_paid/balance come from one grouped payments subquery joined to the
+    page of invoices, so the whole page is a single query.
+    """
     db_session = get_session()
     
     try:
@@ -70,8 +99,25 @@ def list_invoices():
         search_query = request.args.get('q', '').strip()
         due_soon = request.args.get('due_soon', type=int)  # MEJORA 21
         overdue = request.args.get('overdue', type=int)  # MEJORA 21
+        balance_filter = request.args.get('balance', '').strip()
+        
+        # Keyset pagination (cursor = last invoice of the previous page)
+        cursor = _parse_invoice_cursor(request.args.get('after', '').strip())
+        append_mode = request.args.get('append_mode') == 'true' and cursor is not None
         
-        query = db_session.query(PurchaseInvoice)
+        paid = invoice_paid_subquery(db_session)
+        total_paid = func.coalesce(paid.c.total_paid, Decimal('0'))
+        balance = PurchaseInvoice.total_amount - total_paid
+        
+        query = (
+            db_session.query(
+                PurchaseInvoice,
+                total_paid.label('total_paid'),
+                balance.label('balance')
+            )
+            .outerjoin(paid, paid.c.invoice_id == PurchaseInvoice.id)
+            .options(joinedload(PurchaseInvoice.supplier))
+        )
         
         if supplier_id:
             query = query.filter(PurchaseInvoice.supplier_id == supplier_id)
@@ -100,45 +146,74 @@ def list_invoices():
                 )
             )
         
+        # Balance filters
+        if balance_filter == 'open':
+            # Saldo pendiente > 0
+            query = query.filter(balance > 0)
+        elif balance_filter == 'partial':
+            # Con adelantos pero sin cancelar
+            query = query.filter(total_paid > 0, balance > 0)
+        elif balance_filter == 'settled':
+            query = query.filter(balance <= 0)
+        else:
+            balance_filter = ''
+        
         # Search by invoice number
         if search_query:
             query = query.filter(PurchaseInvoice.invoice_number.ilike(f'%{search_query}%'))
         
-        # Order by invoice_date descending (newest first), then by created_at descending
-        invoices = query.order_by(
+        if cursor:
+            query = query.filter(
+                tuple_(PurchaseInvoice.invoice_date, PurchaseInvoice.id) < tuple_(*cursor)
+            )
+        
+        # Order by invoice_date descending (newest first), then by id descending
+        # (uses idx_invoice_date_id)
+        rows = query.order_by(
             PurchaseInvoice.invoice_date.desc(),
-            PurchaseInvoice.created_at.desc()
-        ).all()
+            PurchaseInvoice.id.desc()
+        ).limit(INVOICES_PER_PAGE + 1).all()
+        
+        has_more = len(rows) > INVOICES_PER_PAGE
+        rows = rows[:INVOICES_PER_PAGE]
         
         # MEJORA 21: Calculate "overdue" status for each invoice
-        # MEJORA B: Calculate balance (total_paid, balance) for each invoice
+        # MEJORA B: total_paid / balance computed in SQL
         from app.utils.formatters import get_now_ar
         today = get_now_ar().date()
-        for invoice in invoices:
+        invoices = []
+        for invoice, invoice_total_paid, invoice_balance in rows:
             invoice.is_overdue = is_invoice_overdue(invoice, today)
-            
-            # Use unified balance service
-            balance_info = get_invoice_balance(invoice.id, db_session)
-            invoice.total_paid = balance_info['total_paid']
-            invoice.balance = balance_info['balance']
+            invoice.total_paid = invoice_total_paid
+            invoice.balance = invoice_balance
+            invoices.append(invoice)
         
-        # Get suppliers for filter
-        suppliers = db_session.query(Supplier).order_by(Supplier.name).all()
+        next_cursor = None
+        if has_more and invoices:
+            last = invoices[-1]
+            next_cursor = f"{last.invoice_date.strftime('%Y-%m-%d')}_{last.id}"
         
-        # Check if HTMX request (live search)
+        # Check if HTMX request (live search / infinite scroll)
         is_htmx = request.headers.get('HX-Request') == 'true'
         template = 'invoices/_list_table.html' if is_htmx else 'invoices/list.html'
         
+        # Get suppliers for filter (full page only)
+        suppliers = [] if is_htmx else db_session.query(Supplier).order_by(Supplier.name).all()
+        
         return render_template(template,
                              invoices=invoices,
                              suppliers=suppliers,
                              selected_supplier=supplier_id,
                              selected_status=status,
+                             selected_balance=balance_filter,
                              search_query=search_query,
                              due_soon=due_soon,
-                             overdue=overdue)
+                             overdue=overdue,
+                             next_cursor=next_cursor,
+                             append_mode=append_mode)
         
     except Exception as e:
+        db_session.rollback()
         flash(f'Error al cargar boletas: {str(e)}', 'danger')
         
         is_htmx = request.headers.get('HX-Request') == 'true'
@@ -149,9 +224,12 @@ def list_invoices():
                              suppliers=[],
                              selected_supplier=None,
                              selected_status='',
+                             selected_balance='',
                              search_query='',
                              due_soon=None,
-                             overdue=None)
+                             overdue=None,
+                             next_cursor=None,
+                             append_mode=False)
 
 
 @invoices_bp.route('/<int:invoice_id>')
@@ -296,6 +374,7 @@ def update_due_date(invoice_id):
                 
                 invoice.due_date = new_due_date
                 db_session.commit()
+                invalidate_invoice_alerts()
                 
                 flash(f'Fecha de vencimiento actualizada a {new_due_date.strftime("%d/%m/%Y")}', 'success')
                 
@@ -305,6 +384,7 @@ def update_due_date(invoice_id):
             # Allow clearing due_date
             invoice.due_date = None
             db_session.commit()
+            invalidate_invoice_alerts()
             flash('Fecha de vencimiento eliminada', 'success')
         
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice_id))
@@ -1,67 +1,141 @@
 """Quotes blueprint for presupuesto management."""
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, current_app, jsonify
 from datetime import datetime, date
 from decimal import Decimal
-from sqlalchemy import or_, func
+from sqlalchemy import tuple_
 from app.database import get_session
 from app.models import Quote, QuoteLine, Product
 from app.services.quote_service import (
     create_quote_from_cart,
-    generate_quote_pdf_from_db,
     convert_quote_to_sale,
-    update_quote
+    update_quote,
+    quote_expired_expr,
+    build_quote_search_filter
 )
+from app.services.pdf_jobs import (
+    submit_quote_pdf, prepare_quote_pdf, queue_quote_pdf, get_job_status, get_job_path,
+    parse_job_id, wait_for_job, job_etag
+)
+from app.services.cart_store import get_cart_store, get_cart_id
 
 quotes_bp = Blueprint('quotes', __name__, url_prefix='/quotes')
 
 
 def get_cart():
-    """Get cart from session."""
-    if 'cart' not in session:
-        session['cart'] = {'items': {}}
-    return session['cart']
+    """Get the current POS cart from the cart store."""
+    return get_cart_store().get_cart(get_cart_id())
+
+
+def get_business_info():
+    """Business info printed on quote PDFs (from config)."""
+    return {
+        'name': current_app.config.get('BUSINESS_NAME', 'Ferretería'),
+        'address': current_app.config.get('BUSINESS_ADDRESS', ''),
+        'phone': current_app.config.get('BUSINESS_PHONE', ''),
+        'email': current_app.config.get('BUSINESS_EMAIL', ''),
+        'valid_days': current_app.config.get('QUOTE_VALID_DAYS', 7)
+    }
+
+
+def send_quote_pdf(quote, job_id, max_age=0):
+    """
+    Send a rendered quote PDF as a download.
+    
+    The ETag is the content hash, so If-None-Match gets a 304 while the
+    quote is unchanged.
+    """
+    return send_file(
+        get_job_path(job_id),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f"presupuesto_{quote.quote_number}.pdf",
+        etag=job_etag(job_id),
+        conditional=True,
+        max_age=max_age
+    )
+
+
+QUOTES_PER_PAGE = 50
+
+QUOTE_STATUS_FILTERS = ('DRAFT', 'SENT', 'ACCEPTED', 'CANCELED', 'EXPIRED')
+
+
+def _parse_quote_cursor(cursor: str):
+    """
+    Parse a keyset cursor '<iso datetime>_<id>' (last quote of the previous page).
+    
+    Returns:
+        tuple (datetime, quote_id) or None if missing/invalid
+    """
+    if not cursor or '_' not in cursor:
+        return None
+    
+    dt_str, id_str = cursor.rsplit('_', 1)
+    if not id_str.isdigit():
+        return None
+    
+    try:
+        return datetime.fromisoformat(dt_str), int(id_str)
+    except ValueError:
+        return None
 
 
 @quotes_bp.route('/')
 def list_quotes():
-    """List all quotes with filters."""
+    """
+    List quotes, newest first (keyset pagination, infinite scroll).
+    
+    Status/expired filter, search (trigram indexes) and the expired flag
+    are all computed in SQL.
+    """
     db_session = get_session()
     
     try:
+        from app.utils.formatters import get_now_ar
+        today = get_now_ar().date()
+        
         # Get query params
         status_filter = request.args.get('status', '').upper()
         search = request.args.get('q', '').strip()
         
-        # Build query
-        query = db_session.query(Quote)
+        # Keyset pagination (cursor = last quote of the previous page)
+        cursor = _parse_quote_cursor(request.args.get('after', '').strip())
+        append_mode = request.args.get('append_mode') == 'true' and cursor is not None
+        
+        expired = quote_expired_expr(today)
+        query = db_session.query(Quote, expired.label('display_expired'))
         
-        # Filter by status
-        if status_filter and status_filter in ['DRAFT', 'SENT', 'ACCEPTED', 'CANCELED']:
+        # Filter by status (EXPIRED = DRAFT/SENT past valid_until)
+        if status_filter == 'EXPIRED':
+            query = query.filter(expired)
+        elif status_filter in QUOTE_STATUS_FILTERS:
             query = query.filter(Quote.status == status_filter)
+        else:
+            status_filter = ''
         
         # MEJORA 14: Search by quote_number, customer_name, or customer_phone
-        if search:
-            query = query.filter(
-                or_(
-                    Quote.quote_number.ilike(f'%{search}%'),
-                    Quote.customer_name.ilike(f'%{search}%'),
-                    Quote.customer_phone.ilike(f'%{search}%')
-                )
-            )
+        search_filter = build_quote_search_filter(search)
+        if search_filter is not None:
+            query = query.filter(search_filter)
+        
+        if cursor:
+            query = query.filter(tuple_(Quote.issued_at, Quote.id) < tuple_(*cursor))
         
         # Order by most recent first
-        quotes = query.order_by(Quote.issued_at.desc()).all()
+        rows = query.order_by(Quote.issued_at.desc(), Quote.id.desc()).limit(QUOTES_PER_PAGE + 1).all()
         
-        # Calculate "expired" status for display
-        from app.utils.formatters import get_now_ar
-        today = get_now_ar().date()
-        for quote in quotes:
-            if quote.status in ['DRAFT', 'SENT'] and quote.valid_until and today > quote.valid_until:
-                quote.display_expired = True
-            else:
-                quote.display_expired = False
+        next_cursor = None
+        if len(rows) > QUOTES_PER_PAGE:
+            rows = rows[:QUOTES_PER_PAGE]
+            last = rows[-1].Quote
+            next_cursor = f'{last.issued_at.isoformat()}_{last.id}'
         
-        # Check if HTMX request (live search)
+        quotes = []
+        for quote, display_expired in rows:
+            quote.display_expired = display_expired
+            quotes.append(quote)
+        
+        # Check if HTMX request (live search / infinite scroll)
         is_htmx = request.headers.get('HX-Request') == 'true'
         template = 'quotes/_list_table.html' if is_htmx else 'quotes/list.html'
         
@@ -69,10 +143,13 @@ def list_quotes():
             template,
             quotes=quotes,
             status_filter=status_filter,
-            search=search
+            search=search,
+            next_cursor=next_cursor,
+            append_mode=append_mode
         )
         
     except Exception as e:
+        db_session.rollback()
         flash(f'Error al cargar presupuestos: {str(e)}', 'danger')
         
         is_htmx = request.headers.get('HX-Request') == 'true'
@@ -145,8 +222,7 @@ def create_from_cart():
         )
         
         # Clear cart
-        session['cart'] = {'items': {}}
-        session.modified = True
+        get_cart_store().clear(get_cart_id())
         
         flash(f'Presupuesto creado exitosamente.', 'success')
         return redirect(url_for('quotes.view_quote', quote_id=quote_id))
@@ -162,7 +238,13 @@ def create_from_cart():
 
 @quotes_bp.route('/<int:quote_id>/pdf')
 def download_pdf(quote_id):
-    """Generate and download PDF for a quote."""
+    """
+    Download the PDF of a quote (fallback without JavaScript).
+    
+    Served from the PDF cache when possible (304 if the client's ETag still
+    matches); otherwise waits for the render in the PDF pool (see
+    app.services.pdf_jobs).
+    """
     db_session = get_session()
     
     try:
@@ -173,34 +255,99 @@ def download_pdf(quote_id):
             flash('Presupuesto no encontrado.', 'danger')
             return redirect(url_for('quotes.list_quotes'))
         
-        # Business info from config
-        business_info = {
-            'name': current_app.config.get('BUSINESS_NAME', 'Ferretería'),
-            'address': current_app.config.get('BUSINESS_ADDRESS', ''),
-            'phone': current_app.config.get('BUSINESS_PHONE', ''),
-            'email': current_app.config.get('BUSINESS_EMAIL', ''),
-            'valid_days': current_app.config.get('QUOTE_VALID_DAYS', 7)
-        }
+        prepared = prepare_quote_pdf(db_session, quote, get_business_info())
+        job_id = prepared[0]
         
-        # Generate PDF
-        pdf_buffer = generate_quote_pdf_from_db(quote_id, db_session, business_info)
+        # Client already has this exact PDF: answer before queueing a render
+        if request.if_none_match.contains(job_etag(job_id)):
+            return '', 304, {'ETag': f'"{job_etag(job_id)}"'}
         
-        # Generate filename
-        filename = f"presupuesto_{quote.quote_number}.pdf"
+        job_id = queue_quote_pdf(quote.id, prepared)
+        status = wait_for_job(job_id, current_app.config.get('PDF_RENDER_TIMEOUT', 30))
         
-        # Return PDF as download
-        return send_file(
-            pdf_buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename
-        )
+        if status != 'done':
+            raise Exception('No se pudo generar el PDF, intente nuevamente')
+        
+        return send_quote_pdf(quote, job_id)
         
     except Exception as e:
         flash(f'Error al generar PDF: {str(e)}', 'danger')
         return redirect(url_for('quotes.view_quote', quote_id=quote_id))
 
 
+def _pdf_job_response(quote_id, job_id, status):
+    """JSON body of the PDF job endpoints."""
+    body = {
+        'job_id': job_id,
+        'status': status,
+        'status_url': url_for('quotes.pdf_job_status', quote_id=quote_id, job_id=job_id)
+    }
+    if status == 'done':
+        body['download_url'] = url_for('quotes.pdf_job_download', quote_id=quote_id, job_id=job_id)
+    return jsonify(body), 200 if status == 'done' else 202
+
+
+@quotes_bp.route('/<int:quote_id>/pdf/jobs', methods=['POST'])
+def submit_pdf_job(quote_id):
+    """Queue the PDF render of a quote (JSON). Poll status_url until done."""
+    db_session = get_session()
+    
+    quote = db_session.query(Quote).filter_by(id=quote_id).first()
+    if not quote:
+        return jsonify({'error': 'Presupuesto no encontrado'}), 404
+    
+    try:
+        job_id = submit_quote_pdf(db_session, quote, get_business_info())
+        return _pdf_job_response(quote_id, job_id, get_job_status(job_id))
+        
+    except Exception as e:
+        current_app.logger.error(f"Error submitting PDF job for quote {quote_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@quotes_bp.route('/<int:quote_id>/pdf/jobs/<job_id>')
+def pdf_job_status(quote_id, job_id):
+    """
+    Status of a PDF job (JSON).
+    
+    A job unknown to this worker (submitted by another one) is resubmitted,
+    for the current version of the quote.
+    """
+    if parse_job_id(job_id) != quote_id:
+        return jsonify({'error': 'Trabajo de PDF inválido'}), 404
+    
+    status = get_job_status(job_id)
+    if status == 'failed':
+        return jsonify({'job_id': job_id, 'status': status, 'error': 'No se pudo generar el PDF'}), 500
+    
+    if status == 'unknown':
+        db_session = get_session()
+        quote = db_session.query(Quote).filter_by(id=quote_id).first()
+        if not quote:
+            return jsonify({'error': 'Presupuesto no encontrado'}), 404
+        job_id = submit_quote_pdf(db_session, quote, get_business_info())
+        status = get_job_status(job_id)
+    
+    return _pdf_job_response(quote_id, job_id, status)
+
+
+@quotes_bp.route('/<int:quote_id>/pdf/jobs/<job_id>/download')
+def pdf_job_download(quote_id, job_id):
+    """Download the PDF rendered by a finished job."""
+    db_session = get_session()
+    
+    if parse_job_id(job_id) != quote_id or get_job_status(job_id) != 'done':
+        return redirect(url_for('quotes.download_pdf', quote_id=quote_id))
+    
+    quote = db_session.query(Quote).filter_by(id=quote_id).first()
+    if not quote:
+        flash('Presupuesto no encontrado.', 'danger')
+        return redirect(url_for('quotes.list_quotes'))
+    
+    # The job id is content-addressed: its file never changes
+    return send_quote_pdf(quote, job_id, max_age=86400)
+
+
 @quotes_bp.route('/<int:quote_id>/convert/preview')
 def convert_to_sale_preview(quote_id):
     """Preview quote conversion details before confirmation (HTMX modal)."""
@@ -1,13 +1,20 @@
 """Sales blueprint for POS and cart management."""
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, current_app
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, tuple_
+from sqlalchemy.orm import joinedload, selectinload, load_only, raiseload
 from decimal import Decimal, InvalidOperation
 from datetime import datetime
+from typing import NamedTuple, Optional
 from app.database import get_session
-from app.models import Product, ProductStock, Sale, SaleLine, SaleStatus
+from app.models import Product, ProductStock, Sale, SaleLine, SaleStatus, UOM
 from app.services.sales_service import confirm_sale
 from app.services.top_products_service import get_top_selling_products
+from app.services.product_search_service import search_products
+from app.services.product_lookup_service import (
+    lookup_product_by_code, invalidate_product, looks_like_barcode, normalize_code
+)
 from app.services.quote_service import generate_quote_pdf
+from app.services.cart_store import get_cart_store, get_cart_id
 
 sales_bp = Blueprint('sales', __name__, url_prefix='/sales')
 
@@ -32,79 +39,147 @@ def parse_decimal_ar(raw, default="0"):
         raise ValueError(f"Numero invalido: {raw!r}")
 
 def get_cart():
-    """Get cart from session."""
-    if 'cart' not in session:
-        session['cart'] = {'items': {}}
-    return session['cart']
+    """Get the current cart from the cart store (snapshot, see cart_store)."""
+    return get_cart_store().get_cart(get_cart_id())
 
 
-def save_cart(cart):
-    """Save cart to session."""
-    session['cart'] = cart
-    session.modified = True
+def set_cart_line(cart_key, line):
+    """Add or replace one line of the current cart."""
+    get_cart_store().set_line(get_cart_id(), cart_key, line)
+
+
+def remove_cart_line(cart_key):
+    """Remove one line of the current cart. Returns True if it existed."""
+    return get_cart_store().remove_line(get_cart_id(), cart_key)
+
+
+def clear_cart():
+    """Empty the current cart."""
+    get_cart_store().clear(get_cart_id())
+
+
+class CartLine(NamedTuple):
+    """Cart line resolved against the database (rendered by _cart.html and _confirm_modal.html)."""
+    cart_key: str
+    product_id: int
+    product: Product
+    uom_id: Optional[int]
+    uom: Optional[UOM]
+    qty: Decimal
+    qty_base: Decimal
+    unit_price: Decimal
+    subtotal: Decimal
+
+
+def _parse_cart_item(cart_key, item):
+    """
+    Parse a session cart item without touching the database.
+    
+    Returns:
+        Tuple (product_id, uom_id, qty, qty_base, unit_price) or None if the
+        key cannot be parsed. unit_price is None for legacy items that must
+        take the product's current price (and UOM).
+    """
+    # MEJORA A: Handle new cart format (product_id_uom_id) or legacy (product_id)
+    if isinstance(item, dict) and 'product_id' in item:
+        # New format
+        product_id = item['product_id']
+        uom_id = item['uom_id']
+        unit_price = Decimal(str(item['unit_price']))
+    else:
+        # Legacy format: cart_key is product_id_str
+        # (int() would accept "3_4" as 34, hence the isdigit() check)
+        uom_id = None
+        if cart_key.isdigit():
+            product_id = int(cart_key)
+        else:
+            # New format: cart_key is "product_id_uom_id"
+            parts = cart_key.split('_')
+            if len(parts) != 2 or not all(part.isdigit() for part in parts):
+                return None
+            product_id = int(parts[0])
+            uom_id = int(parts[1])
+        
+        if 'unit_price' in item:
+            unit_price = Decimal(str(item['unit_price']))
+            uom_id = item.get('uom_id')
+        else:
+            # Legacy: price and UOM come from the product
+            unit_price = None
+    
+    qty = Decimal(str(item['qty']))
+    qty_base = Decimal(str(item.get('qty_base', qty))) if isinstance(item, dict) else qty
+    return product_id, uom_id, qty, qty_base, unit_price
 
 
 def get_cart_with_products(db_session):
-    """Get cart with product details from database."""
-    from app.models import ProductUomPrice, UOM
+    """
+    Get cart with product details from database.
+    
+    Runs a fixed number of queries regardless of cart size: one for the
+    products (with stock and UOM joined), one for their UOM prices and one
+    for the UOMs selected in the cart.
+    
+    Returns:
+        Tuple (list of CartLine, total Decimal)
+    """
     cart = get_cart()
+    
+    parsed = []
+    for cart_key, item in cart['items'].items():
+        line = _parse_cart_item(cart_key, item)
+        if line is not None:
+            parsed.append((cart_key, line))
+    
+    if not parsed:
+        return [], Decimal('0.00')
+    
+    product_ids = {line[0] for _, line in parsed}
+    products = {
+        p.id: p for p in (
+            db_session.query(Product)
+            .options(
+                joinedload(Product.stock),
+                joinedload(Product.uom),
+                selectinload(Product.uom_prices)
+            )
+            .filter(Product.id.in_(product_ids))
+            .all()
+        )
+    }
+    
+    uom_ids = {line[1] for _, line in parsed if line[1]}
+    uoms = {
+        u.id: u for u in db_session.query(UOM).filter(UOM.id.in_(uom_ids)).all()
+    } if uom_ids else {}
+    
     cart_items = []
     total = Decimal('0.00')
     
-    for cart_key, item in cart['items'].items():
-        # MEJORA A: Handle new cart format (product_id_uom_id) or legacy (product_id)
-        if isinstance(item, dict) and 'product_id' in item:
-            # New format
-            product_id = item['product_id']
-            uom_id = item['uom_id']
-            qty = Decimal(str(item['qty']))
-            unit_price = Decimal(str(item['unit_price']))
-        else:
-            # Legacy format: cart_key is product_id_str
-            try:
-                product_id = int(cart_key)
-            except ValueError:
-                # New format: cart_key is "product_id_uom_id"
-                parts = cart_key.split('_')
-                if len(parts) == 2:
-                    product_id = int(parts[0])
-                    uom_id = int(parts[1])
-                else:
-                    continue
-            
-            qty = Decimal(str(item['qty']))
-            # Get unit_price from item or product
-            if 'unit_price' in item:
-                unit_price = Decimal(str(item['unit_price']))
-                uom_id = item.get('uom_id')
-            else:
-                # Legacy: get from product
-                product = db_session.query(Product).filter_by(id=product_id).first()
-                if not product:
-                    continue
-                unit_price = product.sale_price
-                uom_id = product.uom_id
-        
-        product = db_session.query(Product).filter_by(id=product_id).first()
-        
-        if product:
-            # Get UOM details
-            uom = db_session.query(UOM).filter_by(id=uom_id).first() if uom_id else product.uom
-            
-            subtotal = qty * unit_price
-            
-            cart_items.append({
-                'cart_key': cart_key,
-                'product_id': product.id,
-                'product': product,
-                'uom_id': uom_id,
-                'uom': uom,
-                'qty': qty,
-                'qty_base': Decimal(str(item.get('qty_base', qty))) if isinstance(item, dict) else qty,
-                'unit_price': unit_price,
-                'subtotal': subtotal
-            })
-            total += subtotal
+    for cart_key, (product_id, uom_id, qty, qty_base, unit_price) in parsed:
+        product = products.get(product_id)
+        if not product:
+            continue
+        
+        if unit_price is None:
+            unit_price = product.sale_price
+            uom_id = product.uom_id
+        
+        uom = uoms.get(uom_id, product.uom) if uom_id else product.uom
+        subtotal = qty * unit_price
+        
+        cart_items.append(CartLine(
+            cart_key=cart_key,
+            product_id=product.id,
+            product=product,
+            uom_id=uom_id,
+            uom=uom,
+            qty=qty,
+            qty_base=qty_base,
+            unit_price=unit_price,
+            subtotal=subtotal
+        ))
+        total += subtotal
     
     return cart_items, total
 
@@ -118,21 +193,22 @@ def new_sale():
         # Get search query if any
         search_query = request.args.get('q', '').strip()
         
-        # Search products
+        # Search products (trigram index, exact barcode/SKU hits ranked first)
         products = []
         if search_query:
-            search_filter = or_(
-                func.lower(Product.name).like(f'%{search_query.lower()}%'),
-                func.lower(Product.sku).like(f'%{search_query.lower()}%'),
-                func.lower(Product.barcode).like(f'%{search_query.lower()}%')
-            )
-            products = (db_session.query(Product)
-                       .outerjoin(ProductStock)
-                       .filter(Product.active == True)
-                       .filter(search_filter)
-                       .order_by(Product.name)
-                       .limit(20)
-                       .all())
+            # Barcode scan: resolve from lookup cache, load by PK. Other terms
+            # (e.g. "10", which may also be some SKU) keep the full result list.
+            hit = None
+            if looks_like_barcode(search_query):
+                hit = lookup_product_by_code(db_session, search_query)
+            if hit and hit['active'] and normalize_code(hit['barcode']) == normalize_code(search_query):
+                product = (db_session.query(Product)
+                           .options(joinedload(Product.stock), joinedload(Product.uom))
+                           .filter(Product.id == hit['product_id'])
+                           .first())
+                products = [product] if product else []
+            else:
+                products = search_products(db_session, search_query, limit=20)
         
         # Get cart items with details
         cart_items, cart_total = get_cart_with_products(db_session)
@@ -157,6 +233,31 @@ def new_sale():
                              top_products=[])
 
 
+@sales_bp.route('/lookup')
+def lookup_product():
+    """
+    Exact barcode/SKU lookup for barcode scanners (JSON).
+    
+    Served from the worker-local lookup cache; see product_lookup_service.
+    """
+    db_session = get_session()
+    code = request.args.get('code', '').strip()
+    
+    if not code:
+        return jsonify({'found': False, 'error': 'Debe indicar un código'}), 400
+    
+    try:
+        product = lookup_product_by_code(db_session, code)
+        if not product:
+            return jsonify({'found': False, 'code': code}), 404
+        
+        return jsonify({'found': True, 'product': product})
+        
+    except Exception as e:
+        current_app.logger.error(f"Error in product lookup for code {code!r}: {e}")
+        return jsonify({'found': False, 'error': str(e)}), 500
+
+
 @sales_bp.route('/product/<int:product_id>/uom-selector', methods=['GET'])
 def product_uom_selector(product_id):
     """Get UOM selector modal for a product (HTMX endpoint)."""
@@ -276,23 +377,25 @@ def cart_add():
                 flash(f'Stock insuficiente para "{product.name}". Disponible: {product.on_hand_qty}', 'warning')
                 return redirect(url_for('sales.new_sale'))
             
-            cart['items'][cart_key]['qty'] = float(new_qty)
-            cart['items'][cart_key]['qty_base'] = float(new_qty_base)
+            set_cart_line(cart_key, {
+                **cart['items'][cart_key],
+                'qty': new_qty,
+                'qty_base': new_qty_base
+            })
         else:
             # Check if qty exceeds stock
             if qty_base > product.on_hand_qty:
                 flash(f'Stock insuficiente para "{product.name}". Disponible: {product.on_hand_qty}', 'warning')
                 return redirect(url_for('sales.new_sale'))
             
-            cart['items'][cart_key] = {
+            set_cart_line(cart_key, {
                 'product_id': product_id,
                 'uom_id': uom_id,
-                'qty': float(qty),
-                'qty_base': float(qty_base),
-                'unit_price': float(unit_price)
-            }
+                'qty': qty,
+                'qty_base': qty_base,
+                'unit_price': unit_price
+            })
         
-        save_cart(cart)
         flash(f'"{product.name}" agregado al carrito', 'success')
         
         # If HTMX request, return partial
@@ -344,11 +447,7 @@ def cart_update():
         
         # MEJORA 15: If qty <= 0, remove item automatically
         if qty <= 0:
-            cart = session.get('cart', {'items': {}})
-            if cart_key in cart['items']:
-                del cart['items'][cart_key]
-                session['cart'] = cart
-                session.modified = True
+            if remove_cart_line(cart_key):
                 flash('Producto eliminado del carrito', 'info')
             cart_items, cart_total = get_cart_with_products(db_session)
             return render_template('sales/_cart.html',
@@ -417,13 +516,11 @@ def cart_update():
         
         # Update cart
         if isinstance(item, dict):
-            cart['items'][cart_key]['qty'] = float(qty)
-            cart['items'][cart_key]['qty_base'] = float(qty_base)
+            set_cart_line(cart_key, {**item, 'qty': qty, 'qty_base': qty_base})
         else:
             # Legacy format
-            cart['items'][cart_key] = {'qty': float(qty)}
+            set_cart_line(cart_key, {'qty': qty})
         
-        save_cart(cart)
         
         # Return updated cart partial
         cart_items, cart_total = get_cart_with_products(db_session)
@@ -456,11 +553,7 @@ def cart_remove():
                                  cart_total=cart_total)
         
         # Remove from cart
-        cart = get_cart()
-        
-        if cart_key in cart['items']:
-            del cart['items'][cart_key]
-            save_cart(cart)
+        if remove_cart_line(cart_key):
             flash('Producto removido del carrito', 'info')
         
         # Return updated cart partial
@@ -537,9 +630,13 @@ def confirm():
         # Call service to confirm sale
         sale_id = confirm_sale(cart, db_session, payment_method)
         
+        # Cached lookups show stock; drop the products that were just sold
+        for item in cart['items'].values():
+            if isinstance(item, dict) and 'product_id' in item:
+                invalidate_product(item['product_id'])
+        
         # Clear cart
-        session['cart'] = {'items': {}}
-        session.modified = True
+        clear_cart()
         
         payment_label = 'Efectivo' if payment_method == 'CASH' else 'Transferencia'
         flash(f'Venta #{sale_id} confirmada exitosamente ({payment_label}). Stock actualizado.', 'success')
@@ -571,18 +668,14 @@ def quote_pdf():
         # Build cart with product details
         cart_with_details = {'items': {}}
         
-        for product_id_str, item in cart['items'].items():
-            product_id = int(product_id_str)
-            product = db_session.query(Product).filter_by(id=product_id).first()
-            
-            if not product:
-                continue
-            
-            cart_with_details['items'][product_id_str] = {
-                'name': product.name,
-                'qty': Decimal(str(item['qty'])),
-                'price': product.sale_price,
-                'uom': product.uom.symbol if product.uom else '—'
+        cart_items, _ = get_cart_with_products(db_session)
+        
+        for line in cart_items:
+            cart_with_details['items'][line.cart_key] = {
+                'name': line.product.name,
+                'qty': line.qty,
+                'price': line.unit_price,
+                'uom': line.uom.symbol if line.uom else '—'
             }
         
         # Get payment method from session if available (MEJORA 12)
@@ -624,18 +717,66 @@ def quote_pdf():
 # MEJORA 16: Sales Management (List, Detail, Edit/Adjust)
 # ============================================================================
 
+SALES_PER_PAGE = 50
+
+
+def _parse_sale_cursor(cursor: str):
+    """
+    Parse a keyset cursor '<iso datetime>_<id>' (last sale of the previous page).
+    
+    Returns:
+        tuple (datetime, sale_id) or None if missing/invalid
+    """
+    if not cursor or '_' not in cursor:
+        return None
+    
+    dt_str, id_str = cursor.rsplit('_', 1)
+    if not id_str.isdigit():
+        return None
+    
+    try:
+        return datetime.fromisoformat(dt_str), int(id_str)
+    except ValueError:
+        return None
+
+
+def _parse_date_arg(value: str):
+    """Parse a YYYY-MM-DD query arg, returning None if empty or invalid."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
 @sales_bp.route('/')
 def list_sales():
-    """List all confirmed sales with search."""
+    """
+    List sales, newest first (keyset pagination, infinite scroll).
+    
+    Filters (date range in Argentina local dates, status, id) are applied in
+    SQL; date bounds are converted to UTC so idx_sale_datetime is used.
+    """
     db_session = get_session()
     
     try:
+        from app.utils.formatters import ar_date_to_utc_bounds
+        
         # Get search params
         sale_id_search = request.args.get('id', '').strip()
-        
-        # Build query — show all statuses (CONFIRMED and CANCELLED)
-        from app.models import Sale, SaleStatus
-        query = db_session.query(Sale)
+        status = request.args.get('status', '').strip().upper()
+        date_from = _parse_date_arg(request.args.get('date_from', '').strip())
+        date_to = _parse_date_arg(request.args.get('date_to', '').strip())
+        
+        # Keyset pagination (cursor = last sale of the previous page)
+        cursor = _parse_sale_cursor(request.args.get('after', '').strip())
+        append_mode = request.args.get('append_mode') == 'true' and cursor is not None
+        
+        # Build query — show all statuses (CONFIRMED and CANCELLED) unless filtered.
+        # Rows only use these columns; lines are never needed in the list.
+        query = db_session.query(Sale).options(
+            load_only(Sale.id, Sale.datetime, Sale.total, Sale.status),
+            raiseload(Sale.lines)
+        )
         
         # Search by ID
         if sale_id_search:
@@ -645,14 +786,44 @@ def list_sales():
             except ValueError:
                 flash('ID de venta inválido', 'warning')
         
+        if status in SaleStatus.__members__:
+            query = query.filter(Sale.status == SaleStatus[status])
+        else:
+            status = ''
+        
+        # Date range [date_from 00:00, date_to + 1 day 00:00) in Argentina time
+        start_utc, end_utc = ar_date_to_utc_bounds(date_from, date_to)
+        if start_utc:
+            query = query.filter(Sale.datetime >= start_utc)
+        if end_utc:
+            query = query.filter(Sale.datetime < end_utc)
+        
+        if cursor:
+            query = query.filter(tuple_(Sale.datetime, Sale.id) < tuple_(*cursor))
+        
         # Order by most recent first
-        sales = query.order_by(Sale.datetime.desc()).all()
+        sales = query.order_by(Sale.datetime.desc(), Sale.id.desc()).limit(SALES_PER_PAGE + 1).all()
+        
+        next_cursor = None
+        if len(sales) > SALES_PER_PAGE:
+            sales = sales[:SALES_PER_PAGE]
+            last = sales[-1]
+            next_cursor = f'{last.datetime.isoformat()}_{last.id}'
+        
+        is_htmx = request.headers.get('HX-Request') == 'true'
+        template = 'sales/_list_table.html' if is_htmx else 'sales/list.html'
         
-        return render_template('sales/list.html', 
+        return render_template(template, 
                              sales=sales,
-                             sale_id_search=sale_id_search)
+                             sale_id_search=sale_id_search,
+                             selected_status=status,
+                             date_from=date_from.strftime('%Y-%m-%d') if date_from else '',
+                             date_to=date_to.strftime('%Y-%m-%d') if date_to else '',
+                             next_cursor=next_cursor,
+                             append_mode=append_mode)
         
     except Exception as e:
+        db_session.rollback()
         flash(f'Error al cargar ventas: {str(e)}', 'danger')
         return redirect(url_for('sales.new_sale'))
 
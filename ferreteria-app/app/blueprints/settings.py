@@ -149,6 +149,10 @@ def edit_uom(uom_id):
             uom.name = name
             uom.symbol = symbol
             session.commit()
+            
+            # Cached POS lookups embed the UOM symbol
+            from app.services.product_lookup_service import clear_product_lookup_cache
+            clear_product_lookup_cache()
             flash(f'Unidad de medida "{name}" actualizada exitosamente.', 'success')
             return redirect(url_for('settings.list_uoms'))
         except Exception as e:
@@ -0,0 +1,212 @@
+"""Stock count blueprint (physical inventory)."""
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from sqlalchemy import func
+from app.database import get_session
+from app.models import StockCount, StockCountLine
+from app.services.stock_count_service import (
+    create_stock_count, set_counted_qtys, import_counts, remove_count_line,
+    get_count_preview, apply_stock_count, cancel_stock_count
+)
+from app.services.product_lookup_service import lookup_product_by_code, clear_product_lookup_cache
+from app.utils.decimal_parser import parse_decimal_ar
+
+stock_count_bp = Blueprint('stock_count', __name__, url_prefix='/stock-counts')
+
+
+def _render_lines(session, stock_count, message=None, message_type='success'):
+    """Render the count lines partial (HTMX responses)."""
+    return render_template('stock_count/_lines.html',
+                         stock_count=stock_count,
+                         lines=get_count_preview(session, stock_count.id),
+                         message=message,
+                         message_type=message_type)
+
+
+@stock_count_bp.route('/')
+def list_counts():
+    """List stock counts (most recent first)."""
+    session = get_session()
+
+    try:
+        line_counts = (
+            session.query(
+                StockCountLine.stock_count_id,
+                func.count().label('line_count')
+            )
+            .group_by(StockCountLine.stock_count_id)
+            .subquery()
+        )
+
+        counts = (
+            session.query(StockCount, func.coalesce(line_counts.c.line_count, 0))
+            .outerjoin(line_counts, line_counts.c.stock_count_id == StockCount.id)
+            .order_by(StockCount.created_at.desc())
+            .limit(50)
+            .all()
+        )
+
+        return render_template('stock_count/list.html', counts=counts)
+
+    except Exception as e:
+        current_app.logger.error(f"Error loading stock counts: {e}")
+        flash(f'Error al cargar inventarios: {str(e)}', 'danger')
+        return redirect(url_for('catalog.list_products'))
+
+
+@stock_count_bp.route('/new', methods=['POST'])
+def new_count():
+    """Open a new stock count."""
+    session = get_session()
+
+    try:
+        stock_count = create_stock_count(session, request.form.get('notes', '').strip())
+        return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count.id))
+
+    except Exception as e:
+        session.rollback()
+        current_app.logger.error(f"Error creating stock count: {e}")
+        flash(f'Error al crear inventario: {str(e)}', 'danger')
+        return redirect(url_for('stock_count.list_counts'))
+
+
+@stock_count_bp.route('/<int:stock_count_id>')
+def count_detail(stock_count_id):
+    """Count entry screen and preview of the stock differences."""
+    session = get_session()
+
+    stock_count = session.query(StockCount).filter_by(id=stock_count_id).first()
+    if not stock_count:
+        flash('Inventario no encontrado', 'danger')
+        return redirect(url_for('stock_count.list_counts'))
+
+    return render_template('stock_count/detail.html',
+                         stock_count=stock_count,
+                         lines=get_count_preview(session, stock_count_id))
+
+
+@stock_count_bp.route('/<int:stock_count_id>/scan', methods=['POST'])
+def scan(stock_count_id):
+    """Record the count of one product by barcode/SKU (HTMX endpoint)."""
+    session = get_session()
+    is_htmx = request.headers.get('HX-Request') == 'true'
+
+    stock_count = session.query(StockCount).filter_by(id=stock_count_id).first()
+    if not stock_count:
+        flash('Inventario no encontrado', 'danger')
+        return redirect(url_for('stock_count.list_counts'))
+
+    code = request.form.get('code', '').strip()
+    accumulate = request.form.get('mode', 'add') == 'add'
+
+    try:
+        qty = parse_decimal_ar(request.form.get('qty'), default='1', field_name='qty')
+
+        product = lookup_product_by_code(session, code) if code else None
+        if not product:
+            raise ValueError(f'No se encontró ningún producto con el código "{code}"')
+
+        set_counted_qtys(session, stock_count_id, {product['product_id']: qty}, accumulate=accumulate)
+        message = f'{product["name"]}: {"+" if accumulate else "="}{qty}'
+        message_type = 'success'
+
+    except ValueError as e:
+        message, message_type = str(e), 'danger'
+
+    except Exception as e:
+        current_app.logger.error(f"Error recording count {code!r} in stock count {stock_count_id}: {e}")
+        message, message_type = f'Error al registrar conteo: {str(e)}', 'danger'
+
+    if is_htmx:
+        return _render_lines(session, stock_count, message, message_type)
+
+    flash(message, message_type)
+    return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count_id))
+
+
+@stock_count_bp.route('/<int:stock_count_id>/import', methods=['POST'])
+def import_lines(stock_count_id):
+    """Record pasted "code;qty" lines (e.g. copied from a spreadsheet)."""
+    session = get_session()
+
+    try:
+        result = import_counts(session, stock_count_id, request.form.get('lines', ''))
+
+        flash(f'{result["recorded"]} productos registrados', 'success')
+        if result['not_found']:
+            not_found = ', '.join(result['not_found'][:20])
+            more = f' (y {len(result["not_found"]) - 20} más)' if len(result['not_found']) > 20 else ''
+            flash(f'Códigos no encontrados: {not_found}{more}', 'warning')
+        for error in result['errors'][:20]:
+            flash(error, 'warning')
+
+    except ValueError as e:
+        flash(str(e), 'danger')
+
+    except Exception as e:
+        current_app.logger.error(f"Error importing counts into stock count {stock_count_id}: {e}")
+        flash(f'Error al importar conteos: {str(e)}', 'danger')
+
+    return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count_id))
+
+
+@stock_count_bp.route('/<int:stock_count_id>/lines/<int:product_id>/remove', methods=['POST'])
+def remove_line(stock_count_id, product_id):
+    """Remove a product from the count (HTMX endpoint)."""
+    session = get_session()
+
+    stock_count = session.query(StockCount).filter_by(id=stock_count_id).first()
+    if not stock_count:
+        flash('Inventario no encontrado', 'danger')
+        return redirect(url_for('stock_count.list_counts'))
+
+    try:
+        remove_count_line(session, stock_count_id, product_id)
+        message, message_type = None, 'success'
+    except ValueError as e:
+        message, message_type = str(e), 'danger'
+
+    if request.headers.get('HX-Request') == 'true':
+        return _render_lines(session, stock_count, message, message_type)
+
+    if message:
+        flash(message, message_type)
+    return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count_id))
+
+
+@stock_count_bp.route('/<int:stock_count_id>/apply', methods=['POST'])
+def apply_count(stock_count_id):
+    """Apply the count as a single stock adjustment."""
+    session = get_session()
+
+    try:
+        stock_move = apply_stock_count(session, stock_count_id)
+        clear_product_lookup_cache()
+
+        if stock_move:
+            flash(f'Inventario #{stock_count_id} aplicado (movimiento de stock #{stock_move.id})', 'success')
+        else:
+            flash(f'Inventario #{stock_count_id} aplicado: el stock ya coincidía, no hubo ajustes', 'info')
+
+    except ValueError as e:
+        flash(str(e), 'danger')
+
+    except Exception as e:
+        current_app.logger.error(f"Error applying stock count {stock_count_id}: {e}")
+        flash(str(e), 'danger')
+
+    return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count_id))
+
+
+@stock_count_bp.route('/<int:stock_count_id>/cancel', methods=['POST'])
+def cancel_count(stock_count_id):
+    """Discard the count without changing stock."""
+    session = get_session()
+
+    try:
+        cancel_stock_count(session, stock_count_id)
+        flash(f'Inventario #{stock_count_id} cancelado', 'info')
+        return redirect(url_for('stock_count.list_counts'))
+
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('stock_count.count_detail', stock_count_id=stock_count_id))
@@ -0,0 +1,92 @@
+"""
+Flask CLI commands for maintenance jobs.
+
+Run inside Docker, e.g.:
+    docker compose exec web flask verify-ledger-balance
+    docker compose exec web flask snapshot-stock
+    docker compose exec web flask compute-reorder
+    docker compose exec web flask purge-carts
+    docker compose exec web flask rebuild-sales-stats
+"""
+import click
+from app.database import get_session
+
+
+@click.command('verify-ledger-balance')
+@click.option('--fix', is_flag=True, help='Rebuild ledger_balance if drift is found.')
+def verify_ledger_balance_command(fix):
+    """Compare ledger_balance with finance_ledger and report drift."""
+    from app.services.balance_service import verify_ledger_balance, rebuild_ledger_balance
+    
+    db_session = get_session()
+    drift = verify_ledger_balance(db_session)
+    
+    if not drift:
+        click.echo('ledger_balance OK: sin diferencias.')
+        return
+    
+    for item in drift:
+        click.echo(
+            f"{item['payment_method']}: guardado={item['stored']} "
+            f"real={item['actual']} diferencia={item['drift']}"
+        )
+    
+    if fix:
+        rebuild_ledger_balance(db_session)
+        click.echo('ledger_balance reconstruido.')
+    else:
+        raise SystemExit(1)
+
+
+@click.command('snapshot-stock')
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Día (AAAA-MM-DD); el snapshot se toma a las 00:00. Por defecto, hoy.')
+def snapshot_stock_command(day):
+    """Store the stock of every product (run daily, e.g. from cron)."""
+    from app.services.stock_history_service import take_stock_snapshot
+    
+    db_session = get_session()
+    snapshot = take_stock_snapshot(db_session, day)
+    lines = len(snapshot.lines)
+    click.echo(f'Snapshot de stock {snapshot.taken_at.isoformat()}: {lines} productos.')
+
+
+@click.command('compute-reorder')
+def compute_reorder_command():
+    """Rebuild the reorder suggestions from sales velocity (run nightly)."""
+    from app.services.reorder_service import compute_reorder_suggestions
+    
+    db_session = get_session()
+    count = compute_reorder_suggestions(db_session)
+    click.echo(f'Sugerencias de compra: {count} productos.')
+
+
+@click.command('purge-carts')
+@click.option('--hours', default=72, show_default=True,
+              help='Borrar carritos sin cambios en las últimas N horas.')
+def purge_carts_command(hours):
+    """Delete abandoned POS / quote carts (run nightly)."""
+    from app.services.cart_store import purge_stale_carts
+    
+    db_session = get_session()
+    deleted = purge_stale_carts(db_session, hours)
+    click.echo(f'Carritos abandonados: {deleted} líneas borradas.')
+
+
+@click.command('rebuild-sales-stats')
+def rebuild_sales_stats_command():
+    """Recompute product_sales_stats / product_sales_daily (after manual data fixes)."""
+    from app.services.top_products_service import rebuild_product_sales_stats
+    
+    db_session = get_session()
+    rebuild_product_sales_stats(db_session)
+    click.echo('Estadísticas de ventas por producto recalculadas.')
+
+
+def register_commands(app):
+    """Register maintenance commands on the app CLI."""
+    app.cli.add_command(verify_ledger_balance_command)
+    app.cli.add_command(snapshot_stock_command)
+    app.cli.add_command(compute_reorder_command)
+    app.cli.add_command(purge_carts_command)
+    app.cli.add_command(rebuild_sales_stats_command)
@@ -16,6 +16,16 @@ from app.models.purchase_invoice_payment import PurchaseInvoicePayment
 from app.models.quote import Quote, QuoteStatus
 from app.models.quote_line import QuoteLine
 from app.models.missing_product_request import MissingProductRequest, normalize_missing_product_name
+from app.models.product_sales_stats import ProductSalesStats, ProductSalesDaily
+from app.models.pos_cart_line import PosCartLine
+from app.models.ledger_daily_rollup import LedgerDailyRollup
+from app.models.ledger_balance import LedgerBalance
+from app.models.inventory_valuation import ProductValuation, InventoryValuation, InventoryValuationDelta
+from app.models.stock_snapshot import StockSnapshot, StockSnapshotLine
+from app.models.stock_count import StockCount, StockCountLine
+from app.models.document_sequence import DocumentSequence
+from app.models.reorder_suggestion import ReorderSuggestion
+from app.models.price_history import PriceUpdate, PriceHistory
 
 __all__ = [
     'UOM', 'Category', 'Product', 'ProductStock', 'ProductUomPrice',
@@ -24,6 +34,12 @@ __all__ = [
     'FinanceLedger', 'LedgerType', 'LedgerReferenceType', 'PaymentMethod', 'normalize_payment_method',
     'Supplier', 'PurchaseInvoice', 'InvoiceStatus', 'PurchaseInvoiceLine', 'PurchaseInvoicePayment',
     'Quote', 'QuoteStatus', 'QuoteLine',
-    'MissingProductRequest', 'normalize_missing_product_name'
+    'MissingProductRequest', 'normalize_missing_product_name',
+    'ProductSalesStats', 'ProductSalesDaily',
+    'PosCartLine',
+    'LedgerDailyRollup', 'LedgerBalance',
+    'ProductValuation', 'InventoryValuation', 'InventoryValuationDelta',
+    'StockSnapshot', 'StockSnapshotLine', 'StockCount', 'StockCountLine',
+    'DocumentSequence', 'ReorderSuggestion', 'PriceUpdate', 'PriceHistory'
 ]
 
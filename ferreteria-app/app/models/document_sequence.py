@@ -0,0 +1,21 @@
+"""Document sequence model - per-period document number counters."""
+from sqlalchemy import Column, BigInteger, String, Date
+from app.database import Base
+
+
+class DocumentSequence(Base):
+    """
+    Last number allocated for a document scope in a period.
+    
+    Allocated through app.services.document_number_service (never update
+    these rows directly).
+    """
+    
+    __tablename__ = 'document_sequence'
+    
+    scope = Column(String(32), primary_key=True)
+    period = Column(Date, primary_key=True)
+    last_value = Column(BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<DocumentSequence(scope='{self.scope}', period={self.period}, last_value={self.last_value})>"
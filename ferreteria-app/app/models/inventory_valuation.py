@@ -0,0 +1,65 @@
+"""Inventory valuation aggregates (maintained by database triggers)."""
+from sqlalchemy import Column, BigInteger, Numeric, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ProductValuation(Base):
+    """
+    Current valuation of one product (stock x base sale price / latest cost).
+    
+    Read-only from the application: rows are maintained by triggers on
+    product_stock, product_uom_price, purchase_invoice_line and product
+    (see db/migrations/20261018_inventory_valuation.sql and
+    20261018_inventory_valuation_per_product.sql and
+    20261018_inventory_valuation_totals.sql).
+    """
+    
+    __tablename__ = 'product_valuation'
+    
+    product_id = Column(BigInteger, primary_key=True)
+    category_id = Column(BigInteger, nullable=True)
+    on_hand_qty = Column(Numeric(12, 3), nullable=False, default=0)
+    sale_price = Column(Numeric(12, 2), nullable=True)
+    unit_cost = Column(Numeric(14, 2), nullable=True)
+    sale_value = Column(Numeric, nullable=False, default=0)
+    cost_value = Column(Numeric, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ProductValuation(product_id={self.product_id}, sale_value={self.sale_value})>"
+
+
+
+class InventoryValuation(Base):
+    """
+    Inventory valuation totals per category (category_key 0 = sin categoría).
+    
+    Written only by fold_inventory_valuation() / rebuild_inventory_valuation();
+    changes not folded yet are in InventoryValuationDelta.
+    """
+    
+    __tablename__ = 'inventory_valuation'
+    
+    category_key = Column(BigInteger, primary_key=True)
+    sale_value = Column(Numeric, nullable=False, default=0)
+    cost_value = Column(Numeric, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<InventoryValuation(category_key={self.category_key}, sale_value={self.sale_value})>"
+
+
+class InventoryValuationDelta(Base):
+    """Pending change of a category total (insert-only, appended by the valuation trigger)."""
+    
+    __tablename__ = 'inventory_valuation_delta'
+    
+    id = Column(BigInteger, primary_key=True)
+    category_key = Column(BigInteger, nullable=False)
+    sale_value = Column(Numeric, nullable=False)
+    cost_value = Column(Numeric, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<InventoryValuationDelta(category_key={self.category_key}, sale_value={self.sale_value})>"
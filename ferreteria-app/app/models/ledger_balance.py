@@ -0,0 +1,29 @@
+"""Running ledger balance per payment method (maintained by database trigger)."""
+from sqlalchemy import Column, DateTime, Numeric, String
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class LedgerBalance(Base):
+    """
+    Income/expense totals per payment method (CASH = cash drawer, TRANSFER).
+    
+    Read-only from the application: rows are maintained by a trigger on
+    finance_ledger (see db/migrations/20261018_ledger_balance.sql).
+    Soft-deleted entries are excluded.
+    """
+    
+    __tablename__ = 'ledger_balance'
+    
+    payment_method = Column(String(20), primary_key=True)
+    income_total = Column(Numeric(14, 2), nullable=False, default=0)
+    expense_total = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    @property
+    def balance(self):
+        """Current balance for this payment method."""
+        return self.income_total - self.expense_total
+    
+    def __repr__(self):
+        return f"<LedgerBalance(payment_method='{self.payment_method}', balance={self.balance})>"
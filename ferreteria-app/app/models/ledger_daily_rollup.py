@@ -0,0 +1,25 @@
+"""Ledger daily rollup (maintained by database trigger)."""
+from sqlalchemy import Column, Date, Enum, Integer, Numeric, String
+from app.database import Base
+from app.models.finance_ledger import LedgerType
+
+
+class LedgerDailyRollup(Base):
+    """
+    Ledger totals per Argentina-local day, type and payment method.
+    
+    Read-only from the application: rows are maintained by a trigger on
+    finance_ledger (see db/migrations/20261018_ledger_daily_rollup.sql).
+    Soft-deleted entries are excluded.
+    """
+    
+    __tablename__ = 'ledger_daily_rollup'
+    
+    local_date = Column(Date, primary_key=True)
+    type = Column(Enum(LedgerType, name='ledger_type'), primary_key=True)
+    payment_method = Column(String(20), primary_key=True)
+    amount = Column(Numeric(14, 2), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<LedgerDailyRollup(local_date={self.local_date}, type={self.type.value}, amount={self.amount})>"
@@ -0,0 +1,38 @@
+"""POS Cart Line model - server-side cart storage."""
+from sqlalchemy import Column, BigInteger, String, Numeric, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PosCartLine(Base):
+    """
+    One line of a POS cart, keyed by (cart_id, line_key).
+    
+    cart_id is a random id stored in the Flask session; line_key is
+    "<product_id>_<uom_id>".
+    """
+    
+    __tablename__ = 'pos_cart_line'
+    
+    cart_id = Column(String(64), primary_key=True)
+    line_key = Column(String(64), primary_key=True)
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    uom_id = Column(BigInteger, ForeignKey('uom.id', ondelete='CASCADE'), nullable=False)
+    qty = Column(Numeric(12, 3), nullable=False)
+    qty_base = Column(Numeric(14, 4), nullable=False)
+    unit_price = Column(Numeric(12, 2), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<PosCartLine(cart_id='{self.cart_id}', line_key='{self.line_key}', qty={self.qty})>"
+    
+    def to_item(self) -> dict:
+        """Cart item dict in the format used by the services (confirm_sale, quotes)."""
+        return {
+            'product_id': self.product_id,
+            'uom_id': self.uom_id,
+            'qty': self.qty,
+            'qty_base': self.qty_base,
+            'unit_price': self.unit_price
+        }
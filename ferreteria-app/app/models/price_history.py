@@ -0,0 +1,61 @@
+"""Bulk price update and price history models."""
+from sqlalchemy import Column, BigInteger, Integer, String, Text, Numeric, Boolean, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class PriceUpdate(Base):
+    """
+    Bulk repricing (actualización masiva de precios).
+    
+    rule PERCENT changes every selected price by value %; rule MARKUP sets it
+    to the last purchase cost (per base unit, times conversion_to_base) plus
+    value %. Results are rounded to rounding_step (up if round_up).
+    preview_token makes each preview applicable only once.
+    """
+    
+    __tablename__ = 'price_update'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    rule = Column(String(10), nullable=False)
+    value = Column(Numeric(8, 2), nullable=False)
+    rounding_step = Column(Numeric(10, 2), nullable=False, default=0.01)
+    round_up = Column(Boolean, nullable=False, default=False)
+    filters = Column(Text, nullable=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    preview_token = Column(String(32), nullable=True, unique=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        CheckConstraint("rule IN ('PERCENT', 'MARKUP')", name='price_update_rule_check'),
+        CheckConstraint('rounding_step > 0', name='price_update_rounding_step_check'),
+    )
+    
+    # Relationships
+    history = relationship('PriceHistory', back_populates='price_update', passive_deletes=True)
+    
+    def __repr__(self):
+        return f"<PriceUpdate(id={self.id}, rule='{self.rule}', value={self.value})>"
+
+
+class PriceHistory(Base):
+    """Old and new sale price of one product UOM."""
+    
+    __tablename__ = 'price_history'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    price_update_id = Column(BigInteger, ForeignKey('price_update.id', ondelete='CASCADE'), nullable=True)
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    uom_id = Column(BigInteger, ForeignKey('uom.id'), nullable=False)
+    old_price = Column(Numeric(12, 2), nullable=False)
+    new_price = Column(Numeric(12, 2), nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # Relationships
+    price_update = relationship('PriceUpdate', back_populates='history')
+    product = relationship('Product')
+    uom = relationship('UOM')
+    
+    def __repr__(self):
+        return f"<PriceHistory(product_id={self.product_id}, uom_id={self.uom_id}, {self.old_price} -> {self.new_price})>"
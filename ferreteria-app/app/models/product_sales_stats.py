@@ -0,0 +1,37 @@
+"""Product sales aggregates (maintained by database triggers)."""
+from sqlalchemy import Column, BigInteger, Numeric, Date, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ProductSalesStats(Base):
+    """
+    All-time sales totals per product (CONFIRMED sales only).
+    
+    Read-only from the application: rows are maintained by triggers on
+    sale_line and sale (see db/migrations/20261018_product_sales_stats.sql).
+    """
+    
+    __tablename__ = 'product_sales_stats'
+    
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    total_qty = Column(Numeric(14, 2), nullable=False, default=0)
+    total_revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ProductSalesStats(product_id={self.product_id}, total_qty={self.total_qty})>"
+
+
+class ProductSalesDaily(Base):
+    """Sales per product and Argentina-local day (for rolling windows)."""
+    
+    __tablename__ = 'product_sales_daily'
+    
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    sale_date = Column(Date, primary_key=True)
+    qty = Column(Numeric(14, 2), nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<ProductSalesDaily(product_id={self.product_id}, sale_date={self.sale_date}, qty={self.qty})>"
@@ -1,5 +1,5 @@
 """Product Stock model."""
-from sqlalchemy import Column, BigInteger, Numeric, DateTime, ForeignKey
+from sqlalchemy import Column, BigInteger, Numeric, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -12,6 +12,8 @@ class ProductStock(Base):
     
     product_id = Column(BigInteger, ForeignKey('product.id'), primary_key=True)
     on_hand_qty = Column(Numeric(10, 2), nullable=False, default=0)
+    # OUT / LOW / OK, maintained by trigger (product_stock_status)
+    stock_status = Column(String(3), nullable=False, server_default='OUT')
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
     
     # Relationship
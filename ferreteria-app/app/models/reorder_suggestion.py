@@ -0,0 +1,31 @@
+"""Reorder suggestion model (precomputed purchase suggestions)."""
+from sqlalchemy import Column, BigInteger, Numeric, Date, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class ReorderSuggestion(Base):
+    """Suggested purchase of one product (rebuilt nightly, see reorder_service)."""
+    
+    __tablename__ = 'reorder_suggestion'
+    
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    supplier_id = Column(BigInteger, ForeignKey('supplier.id', ondelete='SET NULL'), nullable=True)
+    on_hand_qty = Column(Numeric(12, 3), nullable=False)
+    min_stock_qty = Column(Numeric(12, 3), nullable=False, default=0)
+    sold_short_qty = Column(Numeric(14, 3), nullable=False, default=0)
+    sold_long_qty = Column(Numeric(14, 3), nullable=False, default=0)
+    daily_velocity = Column(Numeric(14, 4), nullable=False, default=0)
+    days_of_cover = Column(Numeric(10, 1), nullable=True)
+    suggested_qty = Column(Numeric(12, 3), nullable=False)
+    last_unit_cost = Column(Numeric(14, 2), nullable=True)
+    last_purchase_date = Column(Date, nullable=True)
+    computed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # Relationships
+    product = relationship('Product')
+    supplier = relationship('Supplier')
+    
+    def __repr__(self):
+        return f"<ReorderSuggestion(product_id={self.product_id}, suggested_qty={self.suggested_qty})>"
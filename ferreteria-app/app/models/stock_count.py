@@ -0,0 +1,57 @@
+"""Stock count models (physical inventory)."""
+from sqlalchemy import Column, BigInteger, String, Text, Numeric, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class StockCount(Base):
+    """
+    Stock count session (toma de inventario).
+    
+    Counts are entered while OPEN and applied at once as a single ADJUST
+    stock_move (stock_move_id) with one line per product whose stock changed.
+    """
+    
+    __tablename__ = 'stock_count'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    status = Column(String(20), nullable=False, default='OPEN')
+    notes = Column(Text, nullable=True)
+    stock_move_id = Column(BigInteger, ForeignKey('stock_move.id', ondelete='SET NULL'), nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    applied_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        CheckConstraint("status IN ('OPEN', 'APPLIED', 'CANCELLED')", name='stock_count_status_check'),
+    )
+    
+    # Relationships
+    lines = relationship('StockCountLine', back_populates='stock_count', cascade='all, delete-orphan')
+    stock_move = relationship('StockMove')
+    
+    def __repr__(self):
+        return f"<StockCount(id={self.id}, status='{self.status}')>"
+
+
+class StockCountLine(Base):
+    """Counted quantity of one product (base UOM)."""
+    
+    __tablename__ = 'stock_count_line'
+    
+    stock_count_id = Column(BigInteger, ForeignKey('stock_count.id', ondelete='CASCADE'), primary_key=True)
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    counted_qty = Column(Numeric(12, 3), nullable=False)
+    expected_qty = Column(Numeric(12, 3), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        CheckConstraint('counted_qty >= 0', name='stock_count_line_counted_qty_check'),
+    )
+    
+    # Relationships
+    stock_count = relationship('StockCount', back_populates='lines')
+    product = relationship('Product')
+    
+    def __repr__(self):
+        return f"<StockCountLine(stock_count_id={self.stock_count_id}, product_id={self.product_id}, counted={self.counted_qty})>"
@@ -0,0 +1,37 @@
+"""Stock snapshot models (point-in-time stock)."""
+from sqlalchemy import Column, BigInteger, Numeric, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class StockSnapshot(Base):
+    """Stock of every product at taken_at (see stock_history_service)."""
+    
+    __tablename__ = 'stock_snapshot'
+    
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    taken_at = Column(DateTime(timezone=True), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # Relationships
+    lines = relationship('StockSnapshotLine', back_populates='snapshot', cascade='all, delete-orphan')
+    
+    def __repr__(self):
+        return f"<StockSnapshot(id={self.id}, taken_at={self.taken_at})>"
+
+
+class StockSnapshotLine(Base):
+    """Stock of one product in a snapshot (only non-zero quantities are stored)."""
+    
+    __tablename__ = 'stock_snapshot_line'
+    
+    snapshot_id = Column(BigInteger, ForeignKey('stock_snapshot.id', ondelete='CASCADE'), primary_key=True)
+    product_id = Column(BigInteger, ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    on_hand_qty = Column(Numeric(12, 3), nullable=False)
+    
+    # Relationships
+    snapshot = relationship('StockSnapshot', back_populates='lines')
+    
+    def __repr__(self):
+        return f"<StockSnapshotLine(snapshot_id={self.snapshot_id}, product_id={self.product_id}, qty={self.on_hand_qty})>"
@@ -1,14 +1,20 @@
 """Balance service for financial reporting."""
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-from sqlalchemy import func, case, extract
-from app.models import FinanceLedger, LedgerType, Product, ProductStock, ProductUomPrice
+from sqlalchemy import func, case, extract, cast, DateTime
+from app.models import (
+    FinanceLedger, LedgerType, LedgerDailyRollup, LedgerBalance,
+    Category, InventoryValuation, InventoryValuationDelta
+)
 
 
 def get_balance_series(view: str, start: date, end: date, session, method: str = 'all'):
     """
     Get balance series (income, expense, net) grouped by period.
     
+    Reads ledger_daily_rollup, so the cost depends on the number of days in
+    the range, not on the number of ledger rows.
+    
     Args:
         view: 'daily', 'monthly', or 'yearly'
         start: Start date (inclusive)
@@ -34,28 +40,23 @@ def get_balance_series(view: str, start: date, end: date, session, method: str =
     
     granularity = granularity_map.get(view, 'month')
     
-    # Convert dates to datetime for comparison
-    # start at 00:00:00, end at 23:59:59
-    start_dt = datetime.combine(start, datetime.min.time())
-    end_dt = datetime.combine(end, datetime.max.time())
-    
-    # Build query with date_trunc and aggregation
-    # MEJORA TZ: Convert to Argentina time before truncating
-    # FinanceLedger.datetime is TIMESTAMPTZ (UTC). 
-    # timezone('America/Argentina/Buenos_Aires', ...) converts it to TIMESTAMP (naive) in AR time.
-    local_datetime = func.timezone('America/Argentina/Buenos_Aires', FinanceLedger.datetime)
-    period_col = func.date_trunc(granularity, local_datetime).label('period')
+    # Read the daily rollup (maintained by trigger, soft-deleted rows excluded).
+    # local_date is already the Argentina-local day, so the range is a plain
+    # date comparison on the primary key.
+    period_col = func.date_trunc(
+        granularity, cast(LedgerDailyRollup.local_date, DateTime)
+    ).label('period')
     
     income_sum = func.sum(
         case(
-            (FinanceLedger.type == LedgerType.INCOME, FinanceLedger.amount),
+            (LedgerDailyRollup.type == LedgerType.INCOME, LedgerDailyRollup.amount),
             else_=0
         )
     ).label('income')
     
     expense_sum = func.sum(
         case(
-            (FinanceLedger.type == LedgerType.EXPENSE, FinanceLedger.amount),
+            (LedgerDailyRollup.type == LedgerType.EXPENSE, LedgerDailyRollup.amount),
             else_=0
         )
     ).label('expense')
@@ -66,16 +67,16 @@ def get_balance_series(view: str, start: date, end: date, session, method: str =
             income_sum,
             expense_sum
         )
-        .filter(local_datetime >= start_dt)
-        .filter(local_datetime <= end_dt)
-        .filter(FinanceLedger.deleted_at.is_(None))
+        .filter(LedgerDailyRollup.local_date >= start)
+        .filter(LedgerDailyRollup.local_date <= end)
+        .filter(LedgerDailyRollup.entry_count > 0)
     )
     
     # MEJORA 12: Apply payment method filter
     if method == 'cash':
-        query = query.filter(FinanceLedger.payment_method == 'CASH')
+        query = query.filter(LedgerDailyRollup.payment_method == 'CASH')
     elif method == 'transfer':
-        query = query.filter(FinanceLedger.payment_method == 'TRANSFER')
+        query = query.filter(LedgerDailyRollup.payment_method == 'TRANSFER')
     # if 'all', no filter applied
     
     query = query.group_by(period_col).order_by(period_col.asc())
@@ -173,14 +174,14 @@ def get_available_years(session):
     Returns:
         List of integers (years) in descending order
     """
-    # MEJORA TZ: Use local time for year extraction
-    local_datetime = func.timezone('America/Argentina/Buenos_Aires', FinanceLedger.datetime)
+    # MEJORA TZ: local_date in the rollup is already the Argentina-local day
+    year_col = extract('year', LedgerDailyRollup.local_date)
     
     query = (
-        session.query(extract('year', local_datetime).label('year'))
-        .filter(FinanceLedger.deleted_at.is_(None))
+        session.query(year_col.label('year'))
+        .filter(LedgerDailyRollup.entry_count > 0)
         .distinct()
-        .order_by(extract('year', local_datetime).desc())
+        .order_by(year_col.desc())
     )
     
     results = query.all()
@@ -198,21 +199,33 @@ def get_available_months(year: int, session):
     Returns:
         List of integers (1-12) in ascending order
     """
-    # MEJORA TZ: Use local time for year/month extraction
-    local_datetime = func.timezone('America/Argentina/Buenos_Aires', FinanceLedger.datetime)
+    start, end = get_year_date_range(year)
+    month_col = extract('month', LedgerDailyRollup.local_date)
     
     query = (
-        session.query(extract('month', local_datetime).label('month'))
-        .filter(extract('year', local_datetime) == year)
-        .filter(FinanceLedger.deleted_at.is_(None))
+        session.query(month_col.label('month'))
+        .filter(LedgerDailyRollup.local_date >= start)
+        .filter(LedgerDailyRollup.local_date <= end)
+        .filter(LedgerDailyRollup.entry_count > 0)
         .distinct()
-        .order_by(extract('month', local_datetime).asc())
+        .order_by(month_col.asc())
     )
     
     results = query.all()
     return [int(row.month) for row in results]
 
 
+def rebuild_ledger_daily_rollup(session) -> None:
+    """
+    Recompute ledger_daily_rollup from finance_ledger.
+    
+    Only needed after manual data fixes; the trigger keeps the table current.
+    """
+    from sqlalchemy import text
+    session.execute(text('SELECT rebuild_ledger_daily_rollup()'))
+    session.commit()
+
+
 def get_month_date_range(year: int, month: int):
     """
     Get start and end dates for a specific month.
@@ -253,65 +266,182 @@ def get_year_date_range(year: int):
     return start, end
 
 
-def get_inventory_valuation(session) -> Decimal:
+def get_inventory_valuation_summary(session) -> dict:
     """
     Calculate inventory valuation (Goodwill / Fondo de Comercio).
     
-    MEJORA C: Sum of (sale_price * on_hand_qty) for all products with stock > 0.
-    Uses the base UOM price for valuation.
+    MEJORA C: Sum of (sale_price * on_hand_qty) for all active products with
+    stock > 0, using the base UOM price, and the same at cost (latest purchase
+    unit cost; products never purchased count as 0).
+    
+    Pending deltas are folded first (fold_inventory_valuation), then one
+    GROUP BY over inventory_valuation plus any delta still pending returns the
+    per-category figures; the totals are summed here from those rows.
     
     Args:
         session: SQLAlchemy session
         
     Returns:
-        Decimal: Total inventory value at sale price
+        dict with keys:
+            - sale_value: Total inventory value at sale price
+            - cost_value: Total inventory value at cost
+            - by_category: List of dicts (category_id, category_name,
+              sale_value, cost_value), highest sale value first
     """
-    # Query: JOIN product_stock + product_uom_price (base) + product
-    # WHERE stock > 0 AND product.active = true AND is_base = true
-    # SUM(stock * sale_price)
+    from sqlalchemy import select, text, union_all
+    session.execute(text('SELECT fold_inventory_valuation()'))
+    session.commit()
+    
+    figures = union_all(
+        select(
+            InventoryValuation.category_key,
+            InventoryValuation.sale_value,
+            InventoryValuation.cost_value
+        ),
+        select(
+            InventoryValuationDelta.category_key,
+            InventoryValuationDelta.sale_value,
+            InventoryValuationDelta.cost_value
+        )
+    ).subquery('figures')
     
-    query = (
+    sale_value = func.sum(figures.c.sale_value)
+    cost_value = func.sum(figures.c.cost_value)
+    rows = (
         session.query(
-            func.sum(ProductStock.on_hand_qty * ProductUomPrice.sale_price).label('total_valuation')
+            figures.c.category_key,
+            Category.name,
+            sale_value.label('sale_value'),
+            cost_value.label('cost_value')
         )
-        .join(ProductUomPrice, ProductUomPrice.product_id == ProductStock.product_id)
-        .join(Product, Product.id == ProductStock.product_id)
-        .filter(ProductStock.on_hand_qty > 0)
-        .filter(Product.active == True)
-        .filter(ProductUomPrice.is_base == True)
+        .outerjoin(Category, Category.id == figures.c.category_key)
+        .group_by(figures.c.category_key, Category.name)
+        .having((sale_value != 0) | (cost_value != 0))
+        .order_by(sale_value.desc())
+        .all()
     )
     
-    result = query.scalar()
+    by_category = [
+        {
+            'category_id': row.category_key or None,
+            'category_name': row.name or 'Sin categoría',
+            'sale_value': Decimal(str(row.sale_value)).quantize(Decimal('0.01')),
+            'cost_value': Decimal(str(row.cost_value)).quantize(Decimal('0.01'))
+        }
+        for row in rows
+    ]
+    
+    return {
+        'sale_value': sum((Decimal(str(row.sale_value)) for row in rows), Decimal('0')).quantize(Decimal('0.01')),
+        'cost_value': sum((Decimal(str(row.cost_value)) for row in rows), Decimal('0')).quantize(Decimal('0.01')),
+        'by_category': by_category
+    }
+
+
+def rebuild_inventory_valuation(session) -> None:
+    """
+    Recompute product_valuation and the category totals from the catalog.
+    
+    Only needed after manual data fixes; triggers keep the tables current.
+    """
+    from sqlalchemy import text
+    session.execute(text('SELECT rebuild_inventory_valuation()'))
+    session.commit()
+
+
+def get_current_balances(session) -> dict:
+    """
+    Get the current balance per payment method from ledger_balance.
+    
+    Args:
+        session: SQLAlchemy session
+        
+    Returns:
+        Dict with keys:
+        - CASH: Decimal (cash drawer)
+        - TRANSFER: Decimal
+        - total: Decimal
+    """
+    balances = {'CASH': Decimal('0.00'), 'TRANSFER': Decimal('0.00')}
     
-    if result is None:
-        return Decimal('0.00')
+    for row in session.query(LedgerBalance).all():
+        balances[row.payment_method] = Decimal(str(row.balance))
     
-    return Decimal(str(result)).quantize(Decimal('0.01'))
+    balances['total'] = balances['CASH'] + balances['TRANSFER']
+    return balances
 
 
 def get_current_total_balance(session) -> Decimal:
     """
     Calculate the current net balance (total income - total expense).
     
+    Reads the trigger-maintained ledger_balance table (one row per payment
+    method) instead of summing finance_ledger.
+    
     Args:
         session: SQLAlchemy session
         
     Returns:
         Decimal: Current net balance
     """
-    income_sum = (
-        session.query(func.sum(FinanceLedger.amount))
-        .filter(FinanceLedger.type == LedgerType.INCOME)
-        .filter(FinanceLedger.deleted_at.is_(None))
-        .scalar()
-    ) or Decimal('0.00')
-    
-    expense_sum = (
-        session.query(func.sum(FinanceLedger.amount))
-        .filter(FinanceLedger.type == LedgerType.EXPENSE)
-        .filter(FinanceLedger.deleted_at.is_(None))
-        .scalar()
-    ) or Decimal('0.00')
-    
-    return Decimal(str(income_sum)) - Decimal(str(expense_sum))
+    return get_current_balances(session)['total']
+
+
+def verify_ledger_balance(session) -> list:
+    """
+    Recompute balances from finance_ledger and compare with ledger_balance.
+    
+    Args:
+        session: SQLAlchemy session
+        
+    Returns:
+        List of dicts (one per payment method with drift) with keys:
+        payment_method, stored, actual, drift
+    """
+    income_sum = func.coalesce(func.sum(case(
+        (FinanceLedger.type == LedgerType.INCOME, FinanceLedger.amount), else_=0
+    )), 0)
+    expense_sum = func.coalesce(func.sum(case(
+        (FinanceLedger.type == LedgerType.EXPENSE, FinanceLedger.amount), else_=0
+    )), 0)
+    
+    actual = {
+        row.payment_method: Decimal(str(row.income)) - Decimal(str(row.expense))
+        for row in (
+            session.query(
+                FinanceLedger.payment_method,
+                income_sum.label('income'),
+                expense_sum.label('expense')
+            )
+            .filter(FinanceLedger.deleted_at.is_(None))
+            .group_by(FinanceLedger.payment_method)
+            .all()
+        )
+    }
+    
+    stored = get_current_balances(session)
+    
+    drift = []
+    for payment_method in sorted(set(actual) | {'CASH', 'TRANSFER'}):
+        stored_value = stored.get(payment_method, Decimal('0.00'))
+        actual_value = actual.get(payment_method, Decimal('0.00'))
+        if stored_value != actual_value:
+            drift.append({
+                'payment_method': payment_method,
+                'stored': stored_value,
+                'actual': actual_value,
+                'drift': stored_value - actual_value
+            })
+    
+    return drift
+
 
+def rebuild_ledger_balance(session) -> None:
+    """
+    Recompute ledger_balance from finance_ledger.
+    
+    Only needed to repair drift; the trigger keeps the table current.
+    """
+    from sqlalchemy import text
+    session.execute(text('SELECT rebuild_ledger_balance()'))
+    session.commit()
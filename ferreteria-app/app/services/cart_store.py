@@ -0,0 +1,179 @@
+"""
+Cart storage for the POS and quotes.
+
+The cart used to live in Flask's signed-cookie session, so every request
+shipped and re-signed the whole cart. The default store now keeps one row
+per line in pos_cart_line, keyed by a random cart id that is the only thing
+kept in the session. Lines are written individually (upsert/delete) instead
+of rewriting the whole cart. Abandoned carts (no line changed recently) are
+deleted nightly, whole, with `flask purge-carts` (purge_stale_carts).
+
+Select the backend with CART_STORE:
+- 'db' (default): DatabaseCartStore
+- 'session': SessionCartStore (previous cookie behaviour)
+
+Both return carts in the shape the services expect:
+    {'items': {line_key: {'product_id', 'uom_id', 'qty', 'qty_base', 'unit_price'}}}
+The returned dict is a snapshot: use set_line/remove_line/clear to persist.
+"""
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from flask import current_app, session as flask_session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.database import get_session
+from app.models import PosCartLine
+
+
+class SessionCartStore:
+    """Cart kept in the Flask cookie session (legacy behaviour)."""
+
+    def get_cart(self, cart_id: str) -> dict:
+        """Get cart from session."""
+        if 'cart' not in flask_session:
+            flask_session['cart'] = {'items': {}}
+        return flask_session['cart']
+
+    def set_line(self, cart_id: str, line_key: str, line: dict) -> None:
+        """Add or replace one cart line."""
+        cart = self.get_cart(cart_id)
+        cart['items'][line_key] = {
+            key: float(value) if isinstance(value, Decimal) else value
+            for key, value in line.items()
+        }
+        flask_session.modified = True
+
+    def remove_line(self, cart_id: str, line_key: str) -> bool:
+        """Remove one cart line. Returns True if it existed."""
+        cart = self.get_cart(cart_id)
+        if line_key not in cart['items']:
+            return False
+        del cart['items'][line_key]
+        flask_session.modified = True
+        return True
+
+    def clear(self, cart_id: str) -> None:
+        """Empty the cart."""
+        flask_session['cart'] = {'items': {}}
+        flask_session.modified = True
+
+
+class DatabaseCartStore:
+    """Cart kept in the pos_cart_line table (one row per line)."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def get_cart(self, cart_id: str) -> dict:
+        """Load the cart (lines in the order they were added)."""
+        lines = (
+            self.session.query(PosCartLine)
+            .filter(PosCartLine.cart_id == cart_id)
+            .order_by(PosCartLine.created_at, PosCartLine.line_key)
+            .all()
+        )
+        return {'items': {line.line_key: line.to_item() for line in lines}}
+
+    def set_line(self, cart_id: str, line_key: str, line: dict) -> None:
+        """Add or replace one cart line (INSERT ... ON CONFLICT DO UPDATE)."""
+        if not line.get('product_id') or not line.get('uom_id'):
+            raise ValueError('La línea del carrito debe tener producto y unidad de medida')
+
+        values = {
+            'cart_id': cart_id,
+            'line_key': line_key,
+            'product_id': line['product_id'],
+            'uom_id': line['uom_id'],
+            'qty': Decimal(str(line['qty'])),
+            'qty_base': Decimal(str(line.get('qty_base', line['qty']))),
+            'unit_price': Decimal(str(line['unit_price']))
+        }
+        stmt = pg_insert(PosCartLine).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PosCartLine.cart_id, PosCartLine.line_key],
+            set_={
+                'product_id': stmt.excluded.product_id,
+                'uom_id': stmt.excluded.uom_id,
+                'qty': stmt.excluded.qty,
+                'qty_base': stmt.excluded.qty_base,
+                'unit_price': stmt.excluded.unit_price,
+                'updated_at': func.now()
+            }
+        )
+
+        try:
+            self.session.execute(stmt)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def remove_line(self, cart_id: str, line_key: str) -> bool:
+        """Remove one cart line. Returns True if it existed."""
+        try:
+            deleted = (
+                self.session.query(PosCartLine)
+                .filter(PosCartLine.cart_id == cart_id, PosCartLine.line_key == line_key)
+                .delete(synchronize_session=False)
+            )
+            self.session.commit()
+            return deleted > 0
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def clear(self, cart_id: str) -> None:
+        """Empty the cart."""
+        try:
+            (
+                self.session.query(PosCartLine)
+                .filter(PosCartLine.cart_id == cart_id)
+                .delete(synchronize_session=False)
+            )
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+
+def get_cart_store():
+    """Get the configured cart store (CART_STORE config)."""
+    if current_app.config.get('CART_STORE', 'db') == 'session':
+        return SessionCartStore()
+    return DatabaseCartStore(get_session())
+
+
+def get_cart_id() -> str:
+    """Get (or create) the cart id for the current browser session."""
+    cart_id = flask_session.get('cart_id')
+    if not cart_id:
+        cart_id = uuid.uuid4().hex
+        flask_session['cart_id'] = cart_id
+    return cart_id
+
+
+def purge_stale_carts(session, max_age_hours: int = 72) -> int:
+    """
+    Delete abandoned carts: every line of the carts whose most recent line
+    change is older than max_age_hours. Carts still in use keep all their
+    lines, even old ones.
+
+    Returns:
+        int: Number of lines deleted
+    """
+    from app.utils.formatters import get_now_ar
+    cutoff = get_now_ar() - timedelta(hours=max_age_hours)
+
+    stale_carts = (
+        session.query(PosCartLine.cart_id)
+        .group_by(PosCartLine.cart_id)
+        .having(func.max(PosCartLine.updated_at) < cutoff)
+    )
+    deleted = (
+        session.query(PosCartLine)
+        .filter(PosCartLine.cart_id.in_(stale_carts.scalar_subquery()))
+        .delete(synchronize_session=False)
+    )
+    session.commit()
+    return deleted
@@ -0,0 +1,46 @@
+"""
+Document number allocation (per-scope, per-day counters).
+
+next_document_number() increments document_sequence with a single
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so allocation is O(1) and
+two concurrent transactions can never get the same number: the second one
+waits on the counter row until the first commits or rolls back.
+
+The counter is part of the caller's transaction (no commit here). A rolled
+back document releases its number, so sequences have no gaps; the price is
+that concurrent documents of the same scope are created one at a time, so
+allocate the number close to the final commit.
+
+Usage:
+    seq = next_document_number(session, 'QUOTE')
+    number = f"PRES-{...}-{seq:04d}"
+"""
+from datetime import date
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import DocumentSequence
+
+
+def next_document_number(session, scope: str, period: Optional[date] = None) -> int:
+    """
+    Allocate the next number of a scope for a period.
+    
+    Args:
+        session: SQLAlchemy session (the caller commits)
+        scope: Document kind, e.g. 'QUOTE'
+        period: Counter period (default: today, Argentina local date)
+    
+    Returns:
+        int: Allocated number (1 for the first document of the period)
+    """
+    if period is None:
+        from app.utils.formatters import get_now_ar
+        period = get_now_ar().date()
+    
+    stmt = pg_insert(DocumentSequence).values(scope=scope, period=period, last_value=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DocumentSequence.scope, DocumentSequence.period],
+        set_={'last_value': DocumentSequence.last_value + 1}
+    ).returning(DocumentSequence.last_value)
+    
+    return session.execute(stmt).scalar_one()
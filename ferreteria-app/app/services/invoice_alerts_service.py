@@ -1,9 +1,33 @@
 """
 Service for invoice alerts and critical invoice tracking.
+
+The navbar badge is rendered on every page, so get_cached_invoice_alert_counts
+keeps the counts in a small per-worker cache (app.utils.cache.TTLCache) keyed
+by the reference date. Invoice writes (create, edit, delete, payments, due
+date changes) call invalidate_invoice_alerts() after committing; other
+workers pick up the change within INVOICE_ALERTS_CACHE_TTL seconds.
 """
 from datetime import date, timedelta
+from flask import current_app
 from sqlalchemy import and_, or_
 from app.models import PurchaseInvoice, InvoiceStatus
+from app.utils.cache import TTLCache
+
+
+EMPTY_INVOICE_ALERTS = {'due_tomorrow_count': 0, 'overdue_count': 0, 'total_critical': 0}
+
+_cache = None
+
+
+def _get_cache() -> TTLCache:
+    """Get (or lazily create) the worker-local alert counts cache."""
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(
+            maxsize=4,
+            ttl=current_app.config.get('INVOICE_ALERTS_CACHE_TTL', 60)
+        )
+    return _cache
 
 
 def get_invoice_alert_counts(session, today: date = None):
@@ -50,6 +74,35 @@ def get_invoice_alert_counts(session, today: date = None):
     }
 
 
+def get_cached_invoice_alert_counts(session, today: date = None):
+    """
+    Same as get_invoice_alert_counts, served from the alert counts cache.
+    
+    Args:
+        session: SQLAlchemy session
+        today: Date to use as reference (defaults to Argentina local date)
+    
+    Returns:
+        dict with due_tomorrow_count, overdue_count and total_critical
+    """
+    if today is None:
+        from app.utils.formatters import get_now_ar
+        today = get_now_ar().date()
+    
+    cache = _get_cache()
+    alerts = cache.get(today)
+    if alerts is None:
+        alerts = get_invoice_alert_counts(session, today)
+        cache.set(today, alerts)
+    return alerts
+
+
+def invalidate_invoice_alerts() -> None:
+    """Drop cached alert counts (this worker only). Call after invoice writes commit."""
+    if _cache is not None:
+        _cache.clear()
+
+
 def is_invoice_overdue(invoice, today: date = None):
     """
     Check if an invoice is overdue.
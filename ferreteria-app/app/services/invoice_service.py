@@ -8,6 +8,7 @@ from app.models import (
     StockMove, StockMoveLine,
     InvoiceStatus, StockMoveType, StockReferenceType
 )
+from app.services.invoice_alerts_service import invalidate_invoice_alerts
 
 
 def create_invoice_with_lines(payload: dict, session) -> int:
@@ -214,6 +215,7 @@ def create_invoice_with_lines(payload: dict, session) -> int:
         
         # Commit transaction
         session.commit()
+        invalidate_invoice_alerts()
         
         return invoice.id
         
@@ -489,6 +491,7 @@ def update_invoice_with_lines(invoice_id: int, payload: dict, session) -> None:
         
         # Commit transaction
         session.commit()
+        invalidate_invoice_alerts()
         
     except ValueError:
         session.rollback()
@@ -556,6 +559,7 @@ def delete_invoice(invoice_id: int, session) -> None:
             # No lines, just delete
             session.delete(invoice)
             session.commit()
+            invalidate_invoice_alerts()
             return
         
         # Step 4: Create stock_move to revert stock (type ADJUST with negative qty)
@@ -590,6 +594,7 @@ def delete_invoice(invoice_id: int, session) -> None:
         
         # Commit transaction
         session.commit()
+        invalidate_invoice_alerts()
         
     except ValueError:
         session.rollback()
@@ -8,6 +8,7 @@ from app.models import (
     FinanceLedger, LedgerType, LedgerReferenceType, PaymentMethod  # MEJORA 12
 )
 from sqlalchemy import func
+from app.services.invoice_alerts_service import invalidate_invoice_alerts
 
 
 def pay_invoice(invoice_id: int, paid_at: date, session, payment_method: str = 'CASH') -> None:
@@ -118,6 +119,7 @@ def pay_invoice(invoice_id: int, paid_at: date, session, payment_method: str = '
         
         # Step 7: Commit transaction
         session.commit()
+        invalidate_invoice_alerts()
         
     except ValueError:
         # Business logic errors - rollback and re-raise
@@ -255,6 +257,7 @@ def add_invoice_payment(invoice_id: int, paid_at: date, amount: Decimal, session
         
         # Step 9: Commit transaction
         session.commit()
+        invalidate_invoice_alerts()
         
     except ValueError:
         session.rollback()
@@ -270,6 +273,27 @@ def add_invoice_payment(invoice_id: int, paid_at: date, amount: Decimal, session
         raise Exception(f'Error al procesar pago parcial: {str(e)}')
 
 
+def invoice_paid_subquery(session):
+    """
+    Grouped subquery with the amount paid per invoice (MEJORA B).
+    
+    Outer-join it on invoice_id to get total_paid/balance for many invoices
+    in the same query instead of calling get_invoice_balance per invoice.
+    
+    Columns:
+        - invoice_id
+        - total_paid
+    """
+    return (
+        session.query(
+            PurchaseInvoicePayment.invoice_id.label('invoice_id'),
+            func.sum(PurchaseInvoicePayment.amount).label('total_paid')
+        )
+        .group_by(PurchaseInvoicePayment.invoice_id)
+        .subquery()
+    )
+
+
 def get_invoice_balance(invoice_id: int, session) -> dict:
     """
     Calculate the balance of an invoice (MEJORA B).
@@ -0,0 +1,247 @@
+"""
+Quote PDF rendering in a worker process pool, with a content-addressed cache.
+
+Rendering a quote with reportlab used to happen inside the request, holding
+one of the two gunicorn sync workers (and its GIL) for the whole render.
+Persisted quote PDFs are now rendered by a ProcessPoolExecutor (PDF_WORKERS
+processes per gunicorn worker) and written to PDF_CACHE_DIR as
+quote-<id>-<hash>.pdf.
+
+The hash covers everything printed on the PDF (header, lines, business info)
+plus PDF_LAYOUT_VERSION, so any change produces a new file and an unchanged
+quote is always a file read. The hash doubles as the ETag of the download.
+update_quote drops the cached files of the quote (invalidate_quote_pdf).
+
+Job API (used by app.blueprints.quotes):
+- submit_quote_pdf(): returns a job id; no-op if that content is already
+  cached or being rendered (prepare_quote_pdf() + queue_quote_pdf(), split
+  so a download can answer 304 from the hash before queueing anything)
+- get_job_status(): 'done', 'pending', 'failed' or 'unknown'
+- get_job_path(): file to send once the job is done
+
+The job id is the cache key ("<quote_id>-<hash>"), so the file on disk is
+the state shared by all gunicorn workers. In-flight renders are only known
+to the worker that submitted them; other workers report 'unknown' until the
+file appears, and the caller may resubmit.
+"""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from flask import current_app
+from app.models import Quote
+
+
+JOB_ID_RE = re.compile(r'^(\d+)-([0-9a-f]{64})$')
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get (or lazily create) the worker-local render pool."""
+    global _executor
+    with _lock:
+        if _executor is None:
+            # spawn: children do not inherit the DB connection pool
+            _executor = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_WORKERS', 1),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    """Drop a broken pool so the next submit creates a new one."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _cache_dir() -> str:
+    """PDF cache directory (created on first use)."""
+    path = current_app.config.get('PDF_CACHE_DIR', '/tmp/ferreteria-pdf')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def quote_pdf_hash(cart: dict, business_info: dict) -> str:
+    """
+    Content hash of a quote PDF (sha256 hex).
+
+    Args:
+        cart, business_info: As returned by get_quote_pdf_data
+    """
+    from app.services.quote_service import PDF_LAYOUT_VERSION
+
+    content = {
+        'layout': PDF_LAYOUT_VERSION,
+        'items': cart['items'],
+        # status is not printed: SENT -> ACCEPTED keeps the same PDF
+        'info': {key: value for key, value in business_info.items() if key != 'status'}
+    }
+    payload = json.dumps(content, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def job_etag(job_id: str) -> str:
+    """ETag of a job's PDF (its content hash)."""
+    return job_id.rpartition('-')[2]
+
+
+def parse_job_id(job_id: str) -> Optional[int]:
+    """Return the quote id of a well-formed job id, else None."""
+    match = JOB_ID_RE.match(job_id or '')
+    return int(match.group(1)) if match else None
+
+
+def get_job_path(job_id: str) -> str:
+    """Path of the rendered PDF for a job (may not exist yet)."""
+    if parse_job_id(job_id) is None:
+        raise ValueError(f'Trabajo de PDF inválido: {job_id}')
+    return os.path.join(_cache_dir(), f'quote-{job_id}.pdf')
+
+
+def _render_quote_pdf_to_file(quote_id: int, cart: dict, business_info: dict, path: str) -> str:
+    """
+    Render a quote PDF and write it to path (runs in the pool process).
+
+    Written to a temporary file and renamed, so readers never see a partial
+    PDF. Older versions of the same quote are removed.
+    """
+    from app.services.quote_service import generate_quote_pdf_persisted
+
+    buffer = generate_quote_pdf_persisted(cart, business_info)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+
+    for old_path in glob.glob(os.path.join(os.path.dirname(path), f'quote-{quote_id}-*.pdf')):
+        if old_path != path:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    return path
+
+
+def prepare_quote_pdf(session, quote: Quote, business_info: dict) -> tuple:
+    """
+    Load the quote data and compute its job id (content hash), without
+    queueing anything: enough to answer a conditional request (ETag).
+
+    Returns:
+        tuple: (job_id, cart, quote_business_info) for queue_quote_pdf
+    """
+    from app.services.quote_service import get_quote_pdf_data
+
+    cart, quote_business_info = get_quote_pdf_data(quote.id, session, business_info)
+    job_id = f'{quote.id}-{quote_pdf_hash(cart, quote_business_info)}'
+    return job_id, cart, quote_business_info
+
+
+def queue_quote_pdf(quote_id: int, prepared: tuple) -> str:
+    """
+    Queue the render of a prepared quote PDF (see prepare_quote_pdf).
+
+    Returns:
+        str: Job id
+    """
+    job_id, cart, quote_business_info = prepared
+    path = get_job_path(job_id)
+
+    if os.path.exists(path):
+        return job_id
+
+    with _lock:
+        future = _jobs.get(job_id)
+        if future is not None and not future.done():
+            return job_id
+
+        # Forget finished jobs (their result is on disk or they failed)
+        for key in [key for key, f in _jobs.items() if f.done()]:
+            del _jobs[key]
+
+    args = (_render_quote_pdf_to_file, quote_id, cart, quote_business_info, path)
+    try:
+        future = _get_executor().submit(*args)
+    except BrokenProcessPool:
+        # A render process died: start a fresh pool
+        _reset_executor()
+        future = _get_executor().submit(*args)
+
+    with _lock:
+        _jobs[job_id] = future
+
+    return job_id
+
+
+def submit_quote_pdf(session, quote: Quote, business_info: dict) -> str:
+    """
+    Queue the PDF render of a quote (current content).
+
+    Only the quote data is loaded here (to compute the content hash); the
+    render runs in the pool.
+
+    Returns:
+        str: Job id
+    """
+    return queue_quote_pdf(quote.id, prepare_quote_pdf(session, quote, business_info))
+
+
+def invalidate_quote_pdf(quote_id: int) -> None:
+    """Delete every cached PDF of a quote (after edits)."""
+    for path in glob.glob(os.path.join(_cache_dir(), f'quote-{quote_id}-*.pdf')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_job_status(job_id: str) -> str:
+    """Status of a job: 'done', 'pending', 'failed' or 'unknown'."""
+    if os.path.exists(get_job_path(job_id)):
+        return 'done'
+
+    with _lock:
+        future = _jobs.get(job_id)
+
+    if future is None:
+        return 'unknown'
+    if not future.done():
+        return 'pending'
+    if future.exception() is not None:
+        current_app.logger.error(f"PDF job {job_id} failed: {future.exception()}")
+        return 'failed'
+    return 'unknown'
+
+
+def wait_for_job(job_id: str, timeout: float) -> str:
+    """
+    Block until a job submitted by this worker finishes (sync fallback).
+
+    Returns:
+        str: Final status (see get_job_status)
+    """
+    with _lock:
+        future = _jobs.get(job_id)
+
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+
+    return get_job_status(job_id)
@@ -0,0 +1,364 @@
+"""
+Bulk price updates (weekly repricing).
+
+Prices used to be changed one product at a time through
+catalog.update_product, which deletes and recreates the product_uom_price
+rows of each product. A price update selects products by category, supplier
+(any purchase invoice from it) and/or search text and applies a rule to all
+their product_uom_price rows:
+
+- PERCENT: price * (1 + value / 100)
+- MARKUP: last purchase unit cost * conversion_to_base * (1 + value / 100)
+  (products never purchased are left out)
+
+then rounds to rounding_step (nearest, or up). The new prices are computed
+by PostgreSQL from one SELECT, so the preview and the apply see exactly the
+same rows. apply_price_update() runs in one transaction:
+
+1. INSERT ... SELECT the changed rows into price_history (old / new price)
+2. UPDATE product_uom_price FROM price_history
+3. UPDATE product.sale_price (legacy copy of the base price) FROM the same rows
+
+No per-product queries, so repricing thousands of items is one round trip
+per statement.
+
+Every preview carries a one-time token that apply stores in
+price_update.preview_token (UNIQUE): a double-submitted or replayed apply of
+the same preview is rejected instead of compounding the change (+10% twice
+would be +21%).
+"""
+import uuid
+from decimal import Decimal
+from sqlalchemy import Numeric, case, exists, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from app.models import (
+    Product, ProductUomPrice, UOM, Category, Supplier,
+    PurchaseInvoice, PurchaseInvoiceLine, PriceUpdate, PriceHistory
+)
+from app.services.product_search_service import build_product_search_filter
+
+
+PRICE_RULES = ('PERCENT', 'MARKUP')
+ROUNDING_STEPS = ('0.01', '1', '5', '10', '50', '100')
+MIN_PERCENT = Decimal('-90')
+MAX_PERCENT = Decimal('1000')
+PREVIEW_LIMIT = 200
+
+
+def build_price_rule(rule: str, value, rounding_step: str = '0.01', round_up: bool = False) -> dict:
+    """
+    Validate a repricing rule.
+
+    Args:
+        rule: 'PERCENT' or 'MARKUP'
+        value: Percentage (Decimal)
+        rounding_step: One of ROUNDING_STEPS
+        round_up: Round up to the step instead of to the nearest
+
+    Returns:
+        dict: rule, value, rounding_step (Decimal), round_up
+
+    Raises:
+        ValueError: If the rule is invalid
+    """
+    if rule not in PRICE_RULES:
+        raise ValueError('Regla de precios inválida')
+    if value is None:
+        raise ValueError('Ingrese el porcentaje')
+    if rule == 'PERCENT' and value == 0:
+        raise ValueError('El porcentaje debe ser distinto de 0')
+    if rule == 'MARKUP' and value < 0:
+        raise ValueError('El margen sobre el costo no puede ser negativo')
+    if not MIN_PERCENT <= value <= MAX_PERCENT:
+        raise ValueError(f'El porcentaje debe estar entre {MIN_PERCENT} y {MAX_PERCENT}')
+    if rounding_step not in ROUNDING_STEPS:
+        raise ValueError('Redondeo inválido')
+
+    return {
+        'rule': rule,
+        'value': value,
+        'rounding_step': Decimal(rounding_step),
+        'round_up': bool(round_up)
+    }
+
+
+def _latest_unit_cost():
+    """Unit cost of the latest purchase invoice line of each product (DISTINCT ON)."""
+    return (
+        select(PurchaseInvoiceLine.product_id, PurchaseInvoiceLine.unit_cost)
+        .distinct(PurchaseInvoiceLine.product_id)
+        .order_by(PurchaseInvoiceLine.product_id, PurchaseInvoiceLine.id.desc())
+        .subquery('latest_cost')
+    )
+
+
+def _new_price_expr(raw, price_rule: dict):
+    """Round a computed price to the rule's step (never to 0 if it was positive)."""
+    step = literal(price_rule['rounding_step'], Numeric(10, 2))
+    steps = func.ceil(raw / step) if price_rule['round_up'] else func.round(raw / step)
+    rounded = func.round(steps * step, 2)
+    return case((raw > 0, func.greatest(rounded, step)), else_=0)
+
+
+def _changed_prices(price_rule: dict, criteria: dict):
+    """
+    Product UOM prices selected by the criteria whose price the rule changes.
+
+    Args:
+        price_rule: As returned by build_price_rule
+        criteria: dict with category_id, supplier_id, search_query,
+                  include_inactive
+
+    Returns:
+        Subquery with product_id, uom_id, old_price, new_price
+    """
+    factor = literal(1 + price_rule['value'] / 100, Numeric(10, 4))
+
+    query = (
+        select(ProductUomPrice.product_id, ProductUomPrice.uom_id, ProductUomPrice.sale_price)
+        .join(Product, Product.id == ProductUomPrice.product_id)
+    )
+
+    if price_rule['rule'] == 'MARKUP':
+        latest_cost = _latest_unit_cost()
+        query = query.join(latest_cost, latest_cost.c.product_id == ProductUomPrice.product_id)
+        raw = latest_cost.c.unit_cost * ProductUomPrice.conversion_to_base * factor
+    else:
+        raw = ProductUomPrice.sale_price * factor
+
+    query = query.add_columns(_new_price_expr(raw, price_rule).label('new_price'))
+
+    if not criteria.get('include_inactive'):
+        query = query.where(Product.active == True)
+
+    if criteria.get('category_id'):
+        query = query.where(Product.category_id == criteria['category_id'])
+
+    if criteria.get('supplier_id'):
+        query = query.where(
+            exists()
+            .where(
+                PurchaseInvoiceLine.product_id == Product.id,
+                PurchaseInvoice.id == PurchaseInvoiceLine.invoice_id,
+                PurchaseInvoice.supplier_id == criteria['supplier_id']
+            )
+        )
+
+    search_filter = build_product_search_filter(criteria.get('search_query', ''))
+    if search_filter is not None:
+        query = query.where(search_filter)
+
+    candidates = query.subquery('candidates')
+    return (
+        select(
+            candidates.c.product_id,
+            candidates.c.uom_id,
+            candidates.c.sale_price.label('old_price'),
+            candidates.c.new_price
+        )
+        .where(candidates.c.new_price != candidates.c.sale_price)
+        .subquery('changed')
+    )
+
+
+def describe_criteria(session, criteria: dict) -> str:
+    """Human readable selection (stored in price_update.filters)."""
+    parts = []
+
+    if criteria.get('category_id'):
+        category = session.query(Category).filter_by(id=criteria['category_id']).first()
+        parts.append(f'Categoría: {category.name if category else criteria["category_id"]}')
+
+    if criteria.get('supplier_id'):
+        supplier = session.query(Supplier).filter_by(id=criteria['supplier_id']).first()
+        parts.append(f'Proveedor: {supplier.name if supplier else criteria["supplier_id"]}')
+
+    if criteria.get('search_query'):
+        parts.append(f'Búsqueda: "{criteria["search_query"]}"')
+
+    if criteria.get('include_inactive'):
+        parts.append('Incluye inactivos')
+
+    return '; '.join(parts) or 'Todos los productos'
+
+
+def preview_price_update(session, price_rule: dict, criteria: dict, limit: int = PREVIEW_LIMIT) -> dict:
+    """
+    Preview the prices a rule would change (nothing is written).
+
+    Returns:
+        dict:
+            - count: product UOM prices that change
+            - product_count: distinct products
+            - old_total, new_total: sum of the prices before / after
+            - rows: first `limit` changes by product name (product_id, name,
+              sku, uom_symbol, is_base, old_price, new_price, change_pct)
+            - token: one-time token to pass to apply_price_update
+    """
+    changed = _changed_prices(price_rule, criteria)
+
+    totals = session.execute(
+        select(
+            func.count(),
+            func.count(func.distinct(changed.c.product_id)),
+            func.coalesce(func.sum(changed.c.old_price), 0),
+            func.coalesce(func.sum(changed.c.new_price), 0)
+        ).select_from(changed)
+    ).one()
+
+    rows = session.execute(
+        select(
+            changed.c.product_id,
+            Product.name,
+            Product.sku,
+            UOM.symbol.label('uom_symbol'),
+            ProductUomPrice.is_base,
+            changed.c.old_price,
+            changed.c.new_price
+        )
+        .join(Product, Product.id == changed.c.product_id)
+        .join(UOM, UOM.id == changed.c.uom_id)
+        .join(
+            ProductUomPrice,
+            (ProductUomPrice.product_id == changed.c.product_id) & (ProductUomPrice.uom_id == changed.c.uom_id)
+        )
+        .order_by(Product.name, Product.id, ProductUomPrice.is_base.desc())
+        .limit(limit)
+    ).all()
+
+    items = []
+    for row in rows:
+        change_pct = None
+        if row.old_price:
+            change_pct = ((row.new_price - row.old_price) / row.old_price * 100).quantize(Decimal('0.1'))
+        items.append({
+            'product_id': row.product_id,
+            'name': row.name,
+            'sku': row.sku,
+            'uom_symbol': row.uom_symbol,
+            'is_base': row.is_base,
+            'old_price': row.old_price,
+            'new_price': row.new_price,
+            'change_pct': change_pct
+        })
+
+    return {
+        'count': totals[0],
+        'product_count': totals[1],
+        'old_total': totals[2],
+        'new_total': totals[3],
+        'rows': items,
+        'token': uuid.uuid4().hex
+    }
+
+
+def apply_price_update(session, price_rule: dict, criteria: dict, preview_token: str,
+                       expected_count: int = None) -> PriceUpdate:
+    """
+    Apply a rule to the selected prices in one transaction.
+
+    Args:
+        session: SQLAlchemy session
+        price_rule: As returned by build_price_rule
+        criteria: Product selection (see _changed_prices)
+        preview_token: Token of the preview being applied (only once)
+        expected_count: Number of changes shown in the preview; if the
+                        selection no longer matches, nothing is applied
+
+    Returns:
+        PriceUpdate: The recorded update (item_count = prices changed)
+
+    Raises:
+        ValueError: If no price changes, the preview is stale or it was
+                    already applied
+    """
+    if not preview_token:
+        raise ValueError('Falta la vista previa: calcúlela antes de aplicar')
+
+    already_applied = ValueError('Esta vista previa ya fue aplicada. Calcule una nueva vista previa.')
+    if session.query(PriceUpdate.id).filter_by(preview_token=preview_token).first():
+        raise already_applied
+
+    changed = _changed_prices(price_rule, criteria)
+
+    try:
+        price_update = PriceUpdate(
+            rule=price_rule['rule'],
+            value=price_rule['value'],
+            rounding_step=price_rule['rounding_step'],
+            round_up=price_rule['round_up'],
+            filters=describe_criteria(session, criteria),
+            preview_token=preview_token
+        )
+        session.add(price_update)
+        try:
+            session.flush()
+        except IntegrityError:
+            # Concurrent apply of the same preview (UNIQUE preview_token)
+            raise already_applied
+
+        result = session.execute(
+            insert(PriceHistory).from_select(
+                ['price_update_id', 'product_id', 'uom_id', 'old_price', 'new_price'],
+                select(
+                    literal(price_update.id),
+                    changed.c.product_id,
+                    changed.c.uom_id,
+                    changed.c.old_price,
+                    changed.c.new_price
+                )
+            )
+        )
+        count = result.rowcount
+
+        if count == 0:
+            raise ValueError('Ningún precio cambia con esta regla')
+        if expected_count is not None and count != expected_count:
+            raise ValueError(
+                f'Los precios cambiaron desde la vista previa ({expected_count} → {count}). '
+                'Revise la vista previa nuevamente.'
+            )
+
+        session.execute(
+            update(ProductUomPrice)
+            .where(
+                PriceHistory.price_update_id == price_update.id,
+                PriceHistory.product_id == ProductUomPrice.product_id,
+                PriceHistory.uom_id == ProductUomPrice.uom_id
+            )
+            .values(sale_price=PriceHistory.new_price)
+            .execution_options(synchronize_session=False)
+        )
+
+        # product.sale_price mirrors the base UOM price
+        session.execute(
+            update(Product)
+            .where(
+                PriceHistory.price_update_id == price_update.id,
+                PriceHistory.product_id == Product.id,
+                ProductUomPrice.product_id == Product.id,
+                ProductUomPrice.uom_id == PriceHistory.uom_id,
+                ProductUomPrice.is_base == True
+            )
+            .values(sale_price=PriceHistory.new_price)
+            .execution_options(synchronize_session=False)
+        )
+
+        price_update.item_count = count
+        session.commit()
+        return price_update
+
+    except Exception:
+        session.rollback()
+        raise
+
+
+def get_recent_price_updates(session, limit: int = 10) -> list:
+    """Latest price updates (most recent first)."""
+    return (
+        session.query(PriceUpdate)
+        .order_by(PriceUpdate.created_at.desc(), PriceUpdate.id.desc())
+        .limit(limit)
+        .all()
+    )
+
@@ -0,0 +1,555 @@
+"""
+Bulk product import / export (supplier price lists).
+
+Import reads a CSV (';', ',' or tab separated) or XLSX file row by row and
+processes it in chunks of IMPORT_CHUNK_SIZE rows. Per chunk:
+
+1. Rows are validated against UOM / category maps loaded once per import
+2. One query finds the products that already exist (by SKU) and one the
+   owners of the barcodes in the chunk
+3. Products are upserted with a single INSERT ... ON CONFLICT (sku); base
+   prices of existing products are set with one UPDATE ... FROM (VALUES ...)
+   and the price rows of new products added with one INSERT
+4. The chunk is committed; row-level problems are reported, not raised
+
+Columns (header row, case and accents ignored):
+    sku, nombre, precio (required), unidad (required for new products),
+    codigo_barras, categoria, stock_minimo, activo (optional)
+
+Optional cells left blank (or columns missing from the header) keep the
+current value of existing products. Only the base UOM price is imported;
+other UOM prices of existing products are kept. Export writes the same
+columns, so an exported file can be edited and imported back.
+
+XLSX needs openpyxl (optional dependency).
+"""
+import csv
+import io
+import itertools
+from decimal import Decimal
+from sqlalchemy import BigInteger, Numeric, and_, column, func, insert, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models import Product, ProductUomPrice, UOM, Category
+from app.services.product_search_service import normalize_search_term
+from app.utils.decimal_parser import parse_decimal_ar
+
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 500
+
+EXPORT_COLUMNS = ['sku', 'codigo_barras', 'nombre', 'categoria', 'unidad', 'precio', 'stock_minimo', 'activo']
+REQUIRED_COLUMNS = ('sku', 'nombre', 'precio')
+
+# Header aliases found in supplier price lists
+COLUMN_ALIASES = {
+    'codigo': 'sku',
+    'cod': 'sku',
+    'articulo': 'sku',
+    'descripcion': 'nombre',
+    'producto': 'nombre',
+    'precio_venta': 'precio',
+    'precio_de_venta': 'precio',
+    'barcode': 'codigo_barras',
+    'ean': 'codigo_barras',
+    'codigo_de_barras': 'codigo_barras',
+    'rubro': 'categoria',
+    'unidad_de_medida': 'unidad',
+    'uom': 'unidad',
+    'minimo': 'stock_minimo',
+    'stock_min': 'stock_minimo',
+}
+
+TRUE_VALUES = {'si', 's', '1', 'true', 'x', 'activo'}
+FALSE_VALUES = {'no', 'n', '0', 'false', 'inactivo'}
+
+
+def _column_key(header) -> str:
+    """Canonical column name for a header cell ("Código de barras" -> codigo_barras)."""
+    key = normalize_search_term(str(header or '')).replace(' ', '_')
+    return COLUMN_ALIASES.get(key, key)
+
+
+def _cell_value(value):
+    """
+    Normalize a raw cell: numbers (XLSX numeric cells) are kept numeric,
+    everything else becomes trimmed text ('' for empty cells).
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'si' if value else 'no'
+    if isinstance(value, (int, float, Decimal)):
+        return value
+    return str(value).strip()
+
+
+def _cell_text(value) -> str:
+    """Cell value as text (XLSX numbers like 12345.0 -> "12345")."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _cell_decimal(value, field_name: str) -> Decimal:
+    """
+    Cell value as Decimal.
+
+    XLSX numbers are converted as-is (Decimal(str(1523.456)) == 1523.456);
+    only text cells go through the AR parser, where "1.234,5" means 1234.5.
+    """
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    return parse_decimal_ar(value.replace('$', '').strip(), field_name=field_name)
+
+
+def _read_csv(stream, encoding: str):
+    """Yield the rows of a CSV file (delimiter guessed from the header line)."""
+    text = io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+    first = text.readline()
+    delimiter = max(';', ',', '\t', key=first.count)
+    yield from csv.reader(itertools.chain([first], text), delimiter=delimiter)
+
+
+def _read_xlsx(stream):
+    """Yield the rows of the first sheet of an XLSX file (read-only mode)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Para importar archivos XLSX instale openpyxl (pip install openpyxl) o use CSV')
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_file_rows(stream, filename: str, encoding: str = 'utf-8-sig'):
+    """Yield raw rows of an uploaded file according to its extension."""
+    if (filename or '').lower().endswith('.xlsx'):
+        return _read_xlsx(stream)
+    if (filename or '').lower().endswith(('.csv', '.txt')):
+        return _read_csv(stream, encoding)
+    raise ValueError('Formato no soportado: use un archivo .csv o .xlsx')
+
+
+def _load_maps(session) -> dict:
+    """UOM and category lookup maps (lowercase name / symbol -> id)."""
+    uoms = {}
+    for uom_id, name, symbol in session.query(UOM.id, UOM.name, UOM.symbol).all():
+        uoms.setdefault(symbol.strip().lower(), uom_id)
+        uoms[name.strip().lower()] = uom_id
+
+    categories = {
+        name.strip().lower(): category_id
+        for category_id, name in session.query(Category.id, Category.name).all()
+    }
+    return {'uoms': uoms, 'categories': categories}
+
+
+def _parse_bool(text: str):
+    """Parse an activo cell (si/no, 1/0, ...); None if not recognized."""
+    value = normalize_search_term(text)
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    return None
+
+
+def _parse_row(cells: dict, maps: dict) -> dict:
+    """
+    Validate one row (no database access).
+
+    Returns:
+        dict with sku, name, price, uom_id, barcode, category_name,
+        min_stock_qty, active (None = not given)
+
+    Raises:
+        ValueError: With the message to report for the row
+    """
+    text = {key: _cell_text(value) for key, value in cells.items()}
+
+    sku = text.get('sku', '')
+    name = text.get('nombre', '')
+    if not sku:
+        raise ValueError('Falta el SKU')
+    if len(sku) > 64:
+        raise ValueError(f'SKU demasiado largo ("{sku[:20]}...")')
+    if not name:
+        raise ValueError('Falta el nombre')
+    if len(name) > 200:
+        raise ValueError('Nombre demasiado largo (máximo 200 caracteres)')
+
+    if cells.get('precio', '') == '':
+        raise ValueError('Falta el precio')
+    try:
+        price = _cell_decimal(cells['precio'], 'precio')
+    except ValueError:
+        raise ValueError(f'Precio inválido ("{text["precio"]}")')
+    if price < 0:
+        raise ValueError('El precio no puede ser negativo')
+
+    uom_id = None
+    uom_text = text.get('unidad', '')
+    if uom_text:
+        uom_id = maps['uoms'].get(uom_text.lower())
+        if uom_id is None:
+            raise ValueError(f'Unidad de medida desconocida ("{uom_text}")')
+
+    barcode = text.get('codigo_barras') or None
+    if barcode and len(barcode) > 64:
+        raise ValueError('Código de barras demasiado largo')
+
+    min_stock_qty = None
+    if cells.get('stock_minimo', '') != '':
+        try:
+            min_stock_qty = _cell_decimal(cells['stock_minimo'], 'stock_minimo')
+        except ValueError:
+            raise ValueError(f'Stock mínimo inválido ("{text["stock_minimo"]}")')
+        if min_stock_qty < 0:
+            raise ValueError('El stock mínimo no puede ser negativo')
+
+    active = None
+    if text.get('activo'):
+        active = _parse_bool(text['activo'])
+        if active is None:
+            raise ValueError(f'Valor de "activo" inválido ("{text["activo"]}"): use si/no')
+
+    return {
+        'sku': sku,
+        'name': name,
+        'price': price,
+        'uom_id': uom_id,
+        'barcode': barcode,
+        'category_name': text.get('categoria') or None,
+        'min_stock_qty': min_stock_qty,
+        'active': active,
+    }
+
+
+def _ensure_categories(session, names: set, maps: dict) -> None:
+    """Create missing categories in one INSERT and add them to the map."""
+    missing = {}
+    for name in names:
+        if name.lower() not in maps['categories']:
+            missing.setdefault(name.lower(), name)
+    if not missing:
+        return
+
+    session.execute(
+        pg_insert(Category)
+        .values([{'name': name} for name in sorted(missing.values())])
+        .on_conflict_do_nothing(index_elements=[Category.name])
+    )
+    rows = session.query(Category.id, Category.name).filter(Category.name.in_(missing.values())).all()
+    for category_id, name in rows:
+        maps['categories'][name.strip().lower()] = category_id
+
+
+class ImportResult:
+    """Counters and row errors of an import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []  # [(row_number, message)], first MAX_REPORTED_ERRORS
+
+    def add_error(self, row_number: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+def _import_chunk(session, chunk: list, maps: dict, result: ImportResult,
+                  create_categories: bool) -> None:
+    """Validate and upsert one chunk of (row_number, parsed row) pairs."""
+    skus = [row['sku'] for _, row in chunk]
+    existing = {
+        product.sku: product
+        for product in (
+            session.query(
+                Product.sku, Product.id, Product.uom_id, Product.barcode,
+                Product.category_id, Product.min_stock_qty, Product.active
+            )
+            .filter(Product.sku.in_(skus))
+            .all()
+        )
+    }
+
+    barcodes = [row['barcode'] for _, row in chunk if row['barcode']]
+    barcode_owners = dict(
+        session.query(Product.barcode, Product.sku).filter(Product.barcode.in_(barcodes)).all()
+    ) if barcodes else {}
+
+    valid = []
+    seen_skus = set()
+    seen_barcodes = set()
+    for row_number, row in chunk:
+        current = existing.get(row['sku'])
+
+        if row['sku'] in seen_skus:
+            result.add_error(row_number, f'SKU "{row["sku"]}" repetido en el archivo')
+            continue
+        if current is None and row['uom_id'] is None:
+            result.add_error(row_number, 'Falta la unidad de medida (requerida para productos nuevos)')
+            continue
+        if current is not None and row['uom_id'] is not None and row['uom_id'] != current.uom_id:
+            result.add_error(row_number, 'No se puede cambiar la unidad base desde la importación')
+            continue
+        if row['barcode']:
+            taken = row['barcode'] in barcode_owners and barcode_owners[row['barcode']] != row['sku']
+            if taken or row['barcode'] in seen_barcodes:
+                result.add_error(row_number, f'Código de barras "{row["barcode"]}" ya usado por otro producto')
+                continue
+            seen_barcodes.add(row['barcode'])
+        if row['category_name'] and not create_categories \
+                and row['category_name'].lower() not in maps['categories']:
+            result.add_error(row_number, f'Categoría desconocida ("{row["category_name"]}")')
+            continue
+
+        seen_skus.add(row['sku'])
+        valid.append(row)
+
+    if not valid:
+        return
+
+    if create_categories:
+        _ensure_categories(session, {row['category_name'] for row in valid if row['category_name']}, maps)
+
+    # Cells left blank keep the current value (or the default for new products)
+    product_values = []
+    for row in valid:
+        current = existing.get(row['sku'])
+        category_id = maps['categories'].get(row['category_name'].lower()) if row['category_name'] else None
+
+        def pick(value, field, default):
+            if value is not None:
+                return value
+            return getattr(current, field) if current else default
+
+        product_values.append({
+            'sku': row['sku'],
+            'name': row['name'],
+            'barcode': pick(row['barcode'], 'barcode', None),
+            'category_id': pick(category_id, 'category_id', None),
+            'uom_id': current.uom_id if current else row['uom_id'],
+            'sale_price': row['price'],
+            'min_stock_qty': pick(row['min_stock_qty'], 'min_stock_qty', Decimal('0')),
+            'active': pick(row['active'], 'active', True),
+        })
+
+    stmt = pg_insert(Product).values(product_values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.sku],
+        set_={
+            'name': stmt.excluded.name,
+            'barcode': stmt.excluded.barcode,
+            'category_id': stmt.excluded.category_id,
+            'sale_price': stmt.excluded.sale_price,
+            'min_stock_qty': stmt.excluded.min_stock_qty,
+            'active': stmt.excluded.active,
+            'updated_at': func.now(),
+        }
+    )
+    product_ids = dict(session.execute(stmt.returning(Product.sku, Product.id)).all())
+    existing_ids = {product.id for product in existing.values()}
+
+    # Existing products: plain UPDATE of the current (product_id, uom_id) row.
+    # An INSERT ... ON CONFLICT with is_base=true would first run
+    # trg_check_single_base_uom (BEFORE INSERT demotes the current base row)
+    # and then try to update that same row again.
+    price_values = [
+        (product_ids[item['sku']], item['uom_id'], item['sale_price'])
+        for item in product_values
+    ]
+    existing_prices = [value for value in price_values if value[0] in existing_ids]
+    updated_ids = set()
+    if existing_prices:
+        rows = values(
+            column('product_id', BigInteger),
+            column('uom_id', BigInteger),
+            column('sale_price', Numeric(12, 2)),
+            name='import_price'
+        ).data(existing_prices)
+        updated_ids = {
+            product_id for (product_id,) in session.execute(
+                update(ProductUomPrice)
+                .where(
+                    ProductUomPrice.product_id == rows.c.product_id,
+                    ProductUomPrice.uom_id == rows.c.uom_id
+                )
+                .values(sale_price=rows.c.sale_price, updated_at=func.now())
+                .returning(ProductUomPrice.product_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+        }
+
+    # New products (and existing ones without a price row for their UOM)
+    new_prices = [value for value in price_values if value[0] not in updated_ids]
+    if new_prices:
+        session.execute(
+            insert(ProductUomPrice),
+            [
+                {
+                    'product_id': product_id,
+                    'uom_id': uom_id,
+                    'sale_price': sale_price,
+                    'conversion_to_base': Decimal('1'),
+                    'is_base': True,
+                }
+                for product_id, uom_id, sale_price in new_prices
+            ]
+        )
+
+    result.updated += sum(1 for row in valid if row['sku'] in existing)
+    result.created += sum(1 for row in valid if row['sku'] not in existing)
+
+
+def import_products(session, stream, filename: str, encoding: str = 'utf-8-sig',
+                    create_categories: bool = True) -> ImportResult:
+    """
+    Import (create or update) products from a CSV / XLSX price list.
+
+    Each chunk is committed on its own: a failing chunk is rolled back and
+    reported as errors on its rows, the rest of the file is still imported.
+
+    Args:
+        session: SQLAlchemy session
+        stream: Binary file object (e.g. request.files['file'].stream)
+        filename: Original file name (selects the format)
+        encoding: CSV text encoding ('utf-8-sig' or 'latin-1')
+        create_categories: Create categories not found (else report the row)
+
+    Returns:
+        ImportResult
+
+    Raises:
+        ValueError: If the file format or header is invalid
+    """
+    rows = _iter_file_rows(stream, filename, encoding)
+
+    header = next(rows, None)
+    if not header:
+        raise ValueError('El archivo está vacío')
+    keys = [_column_key(cell) for cell in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in keys]
+    if missing:
+        raise ValueError(f'Faltan columnas obligatorias: {", ".join(missing)}')
+
+    maps = _load_maps(session)
+    result = ImportResult()
+
+    def flush(chunk):
+        try:
+            _import_chunk(session, chunk, maps, result, create_categories)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            maps.update(_load_maps(session))  # Drop categories created by the failed chunk
+            for row_number, _ in chunk:
+                result.add_error(row_number, f'Error al guardar el bloque: {str(e)}')
+
+    chunk = []
+    for row_number, raw in enumerate(rows, start=2):
+        cells = {key: _cell_value(value) for key, value in zip(keys, raw)}
+        if not any(cell != '' for cell in cells.values()):
+            continue
+
+        result.rows += 1
+        try:
+            chunk.append((row_number, _parse_row(cells, maps)))
+        except ValueError as e:
+            result.add_error(row_number, str(e))
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush(chunk)
+            chunk = []
+
+    if chunk:
+        flush(chunk)
+
+    return result
+
+
+def _export_query(session):
+    """Products with their base price, category and UOM (export columns)."""
+    return (
+        session.query(
+            Product.sku,
+            Product.barcode,
+            Product.name,
+            Category.name,
+            UOM.name,
+            func.coalesce(ProductUomPrice.sale_price, Product.sale_price),
+            Product.min_stock_qty,
+            Product.active
+        )
+        .select_from(Product)
+        .join(UOM, UOM.id == Product.uom_id)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .outerjoin(ProductUomPrice, and_(
+            ProductUomPrice.product_id == Product.id,
+            ProductUomPrice.is_base == True
+        ))
+        .order_by(Product.name, Product.id)
+    )
+
+
+def _export_values(row) -> list:
+    """Export cells of one product (decimals with comma, as Excel es-AR expects)."""
+    sku, barcode, name, category, uom, price, min_stock_qty, active = row
+    return [
+        sku or '', barcode or '', name, category or '', uom,
+        str(price).replace('.', ','),
+        str(min_stock_qty or 0).replace('.', ','),
+        'si' if active else 'no'
+    ]
+
+
+def iter_products_csv(session, batch_size: int = 1000):
+    """
+    Yield the product list as CSV text chunks (';' separated, UTF-8 BOM).
+
+    Rows are fetched with a server-side cursor (yield_per), so memory does
+    not grow with the catalog.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    buffer.write('\ufeff')  # Excel detects UTF-8
+    writer.writerow(EXPORT_COLUMNS)
+
+    for number, row in enumerate(_export_query(session).yield_per(batch_size), start=1):
+        writer.writerow(_export_values(row))
+        if number % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def export_products_xlsx(session) -> io.BytesIO:
+    """Product list as an XLSX workbook (write-only mode)."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError('Para exportar XLSX instale openpyxl (pip install openpyxl) o use CSV')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Productos')
+    sheet.append(EXPORT_COLUMNS)
+    for row in _export_query(session).yield_per(1000):
+        sku, barcode, name, category, uom, price, min_stock_qty, active = row
+        sheet.append([
+            sku or '', barcode or '', name, category or '', uom,
+            float(price), float(min_stock_qty or 0), 'si' if active else 'no'
+        ])
+
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,138 @@
+"""
+Catalog product list: keyset pagination and cached totals.
+
+The list used to run query.count() and an OFFSET page on every request, so
+each page scrolled in append mode cost more than the previous one. Pages are
+now fetched after a cursor (the id of the last product shown): the sort
+values of that product are read back with primary key lookups, so page 200
+costs the same as page 1 and the URL only carries an id.
+
+The total shown above the list is counted once per filter combination and
+kept in a per-worker TTLCache (PRODUCT_COUNT_CACHE_TTL). Product creation and
+deletion call invalidate_product_counts(); stock changes that move products
+in or out of the stock filters show up when the entry expires.
+"""
+from flask import current_app
+from sqlalchemy import and_, func, or_, select, tuple_
+from app.models import Product, ProductStock
+from app.services.product_search_service import normalize_search_term, product_search_sort_keys
+from app.utils.cache import TTLCache
+
+
+_count_cache = None
+
+
+def _get_count_cache() -> TTLCache:
+    """Get (or lazily create) the worker-local product count cache."""
+    global _count_cache
+    if _count_cache is None:
+        _count_cache = TTLCache(
+            maxsize=256,
+            ttl=current_app.config.get('PRODUCT_COUNT_CACHE_TTL', 60)
+        )
+    return _count_cache
+
+
+def on_hand_expr():
+    """On-hand quantity of the product (0 when it has no product_stock row)."""
+    return func.coalesce(ProductStock.on_hand_qty, 0)
+
+
+def product_list_sort_keys(stock_filter: str = '', search_query: str = '') -> list:
+    """
+    Sort keys of the catalog list as (expression, descending) pairs.
+
+    - stock_filter 'mayor_stock': most stock first
+    - search query: relevance (see product_search_sort_keys)
+    - otherwise: name
+
+    Every ordering ends in Product.id, so it is total and keyset-safe.
+    """
+    if stock_filter == 'mayor_stock':
+        return [(on_hand_expr(), True), (Product.name, False), (Product.id, False)]
+
+    search_keys = product_search_sort_keys(search_query)
+    if search_keys:
+        return search_keys
+
+    return [(Product.name, False), (Product.id, False)]
+
+
+def sort_keys_order(keys: list) -> list:
+    """ORDER BY expressions for sort keys."""
+    return [expr.desc() if descending else expr for expr, descending in keys]
+
+
+def _cursor_value(expr, cursor_id: int):
+    """Value of a sort expression for the cursor product (scalar subquery)."""
+    if expr is Product.id:
+        return cursor_id
+    return (
+        select(expr)
+        .select_from(Product)
+        .outerjoin(ProductStock, ProductStock.product_id == Product.id)
+        .where(Product.id == cursor_id)
+        .correlate(None)
+        .scalar_subquery()
+    )
+
+
+def keyset_after(keys: list, cursor_id: int):
+    """
+    Filter the rows that sort after product cursor_id.
+
+    Consecutive keys with the same direction are compared as one row value,
+    e.g. (name, id) > (:name, :id) for the default order, which PostgreSQL
+    serves straight from idx_product_name_id.
+
+    Args:
+        keys: Sort keys (see product_list_sort_keys)
+        cursor_id: Last product of the previous page
+
+    Returns:
+        SQLAlchemy boolean expression
+    """
+    groups = []
+    for expr, descending in keys:
+        if groups and groups[-1][0] == descending:
+            groups[-1][1].append(expr)
+        else:
+            groups.append((descending, [expr]))
+
+    def as_row(exprs):
+        return exprs[0] if len(exprs) == 1 else tuple_(*exprs)
+
+    conditions = []
+    equal_so_far = []
+    for descending, exprs in groups:
+        column = as_row(exprs)
+        value = as_row([_cursor_value(expr, cursor_id) for expr in exprs])
+        after = column < value if descending else column > value
+        conditions.append(and_(*equal_so_far, after))
+        equal_so_far.append(column == value)
+
+    return or_(*conditions)
+
+
+def count_products_cached(query, search_query: str = '', category_id=None, stock_filter: str = '') -> int:
+    """
+    Count the products of a filtered list query, cached per filter combination.
+
+    Args:
+        query: Filtered list query (selecting from Product)
+        search_query, category_id, stock_filter: The filters applied to it
+                                                 (cache key)
+    """
+    key = (normalize_search_term(search_query), str(category_id or ''), stock_filter or '')
+    cache = _get_count_cache()
+
+    total = cache.get(key)
+    if total is None:
+        total = query.with_entities(func.count(Product.id)).scalar() or 0
+        cache.set(key, total)
+    return total
+
+
+def invalidate_product_counts() -> None:
+    """Drop the cached list totals (after creating or deleting products)."""
+    _get_count_cache().clear()
@@ -0,0 +1,144 @@
+"""
+Exact barcode/SKU lookup for barcode scans at the POS.
+
+Results are kept in a bounded LRU cache per worker (app.utils.cache.TTLCache)
+so repeated scans of the same code do not hit the database. Entries are
+plain dicts (never ORM instances) so they can outlive the request session.
+
+Invalidation:
+- invalidate_product(product_id) after product edits, activation changes,
+  deletion and UOM price changes are committed.
+- Other workers pick up changes when the entry expires
+  (PRODUCT_LOOKUP_CACHE_TTL seconds).
+
+The cached on_hand_qty is informational only; cart_add always re-validates
+stock against the database.
+"""
+from decimal import Decimal
+from typing import Optional
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+from app.models import Product, ProductUomPrice
+from app.utils.cache import TTLCache
+
+
+_cache = None
+
+
+def _get_cache() -> TTLCache:
+    """Get (or lazily create) the worker-local lookup cache."""
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(
+            maxsize=current_app.config.get('PRODUCT_LOOKUP_CACHE_SIZE', 2048),
+            ttl=current_app.config.get('PRODUCT_LOOKUP_CACHE_TTL', 30)
+        )
+    return _cache
+
+
+def normalize_code(code: str) -> str:
+    """Normalize a scanned/typed code: trim and lowercase."""
+    return (code or '').strip().lower()
+
+
+def looks_like_barcode(code: str) -> bool:
+    """True for codes shaped like a scanned EAN/UPC (8 to 14 digits)."""
+    key = normalize_code(code)
+    return key.isdigit() and 8 <= len(key) <= 14
+
+
+def _serialize_product(product: Product) -> dict:
+    """Build the cacheable representation of a product."""
+    base_price = next((up for up in product.uom_prices if up.is_base), None)
+
+    if base_price:
+        uom_id = base_price.uom_id
+        uom_symbol = base_price.uom.symbol if base_price.uom else None
+        sale_price = base_price.sale_price
+        conversion_to_base = base_price.conversion_to_base
+    else:
+        # Legacy products without product_uom_price rows
+        uom_id = product.uom_id
+        uom_symbol = product.uom.symbol if product.uom else None
+        sale_price = product.sale_price
+        conversion_to_base = Decimal('1')
+
+    return {
+        'product_id': product.id,
+        'name': product.name,
+        'sku': product.sku,
+        'barcode': product.barcode,
+        'active': product.active,
+        'uom_id': uom_id,
+        'uom_symbol': uom_symbol,
+        'sale_price': sale_price,
+        'conversion_to_base': conversion_to_base,
+        'uom_count': len(product.uom_prices),
+        'on_hand_qty': product.on_hand_qty
+    }
+
+
+def lookup_product_by_code(session, code: str) -> Optional[dict]:
+    """
+    Find a product by exact barcode or SKU (case-insensitive).
+
+    Barcode matches win over SKU matches. Misses are not cached, so a product
+    created with that code is found on the next scan.
+
+    Args:
+        session: SQLAlchemy session
+        code: Scanned barcode or typed SKU
+
+    Returns:
+        dict with product_id, name, sku, barcode, active, uom_id, uom_symbol,
+        sale_price, conversion_to_base, uom_count and on_hand_qty,
+        or None if no product has that code
+    """
+    key = normalize_code(code)
+    if not key:
+        return None
+
+    cache = _get_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Uses idx_product_barcode_lower / idx_product_sku_lower
+    candidates = (
+        session.query(Product)
+        .options(
+            joinedload(Product.stock),
+            joinedload(Product.uom),
+            joinedload(Product.uom_prices).joinedload(ProductUomPrice.uom)
+        )
+        .filter(or_(
+            func.lower(Product.barcode) == key,
+            func.lower(Product.sku) == key
+        ))
+        .all()
+    )
+
+    if not candidates:
+        return None
+
+    product = next(
+        (p for p in candidates if p.barcode and p.barcode.lower() == key),
+        candidates[0]
+    )
+
+    result = _serialize_product(product)
+    cache.set(key, result)
+    return result
+
+
+def invalidate_product(product_id: int) -> None:
+    """Drop every cached code that resolves to product_id (this worker only)."""
+    if _cache is not None:
+        _cache.delete_where(lambda entry: entry['product_id'] == product_id)
+
+
+def clear_product_lookup_cache() -> None:
+    """Drop the whole lookup cache (this worker only)."""
+    if _cache is not None:
+        _cache.clear()
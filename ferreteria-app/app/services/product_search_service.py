@@ -0,0 +1,162 @@
+"""Product search service (POS counter search and catalog live search).
+
+Relies on the trigram indexes created by
+db/migrations/20261018_product_search_trgm.sql. The SQL expressions built
+here must match the index expressions exactly, otherwise PostgreSQL falls
+back to a sequential scan of product.
+"""
+import re
+import unicodedata
+from sqlalchemy import func, or_, and_, case
+from sqlalchemy.orm import joinedload
+from app.models import Product
+
+
+def normalize_search_term(raw: str) -> str:
+    """
+    Normalize a search term: trim, lowercase, strip accents, collapse spaces.
+
+    Examples:
+        "  Tubería  PVC " -> "tuberia pvc"
+        "CAÑO" -> "cano"
+    """
+    if not raw:
+        return ''
+
+    text = unicodedata.normalize('NFKD', str(raw))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _name_expr():
+    """Indexed expression for product name (idx_product_name_trgm)."""
+    return func.lower(func.f_unaccent(Product.name))
+
+
+def _sku_expr():
+    """Indexed expression for SKU (idx_product_sku_trgm / idx_product_sku_lower)."""
+    return func.lower(Product.sku)
+
+
+def _barcode_expr():
+    """Indexed expression for barcode (idx_product_barcode_trgm / idx_product_barcode_lower)."""
+    return func.lower(Product.barcode)
+
+
+def build_product_search_filter(search_query: str):
+    """
+    Build the WHERE clause for a product search.
+
+    A product matches when every word of the query appears in its name
+    (any order, accent-insensitive), or when the whole query appears in
+    its SKU or barcode.
+
+    Args:
+        search_query: Raw text typed by the user
+
+    Returns:
+        SQLAlchemy boolean clause, or None if the query is empty
+    """
+    term = normalize_search_term(search_query)
+    if not term:
+        return None
+
+    name_col = _name_expr()
+    name_match = and_(*[
+        name_col.like(f'%{escape_like(word)}%')
+        for word in term.split(' ')
+    ])
+
+    pattern = f'%{escape_like(term)}%'
+    return or_(
+        name_match,
+        _sku_expr().like(pattern),
+        _barcode_expr().like(pattern)
+    )
+
+
+def product_search_sort_keys(search_query: str) -> list:
+    """
+    Build the relevance ranking of search results as sort keys.
+
+    Ranking:
+    1. Exact barcode hit (scanner)
+    2. Exact SKU hit
+    3. Name starting with the query
+    4. Everything else, by trigram similarity on the name
+
+    Ties are broken by product name, then id (stable pages for keyset
+    pagination).
+
+    Args:
+        search_query: Raw text typed by the user
+
+    Returns:
+        List of (expression, descending) pairs (empty if the query is empty)
+    """
+    term = normalize_search_term(search_query)
+    if not term:
+        return []
+
+    name_col = _name_expr()
+    rank = case(
+        (_barcode_expr() == term, 0),
+        (_sku_expr() == term, 1),
+        (name_col.like(f'{escape_like(term)}%'), 2),
+        else_=3
+    )
+
+    return [
+        (rank, False),
+        (func.similarity(name_col, term), True),
+        (Product.name, False),
+        (Product.id, False)
+    ]
+
+
+def product_search_order(search_query: str) -> list:
+    """
+    Build ORDER BY expressions ranking search results by relevance
+    (see product_search_sort_keys).
+
+    Returns:
+        List of ORDER BY expressions (empty if the query is empty)
+    """
+    return [
+        expr.desc() if descending else expr
+        for expr, descending in product_search_sort_keys(search_query)
+    ]
+
+
+def search_products(session, search_query: str, limit: int = 20, active_only: bool = True) -> list:
+    """
+    Search products by name, SKU or barcode, ranked by relevance.
+
+    Args:
+        session: SQLAlchemy session
+        search_query: Raw text typed by the user
+        limit: Maximum number of products to return
+        active_only: Only return active products (POS)
+
+    Returns:
+        List of Product (with stock and uom already loaded)
+    """
+    search_filter = build_product_search_filter(search_query)
+    if search_filter is None:
+        return []
+
+    query = (
+        session.query(Product)
+        .options(joinedload(Product.stock), joinedload(Product.uom))
+        .filter(search_filter)
+    )
+
+    if active_only:
+        query = query.filter(Product.active == True)
+
+    return query.order_by(*product_search_order(search_query)).limit(limit).all()
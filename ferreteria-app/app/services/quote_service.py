@@ -8,6 +8,7 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from sqlalchemy import func, and_, or_
 from sqlalchemy.exc import IntegrityError
 from app.models import (
     Quote, QuoteLine, Product, ProductStock,
@@ -15,6 +16,101 @@ from app.models import (
     SaleStatus, StockMoveType, StockReferenceType,
     LedgerType, LedgerReferenceType, PaymentMethod
 )
+from app.services.pdf_jobs import invalidate_quote_pdf
+from app.services.document_number_service import next_document_number
+from app.services.product_search_service import normalize_search_term, escape_like
+
+
+# ----------------------------------------------------------------------------
+# PDF styles: built once at import and shared by every render
+# ----------------------------------------------------------------------------
+
+# Part of the cached PDF hash (app.services.pdf_jobs): bump when the layout
+# of generate_quote_pdf_persisted changes so cached PDFs are re-rendered
+PDF_LAYOUT_VERSION = 1
+
+_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#2C3E50'),
+    spaceAfter=12,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+HEADER_STYLE = ParagraphStyle(
+    'CustomHeader',
+    parent=_STYLES['Normal'],
+    fontSize=10,
+    textColor=colors.HexColor('#7F8C8D'),
+    alignment=TA_CENTER,
+    spaceAfter=6
+)
+
+FOOTER_STYLE = ParagraphStyle(
+    'Footer',
+    parent=_STYLES['Normal'],
+    fontSize=9,
+    textColor=colors.HexColor('#95A5A6'),
+    alignment=TA_CENTER,
+    leading=12
+)
+
+QUOTE_INFO_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#34495E')),
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    # Header
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    
+    # Body
+    ('ALIGN', (1, 1), (1, -1), 'CENTER'),  # UOM
+    ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # Quantity
+    ('ALIGN', (3, 1), (3, -1), 'RIGHT'),   # Price
+    ('ALIGN', (4, 1), (4, -1), 'RIGHT'),   # Subtotal
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2C3E50')),
+    
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
+    
+    # Zebra stripes
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ECF0F1')]),
+    
+    # Padding
+    ('TOPPADDING', (0, 1), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+    ('LEFTPADDING', (0, 0), (-1, -1), 10),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+])
+
+TOTAL_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 14),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#27AE60')),
+    ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E8F8F5')),
+    ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#27AE60')),
+    ('TOPPADDING', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ('LEFTPADDING', (0, 0), (-1, -1), 10),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+])
 
 
 def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
@@ -51,46 +147,21 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
     # Container for elements
     elements = []
     
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    header_style = ParagraphStyle(
-        'CustomHeader',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#7F8C8D'),
-        alignment=TA_CENTER,
-        spaceAfter=6
-    )
-    
-    normal_style = styles['Normal']
-    
     # -------------------
     # HEADER
     # -------------------
     
     # Title
-    title = Paragraph("PRESUPUESTO", title_style)
+    title = Paragraph("PRESUPUESTO", TITLE_STYLE)
     elements.append(title)
     
     # Business info
     if business_info.get('name'):
-        business_name = Paragraph(f"<b>{business_info['name']}</b>", header_style)
+        business_name = Paragraph(f"<b>{business_info['name']}</b>", HEADER_STYLE)
         elements.append(business_name)
     
     if business_info.get('address'):
-        address = Paragraph(business_info['address'], header_style)
+        address = Paragraph(business_info['address'], HEADER_STYLE)
         elements.append(address)
     
     contact_parts = []
@@ -100,7 +171,7 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
         contact_parts.append(f"Email: {business_info['email']}")
     
     if contact_parts:
-        contact = Paragraph(" | ".join(contact_parts), header_style)
+        contact = Paragraph(" | ".join(contact_parts), HEADER_STYLE)
         elements.append(contact)
     
     elements.append(Spacer(1, 0.3*inch))
@@ -122,13 +193,7 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
         quote_info_data.append(['Método de Pago:', method_label])
     
     quote_info_table = Table(quote_info_data, colWidths=[2*inch, 3*inch])
-    quote_info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#34495E')),
-    ]))
+    quote_info_table.setStyle(QUOTE_INFO_TABLE_STYLE)
     
     elements.append(quote_info_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -174,37 +239,7 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
         colWidths=[3.2*inch, 0.7*inch, 0.8*inch, 1*inch, 1*inch]
     )
     
-    # Style the table
-    items_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Body
-        ('ALIGN', (1, 1), (1, -1), 'CENTER'),  # UOM
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # Quantity
-        ('ALIGN', (3, 1), (3, -1), 'RIGHT'),   # Price
-        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),   # Subtotal
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2C3E50')),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
-        
-        # Zebra stripes
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ECF0F1')]),
-        
-        # Padding
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-    ]))
+    items_table.setStyle(ITEMS_TABLE_STYLE)
     
     elements.append(items_table)
     elements.append(Spacer(1, 0.2*inch))
@@ -218,19 +253,7 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
     ]
     
     total_table = Table(total_data, colWidths=[5.7*inch, 1*inch])
-    total_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 14),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#27AE60')),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E8F8F5')),
-        ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#27AE60')),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-    ]))
+    total_table.setStyle(TOTAL_TABLE_STYLE)
     
     elements.append(total_table)
     elements.append(Spacer(1, 0.4*inch))
@@ -239,15 +262,6 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
     # FOOTER / LEGAL TEXT
     # -------------------
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#95A5A6'),
-        alignment=TA_CENTER,
-        leading=12
-    )
-    
     valid_days = business_info.get('valid_days', 7)
     footer_text = f"""
     <b>IMPORTANTE:</b><br/>
@@ -256,7 +270,7 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
     <i>Este presupuesto no constituye una factura ni comprobante de venta.</i>
     """
     
-    footer = Paragraph(footer_text, footer_style)
+    footer = Paragraph(footer_text, FOOTER_STYLE)
     elements.append(footer)
     
     # Build PDF
@@ -271,10 +285,56 @@ def generate_quote_pdf(cart: dict, business_info: dict) -> BytesIO:
 # MEJORA 13: Persisted Quotes Functions
 # ============================================================================
 
+# Statuses that can still be converted (and therefore expire)
+OPEN_QUOTE_STATUSES = ('DRAFT', 'SENT')
+
+
+def quote_expired_expr(today: date):
+    """SQL expression: quote is DRAFT/SENT and valid_until is before today."""
+    return and_(
+        Quote.status.in_(OPEN_QUOTE_STATUSES),
+        Quote.valid_until.isnot(None),
+        Quote.valid_until < today
+    )
+
+
+def build_quote_search_filter(search_query: str):
+    """
+    Build the WHERE clause for the quote list search.
+    
+    Matches the quote number or phone containing the query, or a customer
+    name containing every word (any order, accent-insensitive). The
+    expressions match the trigram indexes of
+    db/migrations/20261018_quote_list_indexes.sql.
+    
+    Returns:
+        SQLAlchemy boolean clause, or None if the query is empty
+    """
+    term = normalize_search_term(search_query)
+    if not term:
+        return None
+    
+    name_col = func.lower(func.f_unaccent(Quote.customer_name))
+    name_match = and_(*[
+        name_col.like(f'%{escape_like(word)}%')
+        for word in term.split(' ')
+    ])
+    
+    pattern = f'%{escape_like(term)}%'
+    return or_(
+        name_match,
+        func.lower(Quote.quote_number).like(pattern),
+        func.lower(Quote.customer_phone).like(pattern)
+    )
+
+
 def generate_quote_number(session) -> str:
     """
     Generate a unique quote number with format: PRES-YYYYMMDD-HHMMSS-####
     
+    #### is the per-day sequence from document_number_service (scope
+    'QUOTE'), allocated in the caller's transaction.
+    
     Args:
         session: SQLAlchemy session
     
@@ -285,15 +345,8 @@ def generate_quote_number(session) -> str:
     now_ar = get_now_ar()
     timestamp = now_ar.strftime('%Y%m%d-%H%M%S')
     
-    # Get count of quotes created today in Argentina to generate sequence
-    today_start_ar = now_ar.replace(hour=0, minute=0, second=0, microsecond=0)
-    # Convert back to UTC for DB query
-    from app.utils.formatters import ar_to_utc
-    today_start_utc = ar_to_utc(today_start_ar)
-    count = session.query(Quote).filter(Quote.created_at >= today_start_utc).count()
-    
-    sequence = str(count + 1).zfill(4)
-    quote_number = f"PRES-{timestamp}-{sequence}"
+    sequence = next_document_number(session, 'QUOTE', now_ar.date())
+    quote_number = f"PRES-{timestamp}-{sequence:04d}"
     
     return quote_number
 
@@ -331,8 +384,32 @@ def create_quote_from_cart(cart: dict, session, customer_name: str, customer_pho
         if not customer_name or not customer_name.strip():
             raise ValueError('El nombre del cliente es obligatorio.')
         
-        # Generate unique quote number
-        quote_number = generate_quote_number(session)
+        # Build and validate the lines first: the quote number is allocated
+        # last so the document_sequence row lock is held as briefly as possible
+        total = Decimal('0.00')
+        quote_lines = []
+        
+        for cart_key, item in cart['items'].items():
+            # Cart lines carry product_id; legacy keys were the product id itself
+            product_id = item['product_id'] if 'product_id' in item else int(cart_key)
+            product = session.query(Product).filter_by(id=product_id).first()
+            
+            if not product:
+                raise ValueError(f'Producto con ID {product_id} no encontrado.')
+            
+            qty = Decimal(str(item['qty']))
+            unit_price = product.sale_price
+            line_total = qty * unit_price
+            
+            quote_lines.append(QuoteLine(
+                product_id=product.id,
+                product_name_snapshot=product.name,
+                uom_snapshot=product.uom.symbol if product.uom else None,
+                qty=qty,
+                unit_price=unit_price,
+                line_total=line_total
+            ))
+            total += line_total
         
         # Calculate valid_until date
         from app.utils.formatters import get_now_ar, ar_to_utc
@@ -344,7 +421,10 @@ def create_quote_from_cart(cart: dict, session, customer_name: str, customer_pho
         if payment_method == '':
             payment_method = None
         
-        # Create quote with customer data (MEJORA 14)
+        # Generate unique quote number (locks the day's sequence row until commit)
+        quote_number = generate_quote_number(session)
+        
+        # Create quote with customer data (MEJORA 14) and its snapshot lines
         quote = Quote(
             quote_number=quote_number,
             status='DRAFT',
@@ -354,42 +434,13 @@ def create_quote_from_cart(cart: dict, session, customer_name: str, customer_pho
             payment_method=payment_method,
             customer_name=customer_name.strip(),
             customer_phone=customer_phone.strip() if customer_phone else None,
-            total_amount=Decimal('0.00')
+            total_amount=total,
+            lines=quote_lines
         )
         
         session.add(quote)
         session.flush()  # Get quote.id
         
-        # Create quote lines with snapshot
-        total = Decimal('0.00')
-        
-        for product_id_str, item in cart['items'].items():
-            product_id = int(product_id_str)
-            product = session.query(Product).filter_by(id=product_id).first()
-            
-            if not product:
-                raise ValueError(f'Producto con ID {product_id} no encontrado.')
-            
-            qty = Decimal(str(item['qty']))
-            unit_price = product.sale_price
-            line_total = qty * unit_price
-            
-            quote_line = QuoteLine(
-                quote_id=quote.id,
-                product_id=product.id,
-                product_name_snapshot=product.name,
-                uom_snapshot=product.uom.symbol if product.uom else None,
-                qty=qty,
-                unit_price=unit_price,
-                line_total=line_total
-            )
-            
-            session.add(quote_line)
-            total += line_total
-        
-        # Update quote total
-        quote.total_amount = total
-        
         # Commit transaction
         session.commit()
         
@@ -409,9 +460,12 @@ def create_quote_from_cart(cart: dict, session, customer_name: str, customer_pho
         raise Exception(f'Error al crear presupuesto: {str(e)}')
 
 
-def generate_quote_pdf_from_db(quote_id: int, session, business_info: dict) -> BytesIO:
+def get_quote_pdf_data(quote_id: int, session, business_info: dict) -> tuple:
     """
-    Generate PDF from a persisted quote in database.
+    Load everything needed to render a persisted quote PDF as plain data.
+    
+    The result holds no ORM objects, so it can be sent to a PDF worker
+    process (see app.services.pdf_jobs).
     
     Args:
         quote_id: Quote ID
@@ -419,7 +473,7 @@ def generate_quote_pdf_from_db(quote_id: int, session, business_info: dict) -> B
         business_info: Business information dictionary
     
     Returns:
-        BytesIO: PDF file in memory
+        tuple: (cart_data, business_info_copy) for generate_quote_pdf_persisted
     
     Raises:
         ValueError: If quote not found
@@ -453,7 +507,25 @@ def generate_quote_pdf_from_db(quote_id: int, session, business_info: dict) -> B
     business_info_copy['customer_name'] = quote.customer_name  # MEJORA 14
     business_info_copy['customer_phone'] = quote.customer_phone  # MEJORA 14
     
-    # Generate PDF using existing function (with modifications)
+    return cart_data, business_info_copy
+
+
+def generate_quote_pdf_from_db(quote_id: int, session, business_info: dict) -> BytesIO:
+    """
+    Generate PDF from a persisted quote in database (in this process).
+    
+    Args:
+        quote_id: Quote ID
+        session: SQLAlchemy session
+        business_info: Business information dictionary
+    
+    Returns:
+        BytesIO: PDF file in memory
+    
+    Raises:
+        ValueError: If quote not found
+    """
+    cart_data, business_info_copy = get_quote_pdf_data(quote_id, session, business_info)
     return generate_quote_pdf_persisted(cart_data, business_info_copy)
 
 
@@ -479,44 +551,21 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
     # Container for elements
     elements = []
     
-    # Styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#2C3E50'),
-        spaceAfter=12,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    header_style = ParagraphStyle(
-        'CustomHeader',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#7F8C8D'),
-        alignment=TA_CENTER,
-        spaceAfter=6
-    )
-    
     # -------------------
     # HEADER
     # -------------------
     
     # Title
-    title = Paragraph("PRESUPUESTO", title_style)
+    title = Paragraph("PRESUPUESTO", TITLE_STYLE)
     elements.append(title)
     
     # Business info
     if business_info.get('name'):
-        business_name = Paragraph(f"<b>{business_info['name']}</b>", header_style)
+        business_name = Paragraph(f"<b>{business_info['name']}</b>", HEADER_STYLE)
         elements.append(business_name)
     
     if business_info.get('address'):
-        address = Paragraph(business_info['address'], header_style)
+        address = Paragraph(business_info['address'], HEADER_STYLE)
         elements.append(address)
     
     contact_parts = []
@@ -526,7 +575,7 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
         contact_parts.append(f"Email: {business_info['email']}")
     
     if contact_parts:
-        contact = Paragraph(" | ".join(contact_parts), header_style)
+        contact = Paragraph(" | ".join(contact_parts), HEADER_STYLE)
         elements.append(contact)
     
     elements.append(Spacer(1, 0.3*inch))
@@ -560,13 +609,7 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
         quote_info_data.append(['Teléfono:', business_info['customer_phone']])
     
     quote_info_table = Table(quote_info_data, colWidths=[2*inch, 3*inch])
-    quote_info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#34495E')),
-    ]))
+    quote_info_table.setStyle(QUOTE_INFO_TABLE_STYLE)
     
     elements.append(quote_info_table)
     elements.append(Spacer(1, 0.3*inch))
@@ -612,37 +655,7 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
         colWidths=[3.2*inch, 0.7*inch, 0.8*inch, 1*inch, 1*inch]
     )
     
-    # Style the table
-    items_table.setStyle(TableStyle([
-        # Header
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        
-        # Body
-        ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),
-        ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
-        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#2C3E50')),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BDC3C7')),
-        
-        # Zebra stripes
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#ECF0F1')]),
-        
-        # Padding
-        ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-    ]))
+    items_table.setStyle(ITEMS_TABLE_STYLE)
     
     elements.append(items_table)
     elements.append(Spacer(1, 0.2*inch))
@@ -656,19 +669,7 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
     ]
     
     total_table = Table(total_data, colWidths=[5.7*inch, 1*inch])
-    total_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 14),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#27AE60')),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E8F8F5')),
-        ('BOX', (0, 0), (-1, -1), 2, colors.HexColor('#27AE60')),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-    ]))
+    total_table.setStyle(TOTAL_TABLE_STYLE)
     
     elements.append(total_table)
     elements.append(Spacer(1, 0.4*inch))
@@ -677,15 +678,6 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
     # FOOTER / NOTES
     # -------------------
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#95A5A6'),
-        alignment=TA_CENTER,
-        leading=12
-    )
-    
     footer_text = """
     <b>IMPORTANTE:</b><br/>
     Precios sujetos a modificación sin previo aviso.<br/>
@@ -695,7 +687,7 @@ def generate_quote_pdf_persisted(cart: dict, business_info: dict) -> BytesIO:
     if business_info.get('notes'):
         footer_text += f"<br/><br/><b>Notas:</b> {business_info['notes']}"
     
-    footer = Paragraph(footer_text, footer_style)
+    footer = Paragraph(footer_text, FOOTER_STYLE)
     elements.append(footer)
     
     # Build PDF
@@ -1048,8 +1040,12 @@ def update_quote(quote_id: int, session, lines_data: list, payment_method: str =
         # Update total_amount
         quote.total_amount = total_amount.quantize(Decimal('0.01'))
         
+        # Always bump updated_at (even if only lines changed)
+        quote.updated_at = func.now()
+        
         # Commit transaction
         session.commit()
+        invalidate_quote_pdf(quote_id)
         
     except ValueError:
         session.rollback()
@@ -0,0 +1,314 @@
+"""
+Reorder report and purchase suggestions.
+
+get_reorder_report() lists products out of stock or below their minimum. It
+reads product_stock.stock_status (maintained by trigger, see
+db/migrations/20261018_product_stock_status.sql) through the partial indexes
+idx_product_stock_out / idx_product_stock_low, so the cost depends on the
+number of products to reorder, not on the size of the catalog. Items are
+grouped by the supplier of their latest purchase invoice line
+(idx_invoice_line_product_latest).
+
+compute_reorder_suggestions() goes beyond the static min_stock_qty: it
+derives a daily sales velocity per product from sale moves (OUT minus the
+IN moves of voided sales) over a short and a long window (the higher rate
+wins, so recent surges count but slow months do not hide demand), projects
+days of cover and suggests buying enough for lead time + cover days.
+Everything is computed by PostgreSQL in a single INSERT ... SELECT into
+reorder_suggestion (no per-product queries), run nightly with
+`flask compute-reorder`; the suggestions page only reads that table.
+Overlapping runs are serialized by a transaction-level advisory lock.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import case, func, insert, select
+from app.models import (
+    Product, ProductStock, PurchaseInvoice, PurchaseInvoiceLine, Supplier, UOM,
+    StockMove, StockMoveLine, ReorderSuggestion
+)
+from app.models.stock_move import StockMoveType, StockReferenceType
+from app.utils.formatters import get_now_ar
+
+
+REORDER_STATUSES = ('OUT', 'LOW')
+
+
+def _latest_purchases(session, product_ids: list) -> dict:
+    """
+    Latest purchase invoice line of each product (DISTINCT ON product_id).
+
+    Returns:
+        dict: {product_id: row with unit_cost, invoice_date, supplier_id, supplier_name}
+    """
+    if not product_ids:
+        return {}
+
+    rows = (
+        session.query(
+            PurchaseInvoiceLine.product_id,
+            PurchaseInvoiceLine.unit_cost,
+            PurchaseInvoice.invoice_date,
+            Supplier.id.label('supplier_id'),
+            Supplier.name.label('supplier_name')
+        )
+        .join(PurchaseInvoice, PurchaseInvoice.id == PurchaseInvoiceLine.invoice_id)
+        .join(Supplier, Supplier.id == PurchaseInvoice.supplier_id)
+        .filter(PurchaseInvoiceLine.product_id.in_(product_ids))
+        .distinct(PurchaseInvoiceLine.product_id)
+        .order_by(PurchaseInvoiceLine.product_id, PurchaseInvoiceLine.id.desc())
+        .all()
+    )
+    return {row.product_id: row for row in rows}
+
+
+def get_reorder_report(session, status: str = None) -> list:
+    """
+    Get active products to reorder, grouped by last supplier.
+
+    Args:
+        session: SQLAlchemy session
+        status: 'OUT' or 'LOW' to restrict the report (default: both)
+
+    Returns:
+        List of dicts (suppliers by name, products without purchases last):
+            - supplier_id, supplier_name (None for products never purchased)
+            - items: list of dicts with product_id, name, sku, uom_symbol,
+              on_hand_qty, min_stock_qty, stock_status, missing_qty (None
+              when no minimum is set), last_unit_cost, last_purchase_date
+    """
+    statuses = (status,) if status in REORDER_STATUSES else REORDER_STATUSES
+
+    rows = (
+        session.query(
+            Product.id,
+            Product.name,
+            Product.sku,
+            Product.min_stock_qty,
+            UOM.symbol.label('uom_symbol'),
+            ProductStock.on_hand_qty,
+            ProductStock.stock_status
+        )
+        .join(Product, Product.id == ProductStock.product_id)
+        .join(UOM, UOM.id == Product.uom_id)
+        .filter(ProductStock.stock_status.in_(statuses), Product.active == True)
+        .order_by(Product.name, Product.id)
+        .all()
+    )
+
+    purchases = _latest_purchases(session, [row.id for row in rows])
+
+    groups = {}
+    for row in rows:
+        purchase = purchases.get(row.id)
+        supplier_id = purchase.supplier_id if purchase else None
+
+        group = groups.get(supplier_id)
+        if group is None:
+            group = groups[supplier_id] = {
+                'supplier_id': supplier_id,
+                'supplier_name': purchase.supplier_name if purchase else None,
+                'items': []
+            }
+
+        min_qty = row.min_stock_qty or Decimal('0')
+        group['items'].append({
+            'product_id': row.id,
+            'name': row.name,
+            'sku': row.sku,
+            'uom_symbol': row.uom_symbol,
+            'on_hand_qty': row.on_hand_qty,
+            'min_stock_qty': min_qty,
+            'stock_status': row.stock_status,
+            'missing_qty': max(min_qty - row.on_hand_qty, Decimal('0')) if min_qty > 0 else None,
+            'last_unit_cost': purchase.unit_cost if purchase else None,
+            'last_purchase_date': purchase.invoice_date if purchase else None
+        })
+
+    return sorted(
+        groups.values(),
+        key=lambda g: (g['supplier_id'] is None, (g['supplier_name'] or '').lower())
+    )
+
+
+def compute_reorder_suggestions(session, short_days: int = None, long_days: int = None,
+                                lead_time_days: int = None, cover_days: int = None) -> int:
+    """
+    Rebuild reorder_suggestion from sales velocity (one INSERT ... SELECT).
+
+    Args:
+        session: SQLAlchemy session
+        short_days, long_days: Sales windows (default REORDER_SHORT_WINDOW_DAYS
+                               / REORDER_LONG_WINDOW_DAYS)
+        lead_time_days: Days until a purchase arrives (REORDER_LEAD_TIME_DAYS)
+        cover_days: Days of sales a purchase should cover (REORDER_COVER_DAYS)
+
+    Returns:
+        int: Number of products with a suggestion
+    """
+    config = current_app.config
+    short_days = short_days or config.get('REORDER_SHORT_WINDOW_DAYS', 30)
+    long_days = max(long_days or config.get('REORDER_LONG_WINDOW_DAYS', 90), short_days)
+    if lead_time_days is None:
+        lead_time_days = config.get('REORDER_LEAD_TIME_DAYS', 7)
+    if cover_days is None:
+        cover_days = config.get('REORDER_COVER_DAYS', 30)
+
+    now = get_now_ar()
+    short_start = now - timedelta(days=short_days)
+    long_start = now - timedelta(days=long_days)
+
+    # Net units sold per product in both windows (idx_stock_move_date): IN
+    # moves referencing a sale (voids, returns) are subtracted, clamped at 0
+    net_qty = case(
+        (StockMove.type == StockMoveType.OUT, StockMoveLine.qty),
+        else_=-StockMoveLine.qty
+    )
+    sales = (
+        select(
+            StockMoveLine.product_id,
+            func.greatest(
+                func.sum(case((StockMove.date >= short_start, net_qty), else_=0)), 0
+            ).label('sold_short'),
+            func.greatest(func.sum(net_qty), 0).label('sold_long')
+        )
+        .join(StockMove, StockMove.id == StockMoveLine.stock_move_id)
+        .where(
+            StockMove.type.in_([StockMoveType.OUT, StockMoveType.IN]),
+            StockMove.reference_type == StockReferenceType.SALE,
+            StockMove.date >= long_start
+        )
+        .group_by(StockMoveLine.product_id)
+        .subquery('sales')
+    )
+
+    # Supplier and cost of the latest purchase of each product
+    latest_purchase = (
+        select(
+            PurchaseInvoiceLine.product_id,
+            PurchaseInvoice.supplier_id,
+            PurchaseInvoiceLine.unit_cost,
+            PurchaseInvoice.invoice_date
+        )
+        .join(PurchaseInvoice, PurchaseInvoice.id == PurchaseInvoiceLine.invoice_id)
+        .distinct(PurchaseInvoiceLine.product_id)
+        .order_by(PurchaseInvoiceLine.product_id, PurchaseInvoiceLine.id.desc())
+        .subquery('latest_purchase')
+    )
+
+    on_hand = func.coalesce(ProductStock.on_hand_qty, 0)
+    min_qty = func.coalesce(Product.min_stock_qty, 0)
+    sold_short = func.coalesce(sales.c.sold_short, 0)
+    sold_long = func.coalesce(sales.c.sold_long, 0)
+    velocity = func.greatest(sold_short / short_days, sold_long / long_days)
+
+    candidates = (
+        select(
+            Product.id.label('product_id'),
+            latest_purchase.c.supplier_id,
+            on_hand.label('on_hand_qty'),
+            min_qty.label('min_stock_qty'),
+            sold_short.label('sold_short_qty'),
+            sold_long.label('sold_long_qty'),
+            velocity.label('daily_velocity'),
+            case((velocity > 0, func.round(on_hand / velocity, 1)), else_=None).label('days_of_cover'),
+            func.greatest(
+                func.ceil(velocity * (lead_time_days + cover_days) - on_hand),
+                min_qty - on_hand,
+                0
+            ).label('suggested_qty'),
+            latest_purchase.c.unit_cost.label('last_unit_cost'),
+            latest_purchase.c.invoice_date.label('last_purchase_date')
+        )
+        .select_from(Product)
+        .outerjoin(ProductStock, ProductStock.product_id == Product.id)
+        .outerjoin(sales, sales.c.product_id == Product.id)
+        .outerjoin(latest_purchase, latest_purchase.c.product_id == Product.id)
+        .where(Product.active == True)
+        .subquery('candidates')
+    )
+
+    columns = [
+        'product_id', 'supplier_id', 'on_hand_qty', 'min_stock_qty', 'sold_short_qty',
+        'sold_long_qty', 'daily_velocity', 'days_of_cover', 'suggested_qty',
+        'last_unit_cost', 'last_purchase_date'
+    ]
+    rebuild = insert(ReorderSuggestion).from_select(
+        columns,
+        select(*[candidates.c[column] for column in columns]).where(candidates.c.suggested_qty > 0)
+    )
+
+    try:
+        # A concurrent rebuild (cron overlapping a manual run) would insert
+        # the same product_ids: wait for it, then rebuild from its result
+        session.execute(select(func.pg_advisory_xact_lock(func.hashtext('reorder_suggestion'))))
+        session.query(ReorderSuggestion).delete(synchronize_session=False)
+        result = session.execute(rebuild)
+        session.commit()
+        return result.rowcount
+
+    except Exception:
+        session.rollback()
+        raise
+
+
+def get_reorder_suggestions(session) -> tuple:
+    """
+    Get the precomputed purchase suggestions grouped by supplier.
+
+    Returns:
+        (groups, computed_at): groups as in get_reorder_report, plus
+        estimated_cost per group; items are ordered by days of cover (most
+        urgent first). computed_at is None if never computed.
+    """
+    rows = (
+        session.query(
+            ReorderSuggestion,
+            Product.name,
+            Product.sku,
+            UOM.symbol.label('uom_symbol'),
+            Supplier.name.label('supplier_name')
+        )
+        .join(Product, Product.id == ReorderSuggestion.product_id)
+        .join(UOM, UOM.id == Product.uom_id)
+        .outerjoin(Supplier, Supplier.id == ReorderSuggestion.supplier_id)
+        .order_by(ReorderSuggestion.days_of_cover.asc().nullslast(), Product.name)
+        .all()
+    )
+
+    computed_at = None
+    groups = {}
+    for suggestion, name, sku, uom_symbol, supplier_name in rows:
+        computed_at = max(computed_at, suggestion.computed_at) if computed_at else suggestion.computed_at
+
+        group = groups.get(suggestion.supplier_id)
+        if group is None:
+            group = groups[suggestion.supplier_id] = {
+                'supplier_id': suggestion.supplier_id,
+                'supplier_name': supplier_name,
+                'estimated_cost': Decimal('0'),
+                'items': []
+            }
+
+        if suggestion.last_unit_cost is not None:
+            group['estimated_cost'] += suggestion.suggested_qty * suggestion.last_unit_cost
+
+        group['items'].append({
+            'product_id': suggestion.product_id,
+            'name': name,
+            'sku': sku,
+            'uom_symbol': uom_symbol,
+            'on_hand_qty': suggestion.on_hand_qty,
+            'min_stock_qty': suggestion.min_stock_qty,
+            'daily_velocity': suggestion.daily_velocity,
+            'days_of_cover': suggestion.days_of_cover,
+            'suggested_qty': suggestion.suggested_qty,
+            'last_unit_cost': suggestion.last_unit_cost,
+            'last_purchase_date': suggestion.last_purchase_date
+        })
+
+    groups = sorted(
+        groups.values(),
+        key=lambda g: (g['supplier_id'] is None, (g['supplier_name'] or '').lower())
+    )
+    return groups, computed_at
@@ -1,7 +1,7 @@
 """Sales service with transactional logic."""
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import insert
 from app.models import (
     Product, ProductStock, Sale, SaleLine, 
     StockMove, StockMoveLine, FinanceLedger,
@@ -15,14 +15,17 @@ def confirm_sale(cart: dict, session, payment_method: str = 'CASH') -> int:
     Confirm sale with full transactional processing.
     
     Steps:
-    1. Validate cart and products
-    2. Lock product_stock rows (FOR UPDATE)
-    3. Validate sufficient stock
+    1. Parse cart
+    2. Load products and lock product_stock rows (FOR UPDATE) in one query
+    3. Validate products and sufficient stock
     4. Create sale and sale_lines
     5. Create stock_move and stock_move_lines (OUT)
     6. Create finance_ledger entry (INCOME) with payment_method
     7. Commit transaction
     
+    The number of round trips is constant in the number of lines: lines are
+    written with multi-row INSERTs and the ledger entry is flushed on commit.
+    
     Args:
         cart: Cart dictionary with items
         session: SQLAlchemy session
@@ -62,32 +65,36 @@ def confirm_sale(cart: dict, session, payment_method: str = 'CASH') -> int:
         
         product_ids = list(set(product_ids))  # Remove duplicates
         
-        # Get products
+        # Step 2: Load all products and lock their product_stock rows
+        # (FOR UPDATE OF product_stock) in a single round trip, in product_id
+        # order so concurrent sales and stock counts cannot deadlock
+        rows = (
+            session.query(Product, ProductStock.on_hand_qty)
+            .join(ProductStock, ProductStock.product_id == Product.id)
+            .filter(Product.id.in_(product_ids))
+            .order_by(ProductStock.product_id)
+            .with_for_update(of=ProductStock)
+            .all()
+        )
+        
         products_dict = {}
-        for pid in product_ids:
-            product = session.query(Product).filter_by(id=pid).first()
-            if not product:
-                raise ValueError(f'Producto con ID {pid} no encontrado')
+        stock_dict = {}
+        for product, on_hand_qty in rows:
+            products_dict[product.id] = product
+            stock_dict[product.id] = Decimal(str(on_hand_qty))
+        
+        missing_ids = [pid for pid in product_ids if pid not in products_dict]
+        if missing_ids:
+            # Error path only: products without a product_stock row have no stock
+            for product in session.query(Product).filter(Product.id.in_(missing_ids)).all():
+                products_dict[product.id] = product
+            for pid in missing_ids:
+                if pid not in products_dict:
+                    raise ValueError(f'Producto con ID {pid} no encontrado')
+        
+        for product in products_dict.values():
             if not product.active:
                 raise ValueError(f'El producto "{product.name}" no está activo')
-            products_dict[pid] = product
-        
-        # Step 2: Lock product_stock rows FOR UPDATE to prevent race conditions
-        # Build placeholders for IN clause
-        placeholders = ', '.join([f':pid{i}' for i in range(len(product_ids))])
-        lock_query = text(f"""
-            SELECT product_id, on_hand_qty 
-            FROM product_stock 
-            WHERE product_id IN ({placeholders})
-            FOR UPDATE
-        """)
-        
-        # Execute with parameters
-        params = {f'pid{i}': pid for i, pid in enumerate(product_ids)}
-        locked_stocks = session.execute(lock_query, params).fetchall()
-        
-        # Build stock dict
-        stock_dict = {row[0]: Decimal(str(row[1])) for row in locked_stocks}
         
         # Step 3: Validate sufficient stock and calculate totals
         sale_lines_data = []
@@ -162,17 +169,18 @@ def confirm_sale(cart: dict, session, payment_method: str = 'CASH') -> int:
         session.add(sale)
         session.flush()  # Get sale.id
         
-        # Step 5: Create SaleLines
-        for line_data in sale_lines_data:
-            sale_line = SaleLine(
-                sale_id=sale.id,
-                product_id=line_data['product_id'],
-                uom_id=line_data['uom_id'],  # MEJORA A
-                qty=line_data['qty'],
-                unit_price=line_data['unit_price'],
-                line_total=line_data['line_total']
-            )
-            session.add(sale_line)
+        # Step 5: Create SaleLines (single multi-row INSERT)
+        session.execute(insert(SaleLine), [
+            {
+                'sale_id': sale.id,
+                'product_id': line_data['product_id'],
+                'uom_id': line_data['uom_id'],  # MEJORA A
+                'qty': line_data['qty'],
+                'unit_price': line_data['unit_price'],
+                'line_total': line_data['line_total']
+            }
+            for line_data in sale_lines_data
+        ])
         
         # Step 6: Create StockMove (OUT)
         stock_move = StockMove(
@@ -185,19 +193,19 @@ def confirm_sale(cart: dict, session, payment_method: str = 'CASH') -> int:
         session.add(stock_move)
         session.flush()  # Get stock_move.id
         
-        # Step 7: Create StockMoveLines
-        # Note: The trigger on stock_move_line will update product_stock automatically
+        # Step 7: Create StockMoveLines (single multi-row INSERT)
+        # Note: The row trigger on stock_move_line still updates product_stock for each line
         # MEJORA A: Use qty_base for stock movement
-        for line_data in sale_lines_data:
-            product = line_data['product']
-            stock_move_line = StockMoveLine(
-                stock_move_id=stock_move.id,
-                product_id=line_data['product_id'],
-                qty=line_data['qty_base'],  # MEJORA A: Use qty_base for stock
-                uom_id=line_data['uom_id'],  # MEJORA A: Use selected UOM
-                unit_cost=None  # Not relevant for sales
-            )
-            session.add(stock_move_line)
+        session.execute(insert(StockMoveLine), [
+            {
+                'stock_move_id': stock_move.id,
+                'product_id': line_data['product_id'],
+                'qty': line_data['qty_base'],  # MEJORA A: Use qty_base for stock
+                'uom_id': line_data['uom_id'],  # MEJORA A: Use selected UOM
+                'unit_cost': None  # Not relevant for sales
+            }
+            for line_data in sale_lines_data
+        ])
         
         # Step 8: Create FinanceLedger entry (INCOME) with payment_method (MEJORA 12)
         # FIX: Normalize payment_method to ensure it's a valid string
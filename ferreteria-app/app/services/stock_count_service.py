@@ -0,0 +1,357 @@
+"""
+Physical inventory (stock count sessions).
+
+Counts are entered into an OPEN stock_count (scanned one by one or pasted in
+bulk), previewed against current stock and applied in a single transaction:
+
+1. Lock every product_stock row of the count with one SELECT ... FOR UPDATE
+   (ordered by product_id, like confirm_sale, so a concurrent sale cannot
+   deadlock with it)
+2. Create one stock_move (type ADJUST, reference_type MANUAL,
+   reference_id = stock_count.id)
+3. Bulk insert one stock_move_line per product whose stock changed
+   (qty = counted - current); the triggers update product_stock
+4. Record expected_qty on the count lines and mark the count APPLIED
+
+Products not counted are left untouched (partial counts are allowed).
+Quantities are in the product base UOM, like adjust_stock_to.
+"""
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func, insert, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from app.models import (
+    Product, ProductStock, StockMove, StockMoveLine,
+    StockMoveType, StockReferenceType, StockCount, StockCountLine
+)
+from app.services.product_lookup_service import normalize_code
+from app.utils.decimal_parser import parse_decimal_ar
+
+
+def create_stock_count(session, notes: str = None) -> StockCount:
+    """Open a new stock count session."""
+    stock_count = StockCount(status='OPEN', notes=notes or None)
+    session.add(stock_count)
+    session.commit()
+    return stock_count
+
+
+def _get_open_count(session, stock_count_id: int, lock: bool = False) -> StockCount:
+    """Get an OPEN stock count or raise ValueError."""
+    query = session.query(StockCount).filter(StockCount.id == stock_count_id)
+    if lock:
+        query = query.with_for_update()
+    stock_count = query.first()
+
+    if not stock_count:
+        raise ValueError(f'Inventario #{stock_count_id} no encontrado')
+    if stock_count.status != 'OPEN':
+        raise ValueError(f'El inventario #{stock_count_id} ya fue cerrado')
+    return stock_count
+
+
+def resolve_product_codes(session, codes) -> dict:
+    """
+    Resolve barcodes/SKUs to product ids in one query.
+
+    Barcode matches win over SKU matches (same rule as the POS lookup).
+
+    Returns:
+        dict: {normalized_code: product_id} for the codes found
+    """
+    keys = {normalize_code(code) for code in codes} - {''}
+    if not keys:
+        return {}
+
+    rows = (
+        session.query(Product.id, func.lower(Product.barcode), func.lower(Product.sku))
+        .filter(or_(func.lower(Product.barcode).in_(keys), func.lower(Product.sku).in_(keys)))
+        .all()
+    )
+
+    by_sku = {sku: product_id for product_id, _, sku in rows if sku in keys}
+    by_barcode = {barcode: product_id for product_id, barcode, _ in rows if barcode in keys}
+    return {**by_sku, **by_barcode}
+
+
+def set_counted_qtys(session, stock_count_id: int, counts: dict, accumulate: bool = False) -> int:
+    """
+    Record counted quantities (one INSERT ... ON CONFLICT for all products).
+
+    Args:
+        session: SQLAlchemy session
+        stock_count_id: OPEN stock count
+        counts: {product_id: Decimal qty}
+        accumulate: Add to the quantity already counted (scanning units one
+                    by one) instead of replacing it
+
+    Returns:
+        int: Number of products recorded
+    """
+    if not counts:
+        return 0
+
+    for qty in counts.values():
+        if qty < 0:
+            raise ValueError('La cantidad contada no puede ser negativa')
+
+    try:
+        # Row lock: a scan cannot add lines while the count is being applied
+        _get_open_count(session, stock_count_id, lock=True)
+
+        stmt = pg_insert(StockCountLine).values([
+            {'stock_count_id': stock_count_id, 'product_id': product_id, 'counted_qty': qty}
+            for product_id, qty in counts.items()
+        ])
+        counted_qty = stmt.excluded.counted_qty
+        if accumulate:
+            counted_qty = StockCountLine.counted_qty + stmt.excluded.counted_qty
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StockCountLine.stock_count_id, StockCountLine.product_id],
+            set_={'counted_qty': counted_qty, 'updated_at': func.now()}
+        )
+
+        session.execute(stmt)
+        session.commit()
+        return len(counts)
+
+    except ValueError:
+        session.rollback()
+        raise
+
+    except IntegrityError as e:
+        session.rollback()
+        raise Exception(f'Error de integridad al registrar conteo: {str(e.orig)}')
+
+    except Exception:
+        session.rollback()
+        raise
+
+
+def parse_count_lines(text: str) -> tuple:
+    """
+    Parse pasted counts, one "code;qty" (or tab separated, as copied from a
+    spreadsheet) per line. Quantities accept the Argentine format (1.234,5).
+
+    Returns:
+        (counts, errors): {code: Decimal qty} and list of error messages
+    """
+    counts = {}
+    errors = []
+    for number, raw in enumerate((text or '').splitlines(), start=1):
+        line = raw.strip()
+        if not line:
+            continue
+
+        sep = ';' if ';' in line else '\t'
+        code, _, qty_text = line.rpartition(sep)
+        code, qty_text = code.strip(), qty_text.strip()
+        if not code or not qty_text:
+            errors.append(f'Línea {number}: se espera "código;cantidad" ("{line}")')
+            continue
+
+        try:
+            qty = parse_decimal_ar(qty_text, field_name='counted_qty')
+        except ValueError:
+            qty = None
+        if qty is None or qty < 0:
+            errors.append(f'Línea {number}: cantidad inválida ("{qty_text}")')
+            continue
+
+        counts[code] = qty
+
+    return counts, errors
+
+
+def import_counts(session, stock_count_id: int, text: str) -> dict:
+    """
+    Record pasted "code;qty" lines (replacing previous counts of those products).
+
+    Returns:
+        dict with recorded (int), not_found (list of codes) and errors (list)
+    """
+    by_code, errors = parse_count_lines(text)
+    product_ids = resolve_product_codes(session, by_code.keys())
+
+    counts = {}
+    not_found = []
+    for code, qty in by_code.items():
+        product_id = product_ids.get(normalize_code(code))
+        if product_id is None:
+            not_found.append(code)
+        else:
+            counts[product_id] = qty
+
+    recorded = set_counted_qtys(session, stock_count_id, counts)
+    return {'recorded': recorded, 'not_found': not_found, 'errors': errors}
+
+
+def remove_count_line(session, stock_count_id: int, product_id: int) -> bool:
+    """Remove one product from an OPEN count. Returns True if it existed."""
+    try:
+        _get_open_count(session, stock_count_id, lock=True)
+        deleted = (
+            session.query(StockCountLine)
+            .filter(
+                StockCountLine.stock_count_id == stock_count_id,
+                StockCountLine.product_id == product_id
+            )
+            .delete(synchronize_session=False)
+        )
+        session.commit()
+        return deleted > 0
+    except Exception:
+        session.rollback()
+        raise
+
+
+def get_count_preview(session, stock_count_id: int) -> list:
+    """
+    Get the count lines with the stock they would change (one query).
+
+    For APPLIED counts, current_qty is the stock recorded when applied.
+
+    Returns:
+        List of dicts: product_id, name, sku, counted_qty, current_qty, delta
+        (largest differences first)
+    """
+    current_qty = func.coalesce(
+        StockCountLine.expected_qty, ProductStock.on_hand_qty, Decimal('0')
+    ).label('current_qty')
+
+    rows = (
+        session.query(
+            StockCountLine.product_id,
+            Product.name,
+            Product.sku,
+            StockCountLine.counted_qty,
+            current_qty
+        )
+        .join(Product, Product.id == StockCountLine.product_id)
+        .outerjoin(ProductStock, ProductStock.product_id == StockCountLine.product_id)
+        .filter(StockCountLine.stock_count_id == stock_count_id)
+        .order_by(func.abs(StockCountLine.counted_qty - current_qty).desc(), Product.name)
+        .all()
+    )
+
+    return [
+        {
+            'product_id': row.product_id,
+            'name': row.name,
+            'sku': row.sku,
+            'counted_qty': row.counted_qty,
+            'current_qty': row.current_qty,
+            'delta': row.counted_qty - row.current_qty
+        }
+        for row in rows
+    ]
+
+
+def apply_stock_count(session, stock_count_id: int) -> Optional[StockMove]:
+    """
+    Apply a stock count as a single ADJUST stock_move.
+
+    Args:
+        session: SQLAlchemy session
+        stock_count_id: OPEN stock count
+
+    Returns:
+        StockMove created, or None if no product changed
+
+    Raises:
+        ValueError: For business logic errors
+        Exception: For other errors
+    """
+    try:
+        # Lock the count itself so it cannot be applied twice
+        stock_count = _get_open_count(session, stock_count_id, lock=True)
+
+        lines = (
+            session.query(StockCountLine.product_id, StockCountLine.counted_qty, Product.uom_id)
+            .join(Product, Product.id == StockCountLine.product_id)
+            .filter(StockCountLine.stock_count_id == stock_count_id)
+            .all()
+        )
+        if not lines:
+            raise ValueError('El inventario no tiene productos contados')
+
+        product_ids = [line.product_id for line in lines]
+
+        # One lock for every affected stock row
+        current = dict(
+            session.query(ProductStock.product_id, ProductStock.on_hand_qty)
+            .filter(ProductStock.product_id.in_(product_ids))
+            .order_by(ProductStock.product_id)
+            .with_for_update()
+            .all()
+        )
+
+        move_lines = []
+        count_updates = []
+        for line in lines:
+            current_qty = current.get(line.product_id, Decimal('0'))
+            count_updates.append({
+                'stock_count_id': stock_count_id,
+                'product_id': line.product_id,
+                'expected_qty': current_qty
+            })
+
+            delta = line.counted_qty - current_qty
+            if delta != 0:
+                move_lines.append({
+                    'product_id': line.product_id,
+                    'qty': delta,
+                    'uom_id': line.uom_id,
+                    'unit_cost': Decimal('0')  # Manual adjustments have no cost
+                })
+
+        stock_move = None
+        if move_lines:
+            stock_move = StockMove(
+                date=datetime.now(),
+                type=StockMoveType.ADJUST,
+                reference_type=StockReferenceType.MANUAL,
+                reference_id=stock_count_id,
+                notes=stock_count.notes or f'Inventario físico #{stock_count_id}'
+            )
+            session.add(stock_move)
+            session.flush()  # Get stock_move.id
+
+            for move_line in move_lines:
+                move_line['stock_move_id'] = stock_move.id
+            session.execute(insert(StockMoveLine), move_lines)
+
+        # Bulk UPDATE by primary key
+        session.execute(update(StockCountLine), count_updates)
+
+        stock_count.status = 'APPLIED'
+        stock_count.applied_at = datetime.now()
+        stock_count.stock_move_id = stock_move.id if stock_move else None
+
+        session.commit()
+        return stock_move
+
+    except ValueError:
+        session.rollback()
+        raise
+
+    except IntegrityError as e:
+        session.rollback()
+        raise Exception(f'Error de integridad al aplicar inventario: {str(e.orig)}')
+
+    except Exception as e:
+        session.rollback()
+        raise Exception(f'Error al aplicar inventario: {str(e)}')
+
+
+def cancel_stock_count(session, stock_count_id: int) -> None:
+    """Discard an OPEN stock count without touching stock."""
+    try:
+        stock_count = _get_open_count(session, stock_count_id, lock=True)
+        stock_count.status = 'CANCELLED'
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
@@ -0,0 +1,180 @@
+"""
+Point-in-time stock (stock at any past date).
+
+product_stock only holds the current quantity. Stock at an earlier moment is
+rebuilt from an anchor plus the signed stock_move_line deltas between the
+anchor and that moment, using the same sign rules as the product_stock
+triggers (IN +qty, OUT -qty, ADJUST qty as stored):
+
+- Latest stock_snapshot taken at or before the moment, replaying moves
+  forward (taken_at <= date < at).
+- If there is no such snapshot, current product_stock replaying moves
+  backwards (date >= at).
+
+Either way only the moves in the gap are read (idx_stock_move_date), so the
+cost does not grow with the size of stock_move_line. Snapshots are taken
+periodically with `flask snapshot-stock` (e.g. daily from cron).
+
+Moves dated before an existing snapshot (backdated adjustments) are not
+reflected in it: delete and retake the affected snapshots.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional
+from sqlalchemy import case, func, insert
+from app.models import ProductStock, StockMove, StockMoveLine, StockSnapshot, StockSnapshotLine
+from app.models.stock_move import StockMoveType
+from app.utils.formatters import ar_to_utc, get_now_ar
+
+
+def _signed_qty():
+    """stock_move_line.qty with the sign applied to product_stock."""
+    return case(
+        (StockMove.type == StockMoveType.IN, StockMoveLine.qty),
+        (StockMove.type == StockMoveType.OUT, -StockMoveLine.qty),
+        else_=StockMoveLine.qty
+    )
+
+
+def _move_deltas(session, start: Optional[datetime], end: Optional[datetime],
+                 product_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Sum signed move quantities per product for start <= date < end.
+
+    Returns:
+        dict: {product_id: Decimal delta}
+    """
+    query = (
+        session.query(
+            StockMoveLine.product_id,
+            func.sum(_signed_qty()).label('delta')
+        )
+        .join(StockMove, StockMove.id == StockMoveLine.stock_move_id)
+    )
+    if start is not None:
+        query = query.filter(StockMove.date >= start)
+    if end is not None:
+        query = query.filter(StockMove.date < end)
+    if product_ids is not None:
+        query = query.filter(StockMoveLine.product_id.in_(product_ids))
+
+    return {
+        row.product_id: row.delta
+        for row in query.group_by(StockMoveLine.product_id).all()
+    }
+
+
+def _latest_snapshot(session, at: datetime) -> Optional[StockSnapshot]:
+    """Latest snapshot taken at or before at."""
+    return (
+        session.query(StockSnapshot)
+        .filter(StockSnapshot.taken_at <= at)
+        .order_by(StockSnapshot.taken_at.desc())
+        .first()
+    )
+
+
+def get_stock_at(session, at: datetime, product_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Get on-hand quantity per product at a given moment.
+
+    Includes every move dated before at (the state at that exact instant).
+
+    Args:
+        session: SQLAlchemy session
+        at: Moment to evaluate (naive datetimes are Argentina local time)
+        product_ids: Restrict to these products (None = all)
+
+    Returns:
+        dict: {product_id: Decimal qty}, products with zero stock omitted
+    """
+    at = ar_to_utc(at)
+    if product_ids is not None:
+        product_ids = list(product_ids)
+
+    snapshot = _latest_snapshot(session, at)
+
+    if snapshot is not None:
+        base_query = (
+            session.query(StockSnapshotLine.product_id, StockSnapshotLine.on_hand_qty)
+            .filter(StockSnapshotLine.snapshot_id == snapshot.id)
+        )
+        if product_ids is not None:
+            base_query = base_query.filter(StockSnapshotLine.product_id.in_(product_ids))
+        sign = 1
+        deltas = _move_deltas(session, snapshot.taken_at, at, product_ids)
+    else:
+        base_query = session.query(ProductStock.product_id, ProductStock.on_hand_qty)
+        if product_ids is not None:
+            base_query = base_query.filter(ProductStock.product_id.in_(product_ids))
+        sign = -1
+        deltas = _move_deltas(session, at, None, product_ids)
+
+    stock = {row.product_id: row.on_hand_qty for row in base_query.all()}
+    for product_id, delta in deltas.items():
+        stock[product_id] = stock.get(product_id, Decimal('0')) + sign * delta
+
+    return {product_id: qty for product_id, qty in stock.items() if qty != 0}
+
+
+def get_stock_at_end_of_day(session, day: date, product_ids: Optional[Iterable[int]] = None) -> dict:
+    """
+    Get on-hand quantity per product at the close of an Argentina-local day.
+
+    Example:
+        get_stock_at_end_of_day(session, date(2025, 12, 31))  # year-end inventory
+    """
+    return get_stock_at(session, datetime.combine(day + timedelta(days=1), time.min), product_ids)
+
+
+def get_product_stock_at(session, product_id: int, at: datetime) -> Decimal:
+    """Get on-hand quantity of one product at a given moment."""
+    return get_stock_at(session, at, [product_id]).get(product_id, Decimal('0'))
+
+
+def take_stock_snapshot(session, taken_at: Optional[datetime] = None) -> StockSnapshot:
+    """
+    Store the stock of every product at taken_at.
+
+    Built from the closest anchor (previous snapshot or current stock), so it
+    only reads the moves in between. Taking a snapshot that already exists is
+    a no-op.
+
+    Args:
+        session: SQLAlchemy session
+        taken_at: Moment of the snapshot (default: today 00:00 Argentina time;
+                  naive datetimes are Argentina local time)
+
+    Returns:
+        StockSnapshot: The new (or existing) snapshot
+    """
+    if taken_at is None:
+        taken_at = datetime.combine(get_now_ar().date(), time.min)
+    taken_at = ar_to_utc(taken_at)
+
+    existing = session.query(StockSnapshot).filter(StockSnapshot.taken_at == taken_at).first()
+    if existing is not None:
+        return existing
+
+    stock = get_stock_at(session, taken_at)
+
+    try:
+        snapshot = StockSnapshot(taken_at=taken_at)
+        session.add(snapshot)
+        session.flush()
+
+        if stock:
+            session.execute(
+                insert(StockSnapshotLine),
+                [
+                    {'snapshot_id': snapshot.id, 'product_id': product_id, 'on_hand_qty': qty}
+                    for product_id, qty in stock.items()
+                ]
+            )
+
+        session.commit()
+        return snapshot
+
+    except Exception:
+        session.rollback()
+        raise
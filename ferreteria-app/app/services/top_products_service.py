@@ -1,23 +1,69 @@
 """Service for fetching top selling products."""
+from datetime import timedelta
 from decimal import Decimal
 from sqlalchemy import func, desc
-from app.models import Product, Sale, SaleLine, ProductStock
+from app.models import Product, ProductStock, ProductSalesStats, ProductSalesDaily
 
 
-def get_top_selling_products(session, limit=10):
+# Supported rolling windows (days); None = all-time
+TOP_PRODUCTS_WINDOWS = (7, 30, 365)
+
+
+def get_top_selling_products(session, limit=10, window_days=None, order_by='qty'):
     """
-    Get top selling products based on total quantity sold.
-    
+    Get top selling products from the pre-aggregated sales tables.
+
+    All-time rankings read product_sales_stats (one row per product);
+    rolling windows sum product_sales_daily over the last window_days days
+    (Argentina local date). Neither touches sale_line.
+
+    Args:
+        session: SQLAlchemy session
+        limit: Number of products to return
+        window_days: None (all-time) or one of TOP_PRODUCTS_WINDOWS
+        order_by: 'qty' (units sold) or 'revenue'
+
     Returns list of dicts with:
     - product_id
     - name
     - sale_price
     - stock (on_hand_qty)
     - total_sold
+    - total_revenue
     - has_stock (bool)
     """
     try:
-        # Query for top selling products
+        if window_days is not None and window_days not in TOP_PRODUCTS_WINDOWS:
+            raise ValueError(f'Ventana inválida: {window_days}. Use {TOP_PRODUCTS_WINDOWS}')
+
+        if window_days is None:
+            stats = (
+                session.query(
+                    ProductSalesStats.product_id.label('product_id'),
+                    ProductSalesStats.total_qty.label('total_sold'),
+                    ProductSalesStats.total_revenue.label('total_revenue')
+                )
+                .filter(ProductSalesStats.total_qty > 0)
+                .subquery()
+            )
+        else:
+            from app.utils.formatters import get_now_ar
+            since = get_now_ar().date() - timedelta(days=window_days - 1)
+
+            stats = (
+                session.query(
+                    ProductSalesDaily.product_id.label('product_id'),
+                    func.sum(ProductSalesDaily.qty).label('total_sold'),
+                    func.sum(ProductSalesDaily.revenue).label('total_revenue')
+                )
+                .filter(ProductSalesDaily.sale_date >= since)
+                .group_by(ProductSalesDaily.product_id)
+                .having(func.sum(ProductSalesDaily.qty) > 0)
+                .subquery()
+            )
+
+        sort_col = stats.c.total_revenue if order_by == 'revenue' else stats.c.total_sold
+
         query = (
             session.query(
                 Product.id.label('product_id'),
@@ -25,42 +71,47 @@ def get_top_selling_products(session, limit=10):
                 Product.sale_price.label('sale_price'),
                 Product.image_path.label('image_path'),
                 func.coalesce(ProductStock.on_hand_qty, Decimal('0')).label('stock'),
-                func.sum(SaleLine.qty).label('total_sold')
+                stats.c.total_sold,
+                stats.c.total_revenue
             )
-            .join(SaleLine, SaleLine.product_id == Product.id)
-            .join(Sale, Sale.id == SaleLine.sale_id)
+            .join(stats, stats.c.product_id == Product.id)
             .outerjoin(ProductStock, ProductStock.product_id == Product.id)
-            .filter(Sale.status == 'CONFIRMED')  # Only confirmed sales
             .filter(Product.active == True)  # Only active products
-            .group_by(
-                Product.id,
-                Product.name,
-                Product.sale_price,
-                Product.image_path,
-                ProductStock.on_hand_qty
-            )
-            .order_by(desc('total_sold'))
+            .order_by(desc(sort_col), Product.id)
             .limit(limit)
         )
-        
+
         results = query.all()
-        
+
         # Convert to list of dicts
         top_products = []
         for row in results:
+            stock = row.stock if row.stock is not None else Decimal('0')
             top_products.append({
                 'product_id': row.product_id,
                 'name': row.name,
                 'sale_price': row.sale_price,
-                'stock': row.stock if row.stock is not None else Decimal('0'),
+                'stock': stock,
                 'total_sold': row.total_sold if row.total_sold is not None else Decimal('0'),
-                'has_stock': (row.stock if row.stock is not None else Decimal('0')) > 0,
+                'total_revenue': row.total_revenue if row.total_revenue is not None else Decimal('0'),
+                'has_stock': stock > 0,
                 'image_path': row.image_path
             })
-        
+
         return top_products
-        
+
     except Exception as e:
         # Return empty list on error
         print(f"Error getting top selling products: {e}")
         return []
+
+
+def rebuild_product_sales_stats(session) -> None:
+    """
+    Recompute product_sales_stats / product_sales_daily from sale history.
+
+    Only needed after manual data fixes; triggers keep the tables current.
+    """
+    from sqlalchemy import text
+    session.execute(text('SELECT rebuild_product_sales_stats()'))
+    session.commit()
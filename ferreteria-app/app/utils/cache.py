@@ -0,0 +1,76 @@
+"""
+In-process caches shared by services.
+
+Each gunicorn worker holds its own copy: explicit invalidation only reaches
+the worker that made the change, so every entry also carries a TTL that
+bounds how long the other workers can serve a stale value.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry time-to-live (thread-safe).
+
+    Example:
+        cache = TTLCache(maxsize=1024, ttl=30)
+        cache.set('7791234567890', {...})
+        cache.get('7791234567890')  # -> {...} or None once expired/evicted
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        """Store value under key, evicting the least recently used entry if full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        """Remove key from the cache (no-op if missing)."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate) -> int:
+        """
+        Remove every entry whose value satisfies predicate(value).
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self._lock:
+            keys = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -55,6 +55,30 @@ def ar_to_utc(dt: datetime) -> datetime:
     return dt.astimezone(timezone.utc)
 
 
+def ar_date_to_utc_bounds(start: Optional[date], end: Optional[date]):
+    """
+    Convierte un rango de fechas locales de Argentina (inclusivo) a límites UTC.
+    
+    Permite filtrar columnas TIMESTAMPTZ con comparaciones directas
+    (col >= inicio AND col < fin), que sí usan los índices sobre la columna.
+    
+    Args:
+        start: Primer día del rango (o None)
+        end: Último día del rango, inclusive (o None)
+    
+    Returns:
+        Tupla (inicio_utc, fin_utc_exclusivo); cada valor es None si su fecha es None
+    
+    Examples:
+        ar_date_to_utc_bounds(date(2026, 1, 1), date(2026, 1, 31))
+        -> (2026-01-01 03:00 UTC, 2026-02-01 03:00 UTC)
+    """
+    from datetime import time, timedelta
+    start_utc = ar_to_utc(datetime.combine(start, time.min)) if start else None
+    end_utc = ar_to_utc(datetime.combine(end + timedelta(days=1), time.min)) if end else None
+    return start_utc, end_utc
+
+
 def num_ar(value: Union[int, float, Decimal, str, None], decimals: Optional[int] = None) -> str:
     """
     Formatea un número en estilo argentino:
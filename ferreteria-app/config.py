@@ -42,6 +42,33 @@ class Config:
     # Stock Configuration (MEJORA 10 - Stock Filters)
     LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', '10'))
     
+    # POS barcode/SKU lookup cache (per worker)
+    PRODUCT_LOOKUP_CACHE_SIZE = int(os.getenv('PRODUCT_LOOKUP_CACHE_SIZE', '2048'))
+    PRODUCT_LOOKUP_CACHE_TTL = int(os.getenv('PRODUCT_LOOKUP_CACHE_TTL', '30'))
+    
+    # Catalog list totals cache TTL in seconds (per worker)
+    PRODUCT_COUNT_CACHE_TTL = int(os.getenv('PRODUCT_COUNT_CACHE_TTL', '60'))
+    
+    # Invoice alert counts (navbar badge) cache TTL in seconds
+    INVOICE_ALERTS_CACHE_TTL = int(os.getenv('INVOICE_ALERTS_CACHE_TTL', '60'))
+    
+    # Reorder suggestions (flask compute-reorder): sales windows, supplier
+    # lead time and days of sales each purchase should cover
+    REORDER_SHORT_WINDOW_DAYS = int(os.getenv('REORDER_SHORT_WINDOW_DAYS', '30'))
+    REORDER_LONG_WINDOW_DAYS = int(os.getenv('REORDER_LONG_WINDOW_DAYS', '90'))
+    REORDER_LEAD_TIME_DAYS = int(os.getenv('REORDER_LEAD_TIME_DAYS', '7'))
+    REORDER_COVER_DAYS = int(os.getenv('REORDER_COVER_DAYS', '30'))
+    
+    # POS cart storage: 'db' (pos_cart_line table) or 'session' (signed cookie)
+    CART_STORE = os.getenv('CART_STORE', 'db')
+    
+    # Quote PDF rendering: worker processes per gunicorn worker, shared file
+    # cache (must be the same directory for every gunicorn worker) and max
+    # seconds the no-JavaScript download waits for a render
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', '1'))
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', '/tmp/ferreteria-pdf')
+    PDF_RENDER_TIMEOUT = int(os.getenv('PDF_RENDER_TIMEOUT', '30'))
+    
     # Business Information (for quotes/invoices)
     BUSINESS_NAME = os.getenv('BUSINESS_NAME', 'Ferretería')
     BUSINESS_ADDRESS = os.getenv('BUSINESS_ADDRESS', '')
@@ -0,0 +1,66 @@
+-- Benchmark: local-time vs UTC-bound date filters on finance_ledger
+--
+-- Builds a 1M-row copy of finance_ledger in a scratch schema (does not touch
+-- real data) and compares the plans of:
+--   A) the previous filter: timezone('America/Argentina/Buenos_Aires', datetime)
+--      BETWEEN local bounds  -> cannot use idx on datetime (Seq Scan)
+--   B) the current filter: datetime >= utc_start AND datetime < utc_end
+--      (bounds computed in Python by ar_date_to_utc_bounds) -> Index Scan
+--
+-- Run:
+--   docker compose exec db psql -U ferreteria -d ferreteria -f /path/to/ledger_date_filters.sql
+--
+-- Expected: A reads the whole table (Seq Scan, ~1M rows filtered);
+-- B reads only the rows of the month (Index/Bitmap Scan on bench_ledger_datetime).
+-- Measured plans: ledger_date_filters.results.txt
+
+BEGIN;
+
+CREATE SCHEMA IF NOT EXISTS bench;
+
+DROP TABLE IF EXISTS bench.finance_ledger;
+-- No INCLUDING DEFAULTS: ids are generated here so the real sequence is not consumed
+CREATE TABLE bench.finance_ledger (LIKE public.finance_ledger);
+
+-- ~1M entries spread over 3 years
+INSERT INTO bench.finance_ledger(id, datetime, type, amount, concept, reference_type, payment_method, updated_at)
+SELECT g,
+       timestamptz '2024-01-01 03:00+00' + (random() * interval '1095 days'),
+       CASE WHEN random() < 0.8 THEN 'INCOME'::ledger_type ELSE 'EXPENSE'::ledger_type END,
+       round((random() * 50000)::numeric, 2),
+       'bench',
+       'SALE'::ledger_ref_type,
+       CASE WHEN random() < 0.6 THEN 'CASH' ELSE 'TRANSFER' END,
+       now()
+  FROM generate_series(1, 1000000) AS g;
+
+CREATE INDEX bench_ledger_datetime ON bench.finance_ledger(datetime DESC);
+ANALYZE bench.finance_ledger;
+
+-- A) Previous: local-time expression on the column
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT count(*), sum(amount)
+  FROM bench.finance_ledger
+ WHERE deleted_at IS NULL
+   AND timezone('America/Argentina/Buenos_Aires', datetime) >= timestamp '2025-03-01 00:00:00'
+   AND timezone('America/Argentina/Buenos_Aires', datetime) <= timestamp '2025-03-31 23:59:59';
+
+-- B) Current: UTC bounds (2025-03-01 00:00 ART = 03:00 UTC)
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT count(*), sum(amount)
+  FROM bench.finance_ledger
+ WHERE deleted_at IS NULL
+   AND datetime >= timestamptz '2025-03-01 03:00:00+00'
+   AND datetime <  timestamptz '2025-04-01 03:00:00+00';
+
+-- Ledger page (keyset, newest first) with the same range
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT *
+  FROM bench.finance_ledger
+ WHERE deleted_at IS NULL
+   AND datetime >= timestamptz '2025-03-01 03:00:00+00'
+   AND datetime <  timestamptz '2025-04-01 03:00:00+00'
+ ORDER BY datetime DESC, id DESC
+ LIMIT 101;
+
+ROLLBACK;
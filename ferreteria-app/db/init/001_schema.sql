@@ -8,8 +8,9 @@
 
 BEGIN;
 
--- Optional (recommended) for better product search:
--- CREATE EXTENSION IF NOT EXISTS pg_trgm;
+-- Product search (trigram indexes + accent-insensitive matching)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
 
 -- =========================
 -- ENUM TYPES
@@ -273,7 +274,7 @@ CREATE TABLE IF NOT EXISTS finance_ledger (
 CREATE INDEX IF NOT EXISTS idx_product_category     ON product(category_id);
 CREATE INDEX IF NOT EXISTS idx_product_uom          ON product(uom_id);
 CREATE INDEX IF NOT EXISTS idx_product_active       ON product(active);
-CREATE INDEX IF NOT EXISTS idx_product_name         ON product(name);
+CREATE INDEX IF NOT EXISTS idx_product_name_id      ON product(name, id); -- catalog keyset pagination
 CREATE INDEX IF NOT EXISTS idx_product_min_stock_qty ON product(min_stock_qty); -- MEJORA 11
 
 -- Product UOM Prices (MEJORA A)
@@ -308,6 +309,7 @@ CREATE INDEX IF NOT EXISTS idx_invoice_supplier     ON purchase_invoice(supplier
 CREATE INDEX IF NOT EXISTS idx_invoice_status       ON purchase_invoice(status);
 CREATE INDEX IF NOT EXISTS idx_invoice_due_date     ON purchase_invoice(due_date);
 CREATE INDEX IF NOT EXISTS idx_invoice_date         ON purchase_invoice(invoice_date);
+CREATE INDEX IF NOT EXISTS idx_invoice_date_id      ON purchase_invoice(invoice_date DESC, id DESC); -- keyset list
 CREATE INDEX IF NOT EXISTS idx_invoice_line_invoice ON purchase_invoice_line(invoice_id);
 CREATE INDEX IF NOT EXISTS idx_invoice_line_product ON purchase_invoice_line(product_id);
 -- Fast "debt" queries
@@ -596,7 +598,7 @@ $$ LANGUAGE plpgsql;
 
 -- Recrear trigger
 CREATE TRIGGER trg_check_single_base_uom
-    BEFORE INSERT OR UPDATE ON product_uom_price
+    BEFORE INSERT OR UPDATE OF is_base, product_id ON product_uom_price
     FOR EACH ROW
     EXECUTE FUNCTION check_single_base_uom();
 
@@ -636,6 +638,802 @@ CREATE TRIGGER missing_product_set_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION trg_missing_product_set_updated_at();
 
+-- =========================
+-- PRODUCT SEARCH INDEXES (pg_trgm + unaccent)
+-- =========================
+-- IMMUTABLE wrapper so unaccent() can be used in index expressions
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent', $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+CREATE INDEX IF NOT EXISTS idx_product_name_trgm
+    ON product USING gin (lower(f_unaccent(name)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_sku_trgm
+    ON product USING gin (lower(sku) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_barcode_trgm
+    ON product USING gin (lower(barcode) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_sku_lower ON product (lower(sku));
+CREATE INDEX IF NOT EXISTS idx_product_barcode_lower ON product (lower(barcode));
+
+
+-- =========================
+-- PRODUCT SALES STATS (top-selling products)
+-- =========================
+-- Maintained by triggers on sale_line / sale (CONFIRMED sales only)
+-- All-time totals per product (POS landing page)
+CREATE TABLE IF NOT EXISTS product_sales_stats (
+    product_id    BIGINT PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE,
+    total_qty     NUMERIC(14,2) NOT NULL DEFAULT 0,
+    total_revenue NUMERIC(14,2) NOT NULL DEFAULT 0,
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_sales_stats_qty ON product_sales_stats(total_qty DESC);
+CREATE INDEX IF NOT EXISTS idx_product_sales_stats_revenue ON product_sales_stats(total_revenue DESC);
+
+-- Per product and Argentina-local day (rolling 7/30/365 day windows)
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    product_id BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+    sale_date  DATE NOT NULL,
+    qty        NUMERIC(14,2) NOT NULL DEFAULT 0,
+    revenue    NUMERIC(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, sale_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_sales_daily_date ON product_sales_daily(sale_date);
+
+-- Apply a delta to both aggregates
+CREATE OR REPLACE FUNCTION apply_product_sales_delta(
+    p_product_id BIGINT, p_sale_date DATE, p_qty NUMERIC, p_revenue NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO product_sales_stats(product_id, total_qty, total_revenue, updated_at)
+    VALUES (p_product_id, p_qty, p_revenue, now())
+    ON CONFLICT (product_id) DO UPDATE
+        SET total_qty     = product_sales_stats.total_qty + EXCLUDED.total_qty,
+            total_revenue = product_sales_stats.total_revenue + EXCLUDED.total_revenue,
+            updated_at    = now();
+
+    INSERT INTO product_sales_daily(product_id, sale_date, qty, revenue)
+    VALUES (p_product_id, p_sale_date, p_qty, p_revenue)
+    ON CONFLICT (product_id, sale_date) DO UPDATE
+        SET qty     = product_sales_daily.qty + EXCLUDED.qty,
+            revenue = product_sales_daily.revenue + EXCLUDED.revenue;
+END;
+$$ LANGUAGE plpgsql;
+
+-- sale_line INSERT / UPDATE / DELETE
+CREATE OR REPLACE FUNCTION trg_sale_line_sales_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_status sale_status;
+    v_date   DATE;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT status, (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+          INTO v_status, v_date
+          FROM sale WHERE id = OLD.sale_id;
+
+        -- Sale already gone (cascade delete): nothing to reverse
+        IF FOUND AND v_status = 'CONFIRMED' THEN
+            PERFORM apply_product_sales_delta(OLD.product_id, v_date, -OLD.qty, -OLD.line_total);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT status, (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+          INTO v_status, v_date
+          FROM sale WHERE id = NEW.sale_id;
+
+        IF v_status = 'CONFIRMED' THEN
+            PERFORM apply_product_sales_delta(NEW.product_id, v_date, NEW.qty, NEW.line_total);
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sale_line_sales_stats ON sale_line;
+CREATE TRIGGER sale_line_sales_stats
+AFTER INSERT OR UPDATE OR DELETE ON sale_line
+FOR EACH ROW
+EXECUTE FUNCTION trg_sale_line_sales_stats();
+
+-- sale status change (void: CONFIRMED -> CANCELLED)
+CREATE OR REPLACE FUNCTION trg_sale_status_sales_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_sign NUMERIC;
+    v_date DATE;
+BEGIN
+    IF OLD.status = 'CONFIRMED' AND NEW.status <> 'CONFIRMED' THEN
+        v_sign := -1;
+    ELSIF NEW.status = 'CONFIRMED' AND OLD.status <> 'CONFIRMED' THEN
+        v_sign := 1;
+    ELSE
+        RETURN NEW;
+    END IF;
+
+    v_date := (NEW.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date;
+
+    PERFORM apply_product_sales_delta(sl.product_id, v_date, v_sign * sl.qty, v_sign * sl.line_total)
+       FROM sale_line sl
+      WHERE sl.sale_id = NEW.id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sale_status_sales_stats ON sale;
+CREATE TRIGGER sale_status_sales_stats
+AFTER UPDATE OF status ON sale
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION trg_sale_status_sales_stats();
+
+-- Full rebuild from sale history (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_product_sales_stats()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM product_sales_daily;
+    DELETE FROM product_sales_stats;
+
+    INSERT INTO product_sales_daily(product_id, sale_date, qty, revenue)
+    SELECT sl.product_id,
+           (s.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+           SUM(sl.qty),
+           SUM(sl.line_total)
+      FROM sale_line sl
+      JOIN sale s ON s.id = sl.sale_id
+     WHERE s.status = 'CONFIRMED'
+     GROUP BY 1, 2;
+
+    INSERT INTO product_sales_stats(product_id, total_qty, total_revenue, updated_at)
+    SELECT product_id, SUM(qty), SUM(revenue), now()
+      FROM product_sales_daily
+     GROUP BY product_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =========================
+-- SERVER-SIDE POS CART
+-- =========================
+CREATE TABLE IF NOT EXISTS pos_cart_line (
+    cart_id    VARCHAR(64) NOT NULL,
+    line_key   VARCHAR(64) NOT NULL,
+    product_id BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+    uom_id     BIGINT NOT NULL REFERENCES uom(id) ON DELETE CASCADE,
+    qty        NUMERIC(12,3) NOT NULL CHECK (qty > 0),
+    qty_base   NUMERIC(14,4) NOT NULL CHECK (qty_base > 0),
+    unit_price NUMERIC(12,2) NOT NULL CHECK (unit_price >= 0),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (cart_id, line_key)
+);
+
+-- Cleanup of abandoned carts (purge_stale_carts)
+CREATE INDEX IF NOT EXISTS idx_pos_cart_line_updated_at ON pos_cart_line(updated_at);
+
+
+-- =========================
+-- LEDGER DAILY ROLLUP (balance reports)
+-- =========================
+CREATE TABLE IF NOT EXISTS ledger_daily_rollup (
+  local_date     DATE NOT NULL,
+  type           ledger_type NOT NULL,
+  payment_method VARCHAR(20) NOT NULL,
+  amount         NUMERIC(14,2) NOT NULL DEFAULT 0,
+  entry_count    INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (local_date, type, payment_method)
+);
+
+CREATE OR REPLACE FUNCTION apply_ledger_rollup_delta(
+  p_local_date DATE, p_type ledger_type, p_payment_method VARCHAR, p_amount NUMERIC, p_count INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO ledger_daily_rollup(local_date, type, payment_method, amount, entry_count)
+  VALUES (p_local_date, p_type, p_payment_method, p_amount, p_count)
+  ON CONFLICT (local_date, type, payment_method) DO UPDATE
+    SET amount      = ledger_daily_rollup.amount + EXCLUDED.amount,
+        entry_count = ledger_daily_rollup.entry_count + EXCLUDED.entry_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_finance_ledger_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+    PERFORM apply_ledger_rollup_delta(
+      (OLD.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+      OLD.type, OLD.payment_method, -OLD.amount, -1
+    );
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NEW.deleted_at IS NULL THEN
+      PERFORM apply_ledger_rollup_delta(
+        (NEW.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+        NEW.type, NEW.payment_method, NEW.amount, 1
+      );
+    END IF;
+    RETURN NEW;
+  END IF;
+
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS finance_ledger_rollup ON finance_ledger;
+CREATE TRIGGER finance_ledger_rollup
+AFTER INSERT OR UPDATE OF datetime, type, amount, payment_method, deleted_at OR DELETE ON finance_ledger
+FOR EACH ROW
+EXECUTE FUNCTION trg_finance_ledger_rollup();
+
+-- Full rebuild from finance_ledger (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_ledger_daily_rollup()
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM ledger_daily_rollup;
+
+  INSERT INTO ledger_daily_rollup(local_date, type, payment_method, amount, entry_count)
+  SELECT (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+         type, payment_method, SUM(amount), COUNT(*)
+    FROM finance_ledger
+   WHERE deleted_at IS NULL
+   GROUP BY 1, 2, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =========================
+-- LEDGER RUNNING BALANCE (per payment method)
+-- =========================
+-- Running ledger balance per payment method (cash drawer vs transfer),
+-- maintained by trigger on finance_ledger. Soft-deleted rows are not counted.
+CREATE TABLE IF NOT EXISTS ledger_balance (
+  payment_method VARCHAR(20) PRIMARY KEY,
+  income_total   NUMERIC(14,2) NOT NULL DEFAULT 0,
+  expense_total  NUMERIC(14,2) NOT NULL DEFAULT 0,
+  updated_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO ledger_balance(payment_method) VALUES ('CASH'), ('TRANSFER')
+ON CONFLICT (payment_method) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION apply_ledger_balance_delta(
+  p_payment_method VARCHAR, p_type ledger_type, p_amount NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO ledger_balance(payment_method, income_total, expense_total, updated_at)
+  VALUES (
+    p_payment_method,
+    CASE WHEN p_type = 'INCOME' THEN p_amount ELSE 0 END,
+    CASE WHEN p_type = 'EXPENSE' THEN p_amount ELSE 0 END,
+    now()
+  )
+  ON CONFLICT (payment_method) DO UPDATE
+    SET income_total  = ledger_balance.income_total + EXCLUDED.income_total,
+        expense_total = ledger_balance.expense_total + EXCLUDED.expense_total,
+        updated_at    = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_finance_ledger_balance()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+    PERFORM apply_ledger_balance_delta(OLD.payment_method, OLD.type, -OLD.amount);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NEW.deleted_at IS NULL THEN
+      PERFORM apply_ledger_balance_delta(NEW.payment_method, NEW.type, NEW.amount);
+    END IF;
+    RETURN NEW;
+  END IF;
+
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS finance_ledger_balance ON finance_ledger;
+CREATE TRIGGER finance_ledger_balance
+AFTER INSERT OR UPDATE OF type, amount, payment_method, deleted_at OR DELETE ON finance_ledger
+FOR EACH ROW
+EXECUTE FUNCTION trg_finance_ledger_balance();
+
+-- Full rebuild from finance_ledger (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_ledger_balance()
+RETURNS VOID AS $$
+BEGIN
+  UPDATE ledger_balance
+     SET income_total = 0, expense_total = 0, updated_at = now();
+
+  INSERT INTO ledger_balance(payment_method, income_total, expense_total, updated_at)
+  SELECT payment_method,
+         COALESCE(SUM(amount) FILTER (WHERE type = 'INCOME'), 0),
+         COALESCE(SUM(amount) FILTER (WHERE type = 'EXPENSE'), 0),
+         now()
+    FROM finance_ledger
+   WHERE deleted_at IS NULL
+   GROUP BY payment_method
+  ON CONFLICT (payment_method) DO UPDATE
+    SET income_total  = EXCLUDED.income_total,
+        expense_total = EXCLUDED.expense_total,
+        updated_at    = now();
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =========================
+-- INVENTORY VALUATION (balance "Fondo de Comercio")
+-- =========================
+CREATE TABLE IF NOT EXISTS product_valuation (
+  product_id  BIGINT PRIMARY KEY,
+  category_id BIGINT,
+  on_hand_qty NUMERIC(12,3) NOT NULL DEFAULT 0,
+  sale_price  NUMERIC(12,2),
+  unit_cost   NUMERIC(14,2),
+  sale_value  NUMERIC NOT NULL DEFAULT 0,
+  cost_value  NUMERIC NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Inventory value per category (category_key 0 = sin categoría), folded
+-- from inventory_valuation_delta by fold_inventory_valuation()
+CREATE TABLE IF NOT EXISTS inventory_valuation (
+  category_key BIGINT PRIMARY KEY,
+  sale_value   NUMERIC NOT NULL DEFAULT 0,
+  cost_value   NUMERIC NOT NULL DEFAULT 0,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Pending changes of the per-category totals. Insert-only from the
+-- valuation trigger: sales append rows and never update a shared row, so
+-- they neither serialize nor deadlock on hot categories.
+CREATE TABLE IF NOT EXISTS inventory_valuation_delta (
+  id           BIGSERIAL PRIMARY KEY,
+  category_key BIGINT NOT NULL,
+  sale_value   NUMERIC NOT NULL,
+  cost_value   NUMERIC NOT NULL,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Latest purchase cost per product (ORDER BY id DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_invoice_line_product_latest ON purchase_invoice_line(product_id, id DESC);
+
+-- Recompute one product's valuation row and append the change of its
+-- category totals to inventory_valuation_delta (no shared row is updated)
+CREATE OR REPLACE FUNCTION refresh_product_valuation(p_product_id BIGINT)
+RETURNS VOID AS $$
+DECLARE
+  v_old       product_valuation%ROWTYPE;
+  v_has_old   BOOLEAN;
+  v_category  BIGINT;
+  v_active    BOOLEAN;
+  v_qty       NUMERIC;
+  v_price     NUMERIC;
+  v_cost      NUMERIC;
+  v_sale_val  NUMERIC := 0;
+  v_cost_val  NUMERIC := 0;
+BEGIN
+  SELECT * INTO v_old FROM product_valuation WHERE product_id = p_product_id FOR UPDATE;
+  v_has_old := FOUND;
+
+  SELECT category_id, active INTO v_category, v_active FROM product WHERE id = p_product_id;
+
+  IF NOT FOUND THEN
+    -- Product deleted: remove its row and its contribution
+    IF v_has_old THEN
+      DELETE FROM product_valuation WHERE product_id = p_product_id;
+      IF v_old.sale_value <> 0 OR v_old.cost_value <> 0 THEN
+        INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+        VALUES (COALESCE(v_old.category_id, 0), -v_old.sale_value, -v_old.cost_value);
+      END IF;
+    END IF;
+    RETURN;
+  END IF;
+
+  SELECT on_hand_qty INTO v_qty FROM product_stock WHERE product_id = p_product_id;
+  SELECT sale_price INTO v_price FROM product_uom_price
+   WHERE product_id = p_product_id AND is_base = true LIMIT 1;
+  SELECT unit_cost INTO v_cost FROM purchase_invoice_line
+   WHERE product_id = p_product_id ORDER BY id DESC LIMIT 1;
+
+  v_qty := COALESCE(v_qty, 0);
+
+  IF v_active AND v_qty > 0 THEN
+    v_sale_val := v_qty * COALESCE(v_price, 0);
+    v_cost_val := v_qty * COALESCE(v_cost, 0);
+  END IF;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  VALUES (p_product_id, v_category, v_qty, v_price, v_cost, v_sale_val, v_cost_val, now())
+  ON CONFLICT (product_id) DO UPDATE
+    SET category_id = EXCLUDED.category_id,
+        on_hand_qty = EXCLUDED.on_hand_qty,
+        sale_price  = EXCLUDED.sale_price,
+        unit_cost   = EXCLUDED.unit_cost,
+        sale_value  = EXCLUDED.sale_value,
+        cost_value  = EXCLUDED.cost_value,
+        updated_at  = now();
+
+  IF v_has_old AND COALESCE(v_old.category_id, 0) = COALESCE(v_category, 0) THEN
+    -- Same category: one row with the difference (none if unchanged)
+    IF v_sale_val <> v_old.sale_value OR v_cost_val <> v_old.cost_value THEN
+      INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+      VALUES (COALESCE(v_category, 0), v_sale_val - v_old.sale_value, v_cost_val - v_old.cost_value);
+    END IF;
+    RETURN;
+  END IF;
+
+  IF v_has_old AND (v_old.sale_value <> 0 OR v_old.cost_value <> 0) THEN
+    INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+    VALUES (COALESCE(v_old.category_id, 0), -v_old.sale_value, -v_old.cost_value);
+  END IF;
+  IF v_sale_val <> 0 OR v_cost_val <> 0 THEN
+    INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+    VALUES (COALESCE(v_category, 0), v_sale_val, v_cost_val);
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply the pending deltas to inventory_valuation. Only one fold runs at a
+-- time (advisory lock; a concurrent caller returns -1 and just reads the
+-- deltas), and category rows are written in category_key order. Deltas of
+-- transactions not yet committed are not visible and stay for the next fold.
+CREATE OR REPLACE FUNCTION fold_inventory_valuation()
+RETURNS INTEGER AS $$
+DECLARE
+  v_folded INTEGER;
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('inventory_valuation')) THEN
+    RETURN -1;
+  END IF;
+
+  WITH moved AS (
+    DELETE FROM inventory_valuation_delta
+    RETURNING category_key, sale_value, cost_value
+  )
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  SELECT category_key, SUM(sale_value), SUM(cost_value), now()
+    FROM moved
+   GROUP BY category_key
+   ORDER BY category_key
+  ON CONFLICT (category_key) DO UPDATE
+    SET sale_value = inventory_valuation.sale_value + EXCLUDED.sale_value,
+        cost_value = inventory_valuation.cost_value + EXCLUDED.cost_value,
+        updated_at = now();
+
+  GET DIAGNOSTICS v_folded = ROW_COUNT;
+  RETURN v_folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Stock changes (apply_stock_delta from stock_move_line triggers)
+CREATE OR REPLACE FUNCTION trg_product_stock_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM refresh_product_valuation(NEW.product_id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_stock_valuation ON product_stock;
+CREATE TRIGGER product_stock_valuation
+AFTER INSERT OR UPDATE OF on_hand_qty ON product_stock
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_stock_valuation();
+
+-- Base price changes (product_uom_service.create_or_update_uom_prices)
+-- and latest purchase cost (purchase_invoice_line)
+CREATE OR REPLACE FUNCTION trg_product_ref_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM refresh_product_valuation(OLD.product_id);
+    RETURN OLD;
+  END IF;
+
+  IF TG_OP = 'UPDATE' AND OLD.product_id <> NEW.product_id THEN
+    PERFORM refresh_product_valuation(OLD.product_id);
+  END IF;
+  PERFORM refresh_product_valuation(NEW.product_id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_uom_price_valuation ON product_uom_price;
+CREATE TRIGGER product_uom_price_valuation
+AFTER INSERT OR UPDATE OF sale_price, is_base, product_id OR DELETE ON product_uom_price
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_ref_valuation();
+
+DROP TRIGGER IF EXISTS purchase_invoice_line_valuation ON purchase_invoice_line;
+CREATE TRIGGER purchase_invoice_line_valuation
+AFTER INSERT OR UPDATE OF unit_cost, product_id OR DELETE ON purchase_invoice_line
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_ref_valuation();
+
+-- Product activation / category changes / deletion
+CREATE OR REPLACE FUNCTION trg_product_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM refresh_product_valuation(OLD.id);
+    RETURN OLD;
+  END IF;
+
+  PERFORM refresh_product_valuation(NEW.id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_valuation_refresh ON product;
+CREATE TRIGGER product_valuation_refresh
+AFTER UPDATE OF active, category_id OR DELETE ON product
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_valuation();
+
+-- Full rebuild (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_inventory_valuation()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('inventory_valuation'));
+
+  DELETE FROM product_valuation;
+  DELETE FROM inventory_valuation_delta;
+  DELETE FROM inventory_valuation;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  SELECT p.id,
+         p.category_id,
+         COALESCE(ps.on_hand_qty, 0),
+         up.sale_price,
+         lc.unit_cost,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(up.sale_price, 0) ELSE 0 END,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(lc.unit_cost, 0) ELSE 0 END,
+         now()
+    FROM product p
+    LEFT JOIN product_stock ps ON ps.product_id = p.id
+    LEFT JOIN LATERAL (
+      SELECT pup.sale_price FROM product_uom_price pup
+       WHERE pup.product_id = p.id AND pup.is_base = true LIMIT 1
+    ) up ON true
+    LEFT JOIN LATERAL (
+      SELECT pil.unit_cost FROM purchase_invoice_line pil
+       WHERE pil.product_id = p.id ORDER BY pil.id DESC LIMIT 1
+    ) lc ON true;
+
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  SELECT COALESCE(category_id, 0), SUM(sale_value), SUM(cost_value), now()
+    FROM product_valuation
+   GROUP BY COALESCE(category_id, 0)
+   ORDER BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =========================
+-- STOCK SNAPSHOTS (stock at date)
+-- =========================
+-- Periodic stock snapshots for point-in-time stock (stock_history_service).
+-- A snapshot holds the stock resulting from every move dated before taken_at.
+-- Stock at T = latest snapshot taken at or before T + signed stock_move_line
+-- deltas with taken_at <= stock_move.date < T.
+CREATE TABLE IF NOT EXISTS stock_snapshot (
+  id         BIGSERIAL PRIMARY KEY,
+  taken_at   TIMESTAMPTZ NOT NULL UNIQUE,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Only products with non-zero stock are stored
+CREATE TABLE IF NOT EXISTS stock_snapshot_line (
+  snapshot_id BIGINT NOT NULL REFERENCES stock_snapshot(id) ON DELETE CASCADE,
+  product_id  BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  on_hand_qty NUMERIC(12,3) NOT NULL,
+  PRIMARY KEY (snapshot_id, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_snapshot_line_product ON stock_snapshot_line(product_id);
+
+
+-- =========================
+-- STOCK COUNT (physical inventory)
+-- =========================
+-- Physical inventory (stock take): counts are collected here and applied
+-- at once as a single ADJUST stock_move (reference_type MANUAL,
+-- reference_id = stock_count.id) with one line per changed product.
+CREATE TABLE IF NOT EXISTS stock_count (
+  id            BIGSERIAL PRIMARY KEY,
+  status        VARCHAR(20) NOT NULL DEFAULT 'OPEN' CHECK (status IN ('OPEN', 'APPLIED', 'CANCELLED')),
+  notes         TEXT NULL,
+  stock_move_id BIGINT NULL REFERENCES stock_move(id) ON DELETE SET NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  applied_at    TIMESTAMPTZ NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_count_status ON stock_count(status);
+
+-- expected_qty is the system stock when the count was applied
+CREATE TABLE IF NOT EXISTS stock_count_line (
+  stock_count_id BIGINT NOT NULL REFERENCES stock_count(id) ON DELETE CASCADE,
+  product_id     BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  counted_qty    NUMERIC(12,3) NOT NULL CHECK (counted_qty >= 0),
+  expected_qty   NUMERIC(12,3) NULL,
+  updated_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (stock_count_id, product_id)
+);
+
+
+-- =========================
+-- DOCUMENT NUMBER SEQUENCES
+-- =========================
+-- Document number counters (document_number_service). One row per scope
+-- (e.g. 'QUOTE') and period (Argentina-local day), incremented with
+-- INSERT ... ON CONFLICT DO UPDATE ... RETURNING: the row lock serializes
+-- concurrent allocations and a rolled back document releases its number.
+CREATE TABLE IF NOT EXISTS document_sequence (
+  scope      VARCHAR(32) NOT NULL,
+  period     DATE NOT NULL,
+  last_value BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (scope, period)
+);
+
+
+-- =========================
+-- QUOTE LIST INDEXES
+-- =========================
+-- Quote list: keyset pagination (issued_at DESC, id DESC) and live search
+-- (ILIKE '%q%' on number / customer / phone) without scanning quote.
+-- NOTE: Expressions must match quote_service.build_quote_search_filter exactly
+CREATE INDEX IF NOT EXISTS idx_quote_issued_id ON quote(issued_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_quote_number_trgm
+    ON quote USING gin (lower(quote_number) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_quote_customer_name_trgm
+    ON quote USING gin (lower(f_unaccent(customer_name)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_quote_customer_phone_trgm
+    ON quote USING gin (lower(customer_phone) gin_trgm_ops);
+
+
+-- =========================
+-- STOCK STATUS (OUT / LOW / OK)
+-- =========================
+-- Status of each product's stock, kept on product_stock so the catalog
+-- "Sin stock" / "Poco stock" filters and the reorder report read a partial
+-- index instead of comparing on_hand_qty with product.min_stock_qty row by row.
+-- Same rules as the catalog filters:
+--   OUT: on_hand_qty <= 0
+--   LOW: 0 < on_hand_qty <= min_stock_qty (only when min_stock_qty > 0)
+--   OK:  everything else
+ALTER TABLE product_stock
+  ADD COLUMN IF NOT EXISTS stock_status VARCHAR(3) NOT NULL DEFAULT 'OUT'
+  CHECK (stock_status IN ('OUT', 'LOW', 'OK'));
+
+CREATE OR REPLACE FUNCTION stock_status_of(p_on_hand NUMERIC, p_min NUMERIC)
+RETURNS VARCHAR AS $$
+  SELECT CASE
+    WHEN COALESCE(p_on_hand, 0) <= 0 THEN 'OUT'
+    WHEN COALESCE(p_min, 0) > 0 AND p_on_hand <= p_min THEN 'LOW'
+    ELSE 'OK'
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Every write to product_stock (apply_stock_delta, product_init_stock)
+-- recomputes the status
+CREATE OR REPLACE FUNCTION trg_product_stock_status()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.stock_status := stock_status_of(
+    NEW.on_hand_qty,
+    (SELECT min_stock_qty FROM product WHERE id = NEW.product_id)
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_stock_status ON product_stock;
+CREATE TRIGGER product_stock_status
+BEFORE INSERT OR UPDATE OF on_hand_qty, stock_status ON product_stock
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_stock_status();
+
+-- min_stock_qty edits
+CREATE OR REPLACE FUNCTION trg_product_min_stock_status()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE product_stock
+     SET stock_status = stock_status_of(on_hand_qty, NEW.min_stock_qty)
+   WHERE product_id = NEW.id
+     AND stock_status IS DISTINCT FROM stock_status_of(on_hand_qty, NEW.min_stock_qty);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_min_stock_status ON product;
+CREATE TRIGGER product_min_stock_status
+AFTER UPDATE OF min_stock_qty ON product
+FOR EACH ROW
+WHEN (OLD.min_stock_qty IS DISTINCT FROM NEW.min_stock_qty)
+EXECUTE FUNCTION trg_product_min_stock_status();
+
+-- Only the small OUT / LOW sets are indexed (OK is most of the catalog)
+CREATE INDEX IF NOT EXISTS idx_product_stock_out ON product_stock(product_id) WHERE stock_status = 'OUT';
+CREATE INDEX IF NOT EXISTS idx_product_stock_low ON product_stock(product_id) WHERE stock_status = 'LOW';
+
+
+-- =========================
+-- REORDER SUGGESTIONS (sales velocity)
+-- =========================
+-- Reorder suggestions precomputed nightly by `flask compute-reorder`
+-- (reorder_service.compute_reorder_suggestions). The table is rebuilt in
+-- one INSERT ... SELECT; it only holds products with suggested_qty > 0.
+--   daily_velocity = max(sold in short window / short days,
+--                        sold in long window / long days)   (net sale moves:
+--                                                       OUT minus voided IN)
+--   days_of_cover  = on_hand_qty / daily_velocity
+--   suggested_qty  = max(velocity * (lead time + cover days) - on_hand_qty,
+--                        min_stock_qty - on_hand_qty), rounded up
+-- supplier_id / last_unit_cost come from the latest purchase_invoice_line.
+CREATE TABLE IF NOT EXISTS reorder_suggestion (
+  product_id         BIGINT PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE,
+  supplier_id        BIGINT NULL REFERENCES supplier(id) ON DELETE SET NULL,
+  on_hand_qty        NUMERIC(12,3) NOT NULL,
+  min_stock_qty      NUMERIC(12,3) NOT NULL DEFAULT 0,
+  sold_short_qty     NUMERIC(14,3) NOT NULL DEFAULT 0,
+  sold_long_qty      NUMERIC(14,3) NOT NULL DEFAULT 0,
+  daily_velocity     NUMERIC(14,4) NOT NULL DEFAULT 0,
+  days_of_cover      NUMERIC(10,1) NULL,
+  suggested_qty      NUMERIC(12,3) NOT NULL CHECK (suggested_qty > 0),
+  last_unit_cost     NUMERIC(14,2) NULL,
+  last_purchase_date DATE NULL,
+  computed_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reorder_suggestion_supplier ON reorder_suggestion(supplier_id);
+
+-- =========================
+-- BULK PRICE UPDATES / PRICE HISTORY
+-- =========================
+-- One bulk repricing: the rule applied and the products it selected
+CREATE TABLE IF NOT EXISTS price_update (
+  id            BIGSERIAL PRIMARY KEY,
+  rule          VARCHAR(10) NOT NULL CHECK (rule IN ('PERCENT', 'MARKUP')),
+  value         NUMERIC(8,2) NOT NULL,
+  rounding_step NUMERIC(10,2) NOT NULL DEFAULT 0.01 CHECK (rounding_step > 0),
+  round_up      BOOLEAN NOT NULL DEFAULT false,
+  filters       TEXT NULL,
+  item_count    INTEGER NOT NULL DEFAULT 0,
+  preview_token VARCHAR(32) NULL UNIQUE,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Old and new sale price of each product_uom_price row changed by a
+-- price_update (price_update_id NULL is reserved for other sources)
+CREATE TABLE IF NOT EXISTS price_history (
+  id              BIGSERIAL PRIMARY KEY,
+  price_update_id BIGINT NULL REFERENCES price_update(id) ON DELETE CASCADE,
+  product_id      BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  uom_id          BIGINT NOT NULL REFERENCES uom(id),
+  old_price       NUMERIC(12,2) NOT NULL,
+  new_price       NUMERIC(12,2) NOT NULL,
+  changed_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_price_history_update ON price_history(price_update_id);
+CREATE INDEX IF NOT EXISTS idx_price_history_product ON price_history(product_id, changed_at DESC);
+
 COMMIT;
 
 -- DATA MIGRATIONS / SEEDS (NO INCLUIDAS EN SCHEMA BASE)
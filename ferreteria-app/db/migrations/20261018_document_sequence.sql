@@ -0,0 +1,31 @@
+-- Migration: Per-day document number counters
+-- generate_quote_number counted today's quotes (COUNT(*) scan) and used
+-- count + 1, so two concurrent quotes could get the same sequence.
+
+BEGIN;
+
+-- Document number counters (document_number_service). One row per scope
+-- (e.g. 'QUOTE') and period (Argentina-local day), incremented with
+-- INSERT ... ON CONFLICT DO UPDATE ... RETURNING: the row lock serializes
+-- concurrent allocations and a rolled back document releases its number.
+CREATE TABLE IF NOT EXISTS document_sequence (
+  scope      VARCHAR(32) NOT NULL,
+  period     DATE NOT NULL,
+  last_value BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (scope, period)
+);
+
+-- Continue today's quote sequence from the quotes already created
+INSERT INTO document_sequence(scope, period, last_value)
+SELECT 'QUOTE',
+       (now() AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+       COUNT(*)
+  FROM quote
+ WHERE (created_at AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+       = (now() AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+ON CONFLICT (scope, period) DO NOTHING;
+
+COMMIT;
+
+-- Para revertir:
+-- DROP TABLE IF EXISTS document_sequence;
@@ -0,0 +1,235 @@
+-- Migration: Incremental inventory valuation
+-- get_inventory_valuation joined product_stock x product_uom_price x product
+-- and summed the whole catalog on every /balance render. The valuation is now
+-- kept per product (product_valuation) and per category (inventory_valuation)
+-- by triggers on product_stock (stock moves), product_uom_price (base price
+-- changes from create_or_update_uom_prices), purchase_invoice_line (latest
+-- unit cost) and product (active / category / delete). Each change only
+-- recomputes the affected product.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS product_valuation (
+  product_id  BIGINT PRIMARY KEY,
+  category_id BIGINT,
+  on_hand_qty NUMERIC(12,3) NOT NULL DEFAULT 0,
+  sale_price  NUMERIC(12,2),
+  unit_cost   NUMERIC(14,2),
+  sale_value  NUMERIC NOT NULL DEFAULT 0,
+  cost_value  NUMERIC NOT NULL DEFAULT 0,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS inventory_valuation (
+  category_key BIGINT PRIMARY KEY,
+  sale_value   NUMERIC NOT NULL DEFAULT 0,
+  cost_value   NUMERIC NOT NULL DEFAULT 0,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Latest purchase cost per product (ORDER BY id DESC LIMIT 1)
+CREATE INDEX IF NOT EXISTS idx_invoice_line_product_latest ON purchase_invoice_line(product_id, id DESC);
+
+CREATE OR REPLACE FUNCTION apply_inventory_valuation_delta(
+  p_category_id BIGINT, p_sale_value NUMERIC, p_cost_value NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+  IF p_sale_value = 0 AND p_cost_value = 0 THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  VALUES (COALESCE(p_category_id, 0), p_sale_value, p_cost_value, now())
+  ON CONFLICT (category_key) DO UPDATE
+    SET sale_value = inventory_valuation.sale_value + EXCLUDED.sale_value,
+        cost_value = inventory_valuation.cost_value + EXCLUDED.cost_value,
+        updated_at = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Recompute one product's contribution and apply the difference to the totals
+CREATE OR REPLACE FUNCTION refresh_product_valuation(p_product_id BIGINT)
+RETURNS VOID AS $$
+DECLARE
+  v_old       product_valuation%ROWTYPE;
+  v_has_old   BOOLEAN;
+  v_category  BIGINT;
+  v_active    BOOLEAN;
+  v_qty       NUMERIC;
+  v_price     NUMERIC;
+  v_cost      NUMERIC;
+  v_sale_val  NUMERIC := 0;
+  v_cost_val  NUMERIC := 0;
+BEGIN
+  SELECT * INTO v_old FROM product_valuation WHERE product_id = p_product_id FOR UPDATE;
+  v_has_old := FOUND;
+
+  SELECT category_id, active INTO v_category, v_active FROM product WHERE id = p_product_id;
+
+  IF NOT FOUND THEN
+    -- Product deleted: remove its contribution
+    IF v_has_old THEN
+      PERFORM apply_inventory_valuation_delta(v_old.category_id, -v_old.sale_value, -v_old.cost_value);
+      DELETE FROM product_valuation WHERE product_id = p_product_id;
+    END IF;
+    RETURN;
+  END IF;
+
+  SELECT on_hand_qty INTO v_qty FROM product_stock WHERE product_id = p_product_id;
+  SELECT sale_price INTO v_price FROM product_uom_price
+   WHERE product_id = p_product_id AND is_base = true LIMIT 1;
+  SELECT unit_cost INTO v_cost FROM purchase_invoice_line
+   WHERE product_id = p_product_id ORDER BY id DESC LIMIT 1;
+
+  v_qty := COALESCE(v_qty, 0);
+
+  IF v_active AND v_qty > 0 THEN
+    v_sale_val := v_qty * COALESCE(v_price, 0);
+    v_cost_val := v_qty * COALESCE(v_cost, 0);
+  END IF;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  VALUES (p_product_id, v_category, v_qty, v_price, v_cost, v_sale_val, v_cost_val, now())
+  ON CONFLICT (product_id) DO UPDATE
+    SET category_id = EXCLUDED.category_id,
+        on_hand_qty = EXCLUDED.on_hand_qty,
+        sale_price  = EXCLUDED.sale_price,
+        unit_cost   = EXCLUDED.unit_cost,
+        sale_value  = EXCLUDED.sale_value,
+        cost_value  = EXCLUDED.cost_value,
+        updated_at  = now();
+
+  IF v_has_old THEN
+    PERFORM apply_inventory_valuation_delta(v_old.category_id, -v_old.sale_value, -v_old.cost_value);
+  END IF;
+  PERFORM apply_inventory_valuation_delta(v_category, v_sale_val, v_cost_val);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Stock changes (apply_stock_delta from stock_move_line triggers)
+CREATE OR REPLACE FUNCTION trg_product_stock_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  PERFORM refresh_product_valuation(NEW.product_id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_stock_valuation ON product_stock;
+CREATE TRIGGER product_stock_valuation
+AFTER INSERT OR UPDATE OF on_hand_qty ON product_stock
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_stock_valuation();
+
+-- Base price changes (product_uom_service.create_or_update_uom_prices)
+-- and latest purchase cost (purchase_invoice_line)
+CREATE OR REPLACE FUNCTION trg_product_ref_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM refresh_product_valuation(OLD.product_id);
+    RETURN OLD;
+  END IF;
+
+  IF TG_OP = 'UPDATE' AND OLD.product_id <> NEW.product_id THEN
+    PERFORM refresh_product_valuation(OLD.product_id);
+  END IF;
+  PERFORM refresh_product_valuation(NEW.product_id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_uom_price_valuation ON product_uom_price;
+CREATE TRIGGER product_uom_price_valuation
+AFTER INSERT OR UPDATE OF sale_price, is_base, product_id OR DELETE ON product_uom_price
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_ref_valuation();
+
+DROP TRIGGER IF EXISTS purchase_invoice_line_valuation ON purchase_invoice_line;
+CREATE TRIGGER purchase_invoice_line_valuation
+AFTER INSERT OR UPDATE OF unit_cost, product_id OR DELETE ON purchase_invoice_line
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_ref_valuation();
+
+-- Product activation / category changes / deletion
+CREATE OR REPLACE FUNCTION trg_product_valuation()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'DELETE' THEN
+    PERFORM refresh_product_valuation(OLD.id);
+    RETURN OLD;
+  END IF;
+
+  PERFORM refresh_product_valuation(NEW.id);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_valuation_refresh ON product;
+CREATE TRIGGER product_valuation_refresh
+AFTER UPDATE OF active, category_id OR DELETE ON product
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_valuation();
+
+-- Full rebuild (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_inventory_valuation()
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM product_valuation;
+  DELETE FROM inventory_valuation;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  SELECT p.id,
+         p.category_id,
+         COALESCE(ps.on_hand_qty, 0),
+         up.sale_price,
+         lc.unit_cost,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(up.sale_price, 0) ELSE 0 END,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(lc.unit_cost, 0) ELSE 0 END,
+         now()
+    FROM product p
+    LEFT JOIN product_stock ps ON ps.product_id = p.id
+    LEFT JOIN LATERAL (
+      SELECT pup.sale_price FROM product_uom_price pup
+       WHERE pup.product_id = p.id AND pup.is_base = true LIMIT 1
+    ) up ON true
+    LEFT JOIN LATERAL (
+      SELECT pil.unit_cost FROM purchase_invoice_line pil
+       WHERE pil.product_id = p.id ORDER BY pil.id DESC LIMIT 1
+    ) lc ON true;
+
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  SELECT COALESCE(category_id, 0), SUM(sale_value), SUM(cost_value), now()
+    FROM product_valuation
+   GROUP BY COALESCE(category_id, 0);
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_inventory_valuation();
+
+COMMIT;
+
+-- Verificación (debe devolver el mismo valor que inventory_valuation):
+-- SELECT SUM(ps.on_hand_qty * up.sale_price)
+--   FROM product_stock ps
+--   JOIN product_uom_price up ON up.product_id = ps.product_id AND up.is_base = true
+--   JOIN product p ON p.id = ps.product_id
+--  WHERE ps.on_hand_qty > 0 AND p.active = true;
+-- SELECT SUM(sale_value) FROM inventory_valuation;
+--
+-- Para revertir:
+-- DROP TRIGGER IF EXISTS product_stock_valuation ON product_stock;
+-- DROP TRIGGER IF EXISTS product_uom_price_valuation ON product_uom_price;
+-- DROP TRIGGER IF EXISTS purchase_invoice_line_valuation ON purchase_invoice_line;
+-- DROP TRIGGER IF EXISTS product_valuation_refresh ON product;
+-- DROP FUNCTION IF EXISTS trg_product_stock_valuation(), trg_product_ref_valuation(),
+--                         trg_product_valuation(), refresh_product_valuation(BIGINT),
+--                         apply_inventory_valuation_delta(BIGINT, NUMERIC, NUMERIC),
+--                         rebuild_inventory_valuation();
+-- DROP TABLE IF EXISTS inventory_valuation, product_valuation;
+-- DROP INDEX IF EXISTS idx_invoice_line_product_latest;
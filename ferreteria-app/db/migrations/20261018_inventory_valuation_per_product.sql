@@ -0,0 +1,106 @@
+-- Migration: Inventory valuation kept per product only
+-- 20261018_inventory_valuation.sql had refresh_product_valuation also upsert
+-- the per-category inventory_valuation row. That trigger runs once per
+-- stock_move_line inside every sale / invoice / adjustment, so checkouts
+-- serialized on the hot category rows and two carts touching categories
+-- A,B and B,A could deadlock. Triggers now maintain only product_valuation;
+-- balance_service sums it (GROUP BY category) when /balance is rendered.
+
+BEGIN;
+
+-- Recompute one product's valuation row. Only that product's row is
+-- written (no shared per-category totals): concurrent sales touching the
+-- same categories in different order neither serialize nor deadlock here.
+CREATE OR REPLACE FUNCTION refresh_product_valuation(p_product_id BIGINT)
+RETURNS VOID AS $$
+DECLARE
+  v_category  BIGINT;
+  v_active    BOOLEAN;
+  v_qty       NUMERIC;
+  v_price     NUMERIC;
+  v_cost      NUMERIC;
+  v_sale_val  NUMERIC := 0;
+  v_cost_val  NUMERIC := 0;
+BEGIN
+  SELECT category_id, active INTO v_category, v_active FROM product WHERE id = p_product_id;
+
+  IF NOT FOUND THEN
+    -- Product deleted: remove its row
+    DELETE FROM product_valuation WHERE product_id = p_product_id;
+    RETURN;
+  END IF;
+
+  SELECT on_hand_qty INTO v_qty FROM product_stock WHERE product_id = p_product_id;
+  SELECT sale_price INTO v_price FROM product_uom_price
+   WHERE product_id = p_product_id AND is_base = true LIMIT 1;
+  SELECT unit_cost INTO v_cost FROM purchase_invoice_line
+   WHERE product_id = p_product_id ORDER BY id DESC LIMIT 1;
+
+  v_qty := COALESCE(v_qty, 0);
+
+  IF v_active AND v_qty > 0 THEN
+    v_sale_val := v_qty * COALESCE(v_price, 0);
+    v_cost_val := v_qty * COALESCE(v_cost, 0);
+  END IF;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  VALUES (p_product_id, v_category, v_qty, v_price, v_cost, v_sale_val, v_cost_val, now())
+  ON CONFLICT (product_id) DO UPDATE
+    SET category_id = EXCLUDED.category_id,
+        on_hand_qty = EXCLUDED.on_hand_qty,
+        sale_price  = EXCLUDED.sale_price,
+        unit_cost   = EXCLUDED.unit_cost,
+        sale_value  = EXCLUDED.sale_value,
+        cost_value  = EXCLUDED.cost_value,
+        updated_at  = now();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Full rebuild (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_inventory_valuation()
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM product_valuation;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  SELECT p.id,
+         p.category_id,
+         COALESCE(ps.on_hand_qty, 0),
+         up.sale_price,
+         lc.unit_cost,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(up.sale_price, 0) ELSE 0 END,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(lc.unit_cost, 0) ELSE 0 END,
+         now()
+    FROM product p
+    LEFT JOIN product_stock ps ON ps.product_id = p.id
+    LEFT JOIN LATERAL (
+      SELECT pup.sale_price FROM product_uom_price pup
+       WHERE pup.product_id = p.id AND pup.is_base = true LIMIT 1
+    ) up ON true
+    LEFT JOIN LATERAL (
+      SELECT pil.unit_cost FROM purchase_invoice_line pil
+       WHERE pil.product_id = p.id ORDER BY pil.id DESC LIMIT 1
+    ) lc ON true;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP FUNCTION IF EXISTS apply_inventory_valuation_delta(BIGINT, NUMERIC, NUMERIC);
+DROP TABLE IF EXISTS inventory_valuation;
+
+SELECT rebuild_inventory_valuation();
+
+COMMIT;
+
+-- Verificación:
+-- SELECT SUM(ps.on_hand_qty * up.sale_price)
+--   FROM product_stock ps
+--   JOIN product_uom_price up ON up.product_id = ps.product_id AND up.is_base = true
+--   JOIN product p ON p.id = ps.product_id
+--  WHERE ps.on_hand_qty > 0 AND p.active = true;
+-- SELECT SUM(sale_value) FROM product_valuation;
+--
+-- Para revertir: volver a ejecutar 20261018_inventory_valuation.sql
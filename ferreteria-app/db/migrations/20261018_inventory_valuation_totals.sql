@@ -0,0 +1,195 @@
+-- Migration: Per-category inventory totals without hot rows
+-- 20261018_inventory_valuation_per_product.sql removed the per-category
+-- totals (the trigger upserted them once per stock_move_line, so checkouts
+-- serialized and could deadlock), leaving /balance to SUM product_valuation.
+-- Totals are maintained again, without contention:
+-- - the valuation trigger appends per-category deltas to the insert-only
+--   inventory_valuation_delta table
+-- - fold_inventory_valuation() applies them to inventory_valuation, one fold
+--   at a time, in category order (called before /balance reads the totals)
+
+BEGIN;
+
+-- Inventory value per category (category_key 0 = sin categoría), folded
+-- from inventory_valuation_delta by fold_inventory_valuation()
+CREATE TABLE IF NOT EXISTS inventory_valuation (
+  category_key BIGINT PRIMARY KEY,
+  sale_value   NUMERIC NOT NULL DEFAULT 0,
+  cost_value   NUMERIC NOT NULL DEFAULT 0,
+  updated_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Pending changes of the per-category totals. Insert-only from the
+-- valuation trigger: sales append rows and never update a shared row, so
+-- they neither serialize nor deadlock on hot categories.
+CREATE TABLE IF NOT EXISTS inventory_valuation_delta (
+  id           BIGSERIAL PRIMARY KEY,
+  category_key BIGINT NOT NULL,
+  sale_value   NUMERIC NOT NULL,
+  cost_value   NUMERIC NOT NULL,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Recompute one product's valuation row and append the change of its
+-- category totals to inventory_valuation_delta (no shared row is updated)
+CREATE OR REPLACE FUNCTION refresh_product_valuation(p_product_id BIGINT)
+RETURNS VOID AS $$
+DECLARE
+  v_old       product_valuation%ROWTYPE;
+  v_has_old   BOOLEAN;
+  v_category  BIGINT;
+  v_active    BOOLEAN;
+  v_qty       NUMERIC;
+  v_price     NUMERIC;
+  v_cost      NUMERIC;
+  v_sale_val  NUMERIC := 0;
+  v_cost_val  NUMERIC := 0;
+BEGIN
+  SELECT * INTO v_old FROM product_valuation WHERE product_id = p_product_id FOR UPDATE;
+  v_has_old := FOUND;
+
+  SELECT category_id, active INTO v_category, v_active FROM product WHERE id = p_product_id;
+
+  IF NOT FOUND THEN
+    -- Product deleted: remove its row and its contribution
+    IF v_has_old THEN
+      DELETE FROM product_valuation WHERE product_id = p_product_id;
+      IF v_old.sale_value <> 0 OR v_old.cost_value <> 0 THEN
+        INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+        VALUES (COALESCE(v_old.category_id, 0), -v_old.sale_value, -v_old.cost_value);
+      END IF;
+    END IF;
+    RETURN;
+  END IF;
+
+  SELECT on_hand_qty INTO v_qty FROM product_stock WHERE product_id = p_product_id;
+  SELECT sale_price INTO v_price FROM product_uom_price
+   WHERE product_id = p_product_id AND is_base = true LIMIT 1;
+  SELECT unit_cost INTO v_cost FROM purchase_invoice_line
+   WHERE product_id = p_product_id ORDER BY id DESC LIMIT 1;
+
+  v_qty := COALESCE(v_qty, 0);
+
+  IF v_active AND v_qty > 0 THEN
+    v_sale_val := v_qty * COALESCE(v_price, 0);
+    v_cost_val := v_qty * COALESCE(v_cost, 0);
+  END IF;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  VALUES (p_product_id, v_category, v_qty, v_price, v_cost, v_sale_val, v_cost_val, now())
+  ON CONFLICT (product_id) DO UPDATE
+    SET category_id = EXCLUDED.category_id,
+        on_hand_qty = EXCLUDED.on_hand_qty,
+        sale_price  = EXCLUDED.sale_price,
+        unit_cost   = EXCLUDED.unit_cost,
+        sale_value  = EXCLUDED.sale_value,
+        cost_value  = EXCLUDED.cost_value,
+        updated_at  = now();
+
+  IF v_has_old AND COALESCE(v_old.category_id, 0) = COALESCE(v_category, 0) THEN
+    -- Same category: one row with the difference (none if unchanged)
+    IF v_sale_val <> v_old.sale_value OR v_cost_val <> v_old.cost_value THEN
+      INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+      VALUES (COALESCE(v_category, 0), v_sale_val - v_old.sale_value, v_cost_val - v_old.cost_value);
+    END IF;
+    RETURN;
+  END IF;
+
+  IF v_has_old AND (v_old.sale_value <> 0 OR v_old.cost_value <> 0) THEN
+    INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+    VALUES (COALESCE(v_old.category_id, 0), -v_old.sale_value, -v_old.cost_value);
+  END IF;
+  IF v_sale_val <> 0 OR v_cost_val <> 0 THEN
+    INSERT INTO inventory_valuation_delta(category_key, sale_value, cost_value)
+    VALUES (COALESCE(v_category, 0), v_sale_val, v_cost_val);
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply the pending deltas to inventory_valuation. Only one fold runs at a
+-- time (advisory lock; a concurrent caller returns -1 and just reads the
+-- deltas), and category rows are written in category_key order. Deltas of
+-- transactions not yet committed are not visible and stay for the next fold.
+CREATE OR REPLACE FUNCTION fold_inventory_valuation()
+RETURNS INTEGER AS $$
+DECLARE
+  v_folded INTEGER;
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('inventory_valuation')) THEN
+    RETURN -1;
+  END IF;
+
+  WITH moved AS (
+    DELETE FROM inventory_valuation_delta
+    RETURNING category_key, sale_value, cost_value
+  )
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  SELECT category_key, SUM(sale_value), SUM(cost_value), now()
+    FROM moved
+   GROUP BY category_key
+   ORDER BY category_key
+  ON CONFLICT (category_key) DO UPDATE
+    SET sale_value = inventory_valuation.sale_value + EXCLUDED.sale_value,
+        cost_value = inventory_valuation.cost_value + EXCLUDED.cost_value,
+        updated_at = now();
+
+  GET DIAGNOSTICS v_folded = ROW_COUNT;
+  RETURN v_folded;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Full rebuild (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_inventory_valuation()
+RETURNS VOID AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('inventory_valuation'));
+
+  DELETE FROM product_valuation;
+  DELETE FROM inventory_valuation_delta;
+  DELETE FROM inventory_valuation;
+
+  INSERT INTO product_valuation(product_id, category_id, on_hand_qty, sale_price, unit_cost,
+                                sale_value, cost_value, updated_at)
+  SELECT p.id,
+         p.category_id,
+         COALESCE(ps.on_hand_qty, 0),
+         up.sale_price,
+         lc.unit_cost,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(up.sale_price, 0) ELSE 0 END,
+         CASE WHEN p.active AND COALESCE(ps.on_hand_qty, 0) > 0
+              THEN ps.on_hand_qty * COALESCE(lc.unit_cost, 0) ELSE 0 END,
+         now()
+    FROM product p
+    LEFT JOIN product_stock ps ON ps.product_id = p.id
+    LEFT JOIN LATERAL (
+      SELECT pup.sale_price FROM product_uom_price pup
+       WHERE pup.product_id = p.id AND pup.is_base = true LIMIT 1
+    ) up ON true
+    LEFT JOIN LATERAL (
+      SELECT pil.unit_cost FROM purchase_invoice_line pil
+       WHERE pil.product_id = p.id ORDER BY pil.id DESC LIMIT 1
+    ) lc ON true;
+
+  INSERT INTO inventory_valuation(category_key, sale_value, cost_value, updated_at)
+  SELECT COALESCE(category_id, 0), SUM(sale_value), SUM(cost_value), now()
+    FROM product_valuation
+   GROUP BY COALESCE(category_id, 0)
+   ORDER BY 1;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_inventory_valuation();
+
+COMMIT;
+
+-- Verificación (deben coincidir):
+-- SELECT SUM(sale_value), SUM(cost_value) FROM product_valuation;
+-- SELECT fold_inventory_valuation();
+-- SELECT SUM(sale_value), SUM(cost_value) FROM inventory_valuation;
+--
+-- Para revertir: volver a ejecutar 20261018_inventory_valuation_per_product.sql
+-- y luego:
+-- DROP FUNCTION IF EXISTS fold_inventory_valuation();
+-- DROP TABLE IF EXISTS inventory_valuation_delta, inventory_valuation;
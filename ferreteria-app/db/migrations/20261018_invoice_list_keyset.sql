@@ -0,0 +1,12 @@
+-- Migration: Keyset pagination for the invoice list
+-- list_invoices pages with ORDER BY invoice_date DESC, id DESC and a
+-- (invoice_date, id) < (cursor) row comparison; this index serves both.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_invoice_date_id ON purchase_invoice(invoice_date DESC, id DESC);
+
+COMMIT;
+
+-- Para revertir:
+-- DROP INDEX IF EXISTS idx_invoice_date_id;
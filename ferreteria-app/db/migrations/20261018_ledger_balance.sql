@@ -0,0 +1,96 @@
+-- Migration: Running ledger balance per payment method
+-- get_current_total_balance ran two full-table SUMs over finance_ledger on
+-- every call. ledger_balance keeps income/expense totals per payment method
+-- (one row for CASH = cash drawer, one for TRANSFER), updated by trigger in
+-- the same transaction as every ledger insert, edit and soft delete, so the
+-- current balance is a two-row read.
+--
+-- Drift check: flask verify-ledger-balance (add --fix to rebuild).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ledger_balance (
+  payment_method VARCHAR(20) PRIMARY KEY,
+  income_total   NUMERIC(14,2) NOT NULL DEFAULT 0,
+  expense_total  NUMERIC(14,2) NOT NULL DEFAULT 0,
+  updated_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO ledger_balance(payment_method) VALUES ('CASH'), ('TRANSFER')
+ON CONFLICT (payment_method) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION apply_ledger_balance_delta(
+  p_payment_method VARCHAR, p_type ledger_type, p_amount NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO ledger_balance(payment_method, income_total, expense_total, updated_at)
+  VALUES (
+    p_payment_method,
+    CASE WHEN p_type = 'INCOME' THEN p_amount ELSE 0 END,
+    CASE WHEN p_type = 'EXPENSE' THEN p_amount ELSE 0 END,
+    now()
+  )
+  ON CONFLICT (payment_method) DO UPDATE
+    SET income_total  = ledger_balance.income_total + EXCLUDED.income_total,
+        expense_total = ledger_balance.expense_total + EXCLUDED.expense_total,
+        updated_at    = now();
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_finance_ledger_balance()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+    PERFORM apply_ledger_balance_delta(OLD.payment_method, OLD.type, -OLD.amount);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NEW.deleted_at IS NULL THEN
+      PERFORM apply_ledger_balance_delta(NEW.payment_method, NEW.type, NEW.amount);
+    END IF;
+    RETURN NEW;
+  END IF;
+
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS finance_ledger_balance ON finance_ledger;
+CREATE TRIGGER finance_ledger_balance
+AFTER INSERT OR UPDATE OF type, amount, payment_method, deleted_at OR DELETE ON finance_ledger
+FOR EACH ROW
+EXECUTE FUNCTION trg_finance_ledger_balance();
+
+-- Full rebuild from finance_ledger (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_ledger_balance()
+RETURNS VOID AS $$
+BEGIN
+  UPDATE ledger_balance
+     SET income_total = 0, expense_total = 0, updated_at = now();
+
+  INSERT INTO ledger_balance(payment_method, income_total, expense_total, updated_at)
+  SELECT payment_method,
+         COALESCE(SUM(amount) FILTER (WHERE type = 'INCOME'), 0),
+         COALESCE(SUM(amount) FILTER (WHERE type = 'EXPENSE'), 0),
+         now()
+    FROM finance_ledger
+   WHERE deleted_at IS NULL
+   GROUP BY payment_method
+  ON CONFLICT (payment_method) DO UPDATE
+    SET income_total  = EXCLUDED.income_total,
+        expense_total = EXCLUDED.expense_total,
+        updated_at    = now();
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_ledger_balance();
+
+COMMIT;
+
+-- Para revertir:
+-- DROP TRIGGER IF EXISTS finance_ledger_balance ON finance_ledger;
+-- DROP FUNCTION IF EXISTS trg_finance_ledger_balance(),
+--                         apply_ledger_balance_delta(VARCHAR, ledger_type, NUMERIC),
+--                         rebuild_ledger_balance();
+-- DROP TABLE IF EXISTS ledger_balance;
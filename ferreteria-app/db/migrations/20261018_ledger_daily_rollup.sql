@@ -0,0 +1,99 @@
+-- Migration: Daily ledger rollup for the balance reports
+-- get_balance_series / get_available_years / get_available_months grouped the
+-- raw finance_ledger rows by timezone('America/Argentina/Buenos_Aires', datetime)
+-- on every /balance load, which cannot use idx_ledger_datetime. They now read
+-- ledger_daily_rollup, so yearly views cost O(days) instead of O(ledger rows).
+-- The trigger keeps it current for every writer (sales, payments, voids,
+-- adjustments, manual entries), including soft deletes.
+
+BEGIN;
+
+-- Daily ledger rollup (balance reports): one row per Argentina-local day,
+-- ledger type and payment method, maintained by trigger on finance_ledger.
+-- Soft-deleted rows (deleted_at IS NOT NULL) are not counted.
+CREATE TABLE IF NOT EXISTS ledger_daily_rollup (
+  local_date     DATE NOT NULL,
+  type           ledger_type NOT NULL,
+  payment_method VARCHAR(20) NOT NULL,
+  amount         NUMERIC(14,2) NOT NULL DEFAULT 0,
+  entry_count    INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (local_date, type, payment_method)
+);
+
+CREATE OR REPLACE FUNCTION apply_ledger_rollup_delta(
+  p_local_date DATE, p_type ledger_type, p_payment_method VARCHAR, p_amount NUMERIC, p_count INTEGER
+)
+RETURNS VOID AS $$
+BEGIN
+  INSERT INTO ledger_daily_rollup(local_date, type, payment_method, amount, entry_count)
+  VALUES (p_local_date, p_type, p_payment_method, p_amount, p_count)
+  ON CONFLICT (local_date, type, payment_method) DO UPDATE
+    SET amount      = ledger_daily_rollup.amount + EXCLUDED.amount,
+        entry_count = ledger_daily_rollup.entry_count + EXCLUDED.entry_count;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_finance_ledger_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.deleted_at IS NULL THEN
+    PERFORM apply_ledger_rollup_delta(
+      (OLD.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+      OLD.type, OLD.payment_method, -OLD.amount, -1
+    );
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    IF NEW.deleted_at IS NULL THEN
+      PERFORM apply_ledger_rollup_delta(
+        (NEW.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+        NEW.type, NEW.payment_method, NEW.amount, 1
+      );
+    END IF;
+    RETURN NEW;
+  END IF;
+
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS finance_ledger_rollup ON finance_ledger;
+CREATE TRIGGER finance_ledger_rollup
+AFTER INSERT OR UPDATE OF datetime, type, amount, payment_method, deleted_at OR DELETE ON finance_ledger
+FOR EACH ROW
+EXECUTE FUNCTION trg_finance_ledger_rollup();
+
+-- Full rebuild from finance_ledger (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_ledger_daily_rollup()
+RETURNS VOID AS $$
+BEGIN
+  DELETE FROM ledger_daily_rollup;
+
+  INSERT INTO ledger_daily_rollup(local_date, type, payment_method, amount, entry_count)
+  SELECT (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+         type, payment_method, SUM(amount), COUNT(*)
+    FROM finance_ledger
+   WHERE deleted_at IS NULL
+   GROUP BY 1, 2, 3;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_ledger_daily_rollup();
+
+COMMIT;
+
+-- Verificación (debe devolver 0 filas):
+-- SELECT r.local_date, r.type, r.payment_method, r.amount, x.amount
+--   FROM ledger_daily_rollup r
+--   FULL JOIN (SELECT (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date AS local_date,
+--                     type, payment_method, SUM(amount) AS amount
+--                FROM finance_ledger WHERE deleted_at IS NULL GROUP BY 1, 2, 3) x
+--   USING (local_date, type, payment_method)
+--  WHERE COALESCE(r.amount, 0) <> COALESCE(x.amount, 0);
+--
+-- Para revertir:
+-- DROP TRIGGER IF EXISTS finance_ledger_rollup ON finance_ledger;
+-- DROP FUNCTION IF EXISTS trg_finance_ledger_rollup(),
+--                         apply_ledger_rollup_delta(DATE, ledger_type, VARCHAR, NUMERIC, INTEGER),
+--                         rebuild_ledger_daily_rollup();
+-- DROP TABLE IF EXISTS ledger_daily_rollup;
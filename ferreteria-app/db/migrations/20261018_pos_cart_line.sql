@@ -0,0 +1,28 @@
+-- Migration: Server-side POS cart (replaces the signed-cookie session cart)
+-- Each line of a cart is one row, keyed by (cart_id, line_key) where
+-- cart_id is a random id kept in the Flask session and line_key is
+-- "<product_id>_<uom_id>" (same key the session cart used).
+-- Quantities and prices stay NUMERIC end to end (no float/str round trips).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS pos_cart_line (
+    cart_id    VARCHAR(64) NOT NULL,
+    line_key   VARCHAR(64) NOT NULL,
+    product_id BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+    uom_id     BIGINT NOT NULL REFERENCES uom(id) ON DELETE CASCADE,
+    qty        NUMERIC(12,3) NOT NULL CHECK (qty > 0),
+    qty_base   NUMERIC(14,4) NOT NULL CHECK (qty_base > 0),
+    unit_price NUMERIC(12,2) NOT NULL CHECK (unit_price >= 0),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (cart_id, line_key)
+);
+
+-- Cleanup of abandoned carts (purge_stale_carts)
+CREATE INDEX IF NOT EXISTS idx_pos_cart_line_updated_at ON pos_cart_line(updated_at);
+
+COMMIT;
+
+-- Para revertir (y volver a CART_STORE=session):
+-- DROP TABLE IF EXISTS pos_cart_line;
@@ -0,0 +1,63 @@
+-- Migration: Bulk price updates with price history
+-- Weekly repricing went through catalog.update_product one product at a
+-- time. price_update_service now previews a rule (percentage or markup over
+-- the last purchase cost) over a selection of products and applies it to
+-- every product_uom_price row in one transaction of set-based statements,
+-- recording old and new prices in price_history.
+
+BEGIN;
+
+-- One bulk repricing: the rule applied and the products it selected
+CREATE TABLE IF NOT EXISTS price_update (
+  id            BIGSERIAL PRIMARY KEY,
+  rule          VARCHAR(10) NOT NULL CHECK (rule IN ('PERCENT', 'MARKUP')),
+  value         NUMERIC(8,2) NOT NULL,
+  rounding_step NUMERIC(10,2) NOT NULL DEFAULT 0.01 CHECK (rounding_step > 0),
+  round_up      BOOLEAN NOT NULL DEFAULT false,
+  filters       TEXT NULL,
+  item_count    INTEGER NOT NULL DEFAULT 0,
+  preview_token VARCHAR(32) NULL UNIQUE,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- One-time token of the applied preview (blocks double-submitted applies);
+-- also added to databases that created price_update without it
+ALTER TABLE price_update ADD COLUMN IF NOT EXISTS preview_token VARCHAR(32) NULL UNIQUE;
+
+-- Old and new sale price of each product_uom_price row changed by a
+-- price_update (price_update_id NULL is reserved for other sources)
+CREATE TABLE IF NOT EXISTS price_history (
+  id              BIGSERIAL PRIMARY KEY,
+  price_update_id BIGINT NULL REFERENCES price_update(id) ON DELETE CASCADE,
+  product_id      BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  uom_id          BIGINT NOT NULL REFERENCES uom(id),
+  old_price       NUMERIC(12,2) NOT NULL,
+  new_price       NUMERIC(12,2) NOT NULL,
+  changed_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_price_history_update ON price_history(price_update_id);
+CREATE INDEX IF NOT EXISTS idx_price_history_product ON price_history(product_id, changed_at DESC);
+
+-- The single-base check only depends on is_base / product_id: do not run
+-- its per-row queries when only sale_price changes (bulk repricing)
+DROP TRIGGER IF EXISTS trg_check_single_base_uom ON product_uom_price;
+CREATE TRIGGER trg_check_single_base_uom
+    BEFORE INSERT OR UPDATE OF is_base, product_id ON product_uom_price
+    FOR EACH ROW
+    EXECUTE FUNCTION check_single_base_uom();
+
+COMMIT;
+
+-- Verificación:
+-- SELECT u.id, u.rule, u.value, u.item_count, count(h.id)
+--   FROM price_update u LEFT JOIN price_history h ON h.price_update_id = u.id
+--  GROUP BY u.id ORDER BY u.id DESC LIMIT 10;
+--
+-- Para revertir:
+-- DROP TABLE IF EXISTS price_history, price_update;
+-- DROP TRIGGER IF EXISTS trg_check_single_base_uom ON product_uom_price;
+-- CREATE TRIGGER trg_check_single_base_uom
+--     BEFORE INSERT OR UPDATE ON product_uom_price
+--     FOR EACH ROW
+--     EXECUTE FUNCTION check_single_base_uom();
@@ -0,0 +1,21 @@
+-- Migration: Catalog list keyset index
+-- list_products paged with OFFSET ordered by product.name; pages are now read
+-- after a (name, id) cursor. The composite index serves that row comparison
+-- and the ORDER BY name, id without a sort, and replaces idx_product_name.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_product_name_id ON product(name, id);
+DROP INDEX IF EXISTS idx_product_name;
+
+COMMIT;
+
+-- Verificación:
+-- EXPLAIN ANALYZE SELECT id FROM product
+--   WHERE (name, id) > ('Martillo', 120)
+--   ORDER BY name, id LIMIT 51;
+-- Debe usar idx_product_name_id (Index Scan, sin Sort).
+--
+-- Para revertir:
+-- CREATE INDEX IF NOT EXISTS idx_product_name ON product(name);
+-- DROP INDEX IF EXISTS idx_product_name_id;
@@ -0,0 +1,169 @@
+-- Migration: Pre-aggregated product sales (top-selling products)
+-- get_top_selling_products used to GROUP BY the whole sale_line x sale history
+-- on every POS page load. These tables are maintained by triggers on
+-- sale_line / sale, so every path that writes sales (confirm_sale, void_sale,
+-- adjust_sale, convert_quote_to_sale) keeps them up to date in the same
+-- transaction, the same way product_stock is maintained from stock_move_line.
+--
+-- Only CONFIRMED sales count. Quantities are in the UOM of the sale line
+-- (same as the previous SUM(sale_line.qty)).
+
+BEGIN;
+
+-- All-time totals per product (POS landing page)
+CREATE TABLE IF NOT EXISTS product_sales_stats (
+    product_id    BIGINT PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE,
+    total_qty     NUMERIC(14,2) NOT NULL DEFAULT 0,
+    total_revenue NUMERIC(14,2) NOT NULL DEFAULT 0,
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_sales_stats_qty ON product_sales_stats(total_qty DESC);
+CREATE INDEX IF NOT EXISTS idx_product_sales_stats_revenue ON product_sales_stats(total_revenue DESC);
+
+-- Per product and Argentina-local day (rolling 7/30/365 day windows)
+CREATE TABLE IF NOT EXISTS product_sales_daily (
+    product_id BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+    sale_date  DATE NOT NULL,
+    qty        NUMERIC(14,2) NOT NULL DEFAULT 0,
+    revenue    NUMERIC(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_id, sale_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_sales_daily_date ON product_sales_daily(sale_date);
+
+-- Apply a delta to both aggregates
+CREATE OR REPLACE FUNCTION apply_product_sales_delta(
+    p_product_id BIGINT, p_sale_date DATE, p_qty NUMERIC, p_revenue NUMERIC
+)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO product_sales_stats(product_id, total_qty, total_revenue, updated_at)
+    VALUES (p_product_id, p_qty, p_revenue, now())
+    ON CONFLICT (product_id) DO UPDATE
+        SET total_qty     = product_sales_stats.total_qty + EXCLUDED.total_qty,
+            total_revenue = product_sales_stats.total_revenue + EXCLUDED.total_revenue,
+            updated_at    = now();
+
+    INSERT INTO product_sales_daily(product_id, sale_date, qty, revenue)
+    VALUES (p_product_id, p_sale_date, p_qty, p_revenue)
+    ON CONFLICT (product_id, sale_date) DO UPDATE
+        SET qty     = product_sales_daily.qty + EXCLUDED.qty,
+            revenue = product_sales_daily.revenue + EXCLUDED.revenue;
+END;
+$$ LANGUAGE plpgsql;
+
+-- sale_line INSERT / UPDATE / DELETE
+CREATE OR REPLACE FUNCTION trg_sale_line_sales_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_status sale_status;
+    v_date   DATE;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        SELECT status, (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+          INTO v_status, v_date
+          FROM sale WHERE id = OLD.sale_id;
+
+        -- Sale already gone (cascade delete): nothing to reverse
+        IF FOUND AND v_status = 'CONFIRMED' THEN
+            PERFORM apply_product_sales_delta(OLD.product_id, v_date, -OLD.qty, -OLD.line_total);
+        END IF;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        SELECT status, (datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date
+          INTO v_status, v_date
+          FROM sale WHERE id = NEW.sale_id;
+
+        IF v_status = 'CONFIRMED' THEN
+            PERFORM apply_product_sales_delta(NEW.product_id, v_date, NEW.qty, NEW.line_total);
+        END IF;
+        RETURN NEW;
+    END IF;
+
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sale_line_sales_stats ON sale_line;
+CREATE TRIGGER sale_line_sales_stats
+AFTER INSERT OR UPDATE OR DELETE ON sale_line
+FOR EACH ROW
+EXECUTE FUNCTION trg_sale_line_sales_stats();
+
+-- sale status change (void: CONFIRMED -> CANCELLED)
+CREATE OR REPLACE FUNCTION trg_sale_status_sales_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_sign NUMERIC;
+    v_date DATE;
+BEGIN
+    IF OLD.status = 'CONFIRMED' AND NEW.status <> 'CONFIRMED' THEN
+        v_sign := -1;
+    ELSIF NEW.status = 'CONFIRMED' AND OLD.status <> 'CONFIRMED' THEN
+        v_sign := 1;
+    ELSE
+        RETURN NEW;
+    END IF;
+
+    v_date := (NEW.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date;
+
+    PERFORM apply_product_sales_delta(sl.product_id, v_date, v_sign * sl.qty, v_sign * sl.line_total)
+       FROM sale_line sl
+      WHERE sl.sale_id = NEW.id;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sale_status_sales_stats ON sale;
+CREATE TRIGGER sale_status_sales_stats
+AFTER UPDATE OF status ON sale
+FOR EACH ROW
+WHEN (OLD.status IS DISTINCT FROM NEW.status)
+EXECUTE FUNCTION trg_sale_status_sales_stats();
+
+-- Full rebuild from sale history (backfill / drift repair)
+CREATE OR REPLACE FUNCTION rebuild_product_sales_stats()
+RETURNS VOID AS $$
+BEGIN
+    DELETE FROM product_sales_daily;
+    DELETE FROM product_sales_stats;
+
+    INSERT INTO product_sales_daily(product_id, sale_date, qty, revenue)
+    SELECT sl.product_id,
+           (s.datetime AT TIME ZONE 'America/Argentina/Buenos_Aires')::date,
+           SUM(sl.qty),
+           SUM(sl.line_total)
+      FROM sale_line sl
+      JOIN sale s ON s.id = sl.sale_id
+     WHERE s.status = 'CONFIRMED'
+     GROUP BY 1, 2;
+
+    INSERT INTO product_sales_stats(product_id, total_qty, total_revenue, updated_at)
+    SELECT product_id, SUM(qty), SUM(revenue), now()
+      FROM product_sales_daily
+     GROUP BY product_id;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_product_sales_stats();
+
+COMMIT;
+
+-- Verificación (debe devolver 0 filas):
+-- SELECT p.product_id, p.total_qty, x.qty
+--   FROM product_sales_stats p
+--   JOIN (SELECT sl.product_id, SUM(sl.qty) AS qty
+--           FROM sale_line sl JOIN sale s ON s.id = sl.sale_id
+--          WHERE s.status = 'CONFIRMED' GROUP BY sl.product_id) x USING (product_id)
+--  WHERE p.total_qty <> x.qty;
+--
+-- Para revertir:
+-- DROP TRIGGER IF EXISTS sale_line_sales_stats ON sale_line;
+-- DROP TRIGGER IF EXISTS sale_status_sales_stats ON sale;
+-- DROP FUNCTION IF EXISTS trg_sale_line_sales_stats(), trg_sale_status_sales_stats(),
+--                         apply_product_sales_delta(BIGINT, DATE, NUMERIC, NUMERIC),
+--                         rebuild_product_sales_stats();
+-- DROP TABLE IF EXISTS product_sales_daily, product_sales_stats;
@@ -0,0 +1,42 @@
+-- Migration: Product search indexes (pg_trgm + unaccent)
+-- Replaces the sequential scan done by LIKE '%q%' on product name/sku/barcode
+-- (POS search and catalog live search) with GIN trigram indexes.
+-- Matching on name is accent-insensitive ("tubería" == "tuberia").
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() is STABLE (it depends on the dictionary search path), so it
+-- cannot be used in an index expression. This wrapper pins the dictionary
+-- and is declared IMMUTABLE so it can.
+CREATE OR REPLACE FUNCTION f_unaccent(text)
+RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent', $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+
+-- Substring search (LIKE '%q%') and similarity ranking
+-- NOTE: Expressions must match app/services/product_search_service.py exactly
+CREATE INDEX IF NOT EXISTS idx_product_name_trgm
+    ON product USING gin (lower(f_unaccent(name)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_sku_trgm
+    ON product USING gin (lower(sku) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_product_barcode_trgm
+    ON product USING gin (lower(barcode) gin_trgm_ops);
+
+-- Exact code lookups (barcode scanner / SKU typed at the counter)
+CREATE INDEX IF NOT EXISTS idx_product_sku_lower ON product (lower(sku));
+CREATE INDEX IF NOT EXISTS idx_product_barcode_lower ON product (lower(barcode));
+
+COMMIT;
+
+-- Verificación:
+-- EXPLAIN ANALYZE SELECT id, name FROM product
+--   WHERE lower(f_unaccent(name)) LIKE '%tuberia%' LIMIT 20;
+-- Debe mostrar "Bitmap Index Scan on idx_product_name_trgm".
+--
+-- Para revertir:
+-- DROP INDEX IF EXISTS idx_product_name_trgm, idx_product_sku_trgm, idx_product_barcode_trgm,
+--                      idx_product_sku_lower, idx_product_barcode_lower;
+-- DROP FUNCTION IF EXISTS f_unaccent(text);
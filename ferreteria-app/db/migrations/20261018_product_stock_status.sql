@@ -0,0 +1,94 @@
+-- Migration: Maintained stock status (OUT / LOW / OK) on product_stock
+-- The catalog stock filters compared coalesce(on_hand_qty, 0) with
+-- coalesce(min_stock_qty, 0) across the product join, which no index can
+-- serve. product_stock.stock_status is now kept by triggers (stock moves and
+-- min_stock_qty edits) and the OUT / LOW sets have partial indexes.
+
+BEGIN;
+
+-- Status of each product's stock, kept on product_stock so the catalog
+-- "Sin stock" / "Poco stock" filters and the reorder report read a partial
+-- index instead of comparing on_hand_qty with product.min_stock_qty row by row.
+-- Same rules as the catalog filters:
+--   OUT: on_hand_qty <= 0
+--   LOW: 0 < on_hand_qty <= min_stock_qty (only when min_stock_qty > 0)
+--   OK:  everything else
+ALTER TABLE product_stock
+  ADD COLUMN IF NOT EXISTS stock_status VARCHAR(3) NOT NULL DEFAULT 'OUT'
+  CHECK (stock_status IN ('OUT', 'LOW', 'OK'));
+
+CREATE OR REPLACE FUNCTION stock_status_of(p_on_hand NUMERIC, p_min NUMERIC)
+RETURNS VARCHAR AS $$
+  SELECT CASE
+    WHEN COALESCE(p_on_hand, 0) <= 0 THEN 'OUT'
+    WHEN COALESCE(p_min, 0) > 0 AND p_on_hand <= p_min THEN 'LOW'
+    ELSE 'OK'
+  END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Every write to product_stock (apply_stock_delta, product_init_stock)
+-- recomputes the status
+CREATE OR REPLACE FUNCTION trg_product_stock_status()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.stock_status := stock_status_of(
+    NEW.on_hand_qty,
+    (SELECT min_stock_qty FROM product WHERE id = NEW.product_id)
+  );
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_stock_status ON product_stock;
+CREATE TRIGGER product_stock_status
+BEFORE INSERT OR UPDATE OF on_hand_qty, stock_status ON product_stock
+FOR EACH ROW
+EXECUTE FUNCTION trg_product_stock_status();
+
+-- min_stock_qty edits
+CREATE OR REPLACE FUNCTION trg_product_min_stock_status()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE product_stock
+     SET stock_status = stock_status_of(on_hand_qty, NEW.min_stock_qty)
+   WHERE product_id = NEW.id
+     AND stock_status IS DISTINCT FROM stock_status_of(on_hand_qty, NEW.min_stock_qty);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS product_min_stock_status ON product;
+CREATE TRIGGER product_min_stock_status
+AFTER UPDATE OF min_stock_qty ON product
+FOR EACH ROW
+WHEN (OLD.min_stock_qty IS DISTINCT FROM NEW.min_stock_qty)
+EXECUTE FUNCTION trg_product_min_stock_status();
+
+-- Only the small OUT / LOW sets are indexed (OK is most of the catalog)
+CREATE INDEX IF NOT EXISTS idx_product_stock_out ON product_stock(product_id) WHERE stock_status = 'OUT';
+CREATE INDEX IF NOT EXISTS idx_product_stock_low ON product_stock(product_id) WHERE stock_status = 'LOW';
+
+-- Backfill: products created before product_init_stock existed, then every status
+INSERT INTO product_stock(product_id, on_hand_qty)
+SELECT p.id, 0 FROM product p
+ON CONFLICT (product_id) DO NOTHING;
+
+UPDATE product_stock ps
+   SET stock_status = stock_status_of(ps.on_hand_qty, p.min_stock_qty)
+  FROM product p
+ WHERE p.id = ps.product_id;
+
+COMMIT;
+
+-- Verificación:
+-- SELECT stock_status, count(*) FROM product_stock GROUP BY stock_status;
+-- EXPLAIN ANALYZE SELECT product_id FROM product_stock WHERE stock_status = 'LOW';
+-- Debe usar idx_product_stock_low.
+--
+-- Para revertir:
+-- DROP TRIGGER IF EXISTS product_min_stock_status ON product;
+-- DROP TRIGGER IF EXISTS product_stock_status ON product_stock;
+-- DROP FUNCTION IF EXISTS trg_product_min_stock_status(), trg_product_stock_status(),
+--                         stock_status_of(NUMERIC, NUMERIC);
+-- DROP INDEX IF EXISTS idx_product_stock_out, idx_product_stock_low;
+-- ALTER TABLE product_stock DROP COLUMN IF EXISTS stock_status;
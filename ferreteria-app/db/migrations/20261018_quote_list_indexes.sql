@@ -0,0 +1,28 @@
+-- Migration: Quote list indexes (keyset pagination + trigram search)
+-- list_quotes loaded every quote and filtered ILIKE '%q%' with a sequential
+-- scan. Requires pg_trgm and f_unaccent (20261018_product_search_trgm.sql).
+
+BEGIN;
+
+-- Quote list: keyset pagination (issued_at DESC, id DESC) and live search
+-- (ILIKE '%q%' on number / customer / phone) without scanning quote.
+-- NOTE: Expressions must match quote_service.build_quote_search_filter exactly
+CREATE INDEX IF NOT EXISTS idx_quote_issued_id ON quote(issued_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_quote_number_trgm
+    ON quote USING gin (lower(quote_number) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_quote_customer_name_trgm
+    ON quote USING gin (lower(f_unaccent(customer_name)) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_quote_customer_phone_trgm
+    ON quote USING gin (lower(customer_phone) gin_trgm_ops);
+
+COMMIT;
+
+-- Verificación:
+-- EXPLAIN ANALYZE SELECT id FROM quote
+--   WHERE lower(f_unaccent(customer_name)) LIKE '%perez%'
+--   ORDER BY issued_at DESC, id DESC LIMIT 51;
+-- Debe usar idx_quote_customer_name_trgm (o idx_quote_issued_id si casi todo coincide).
+--
+-- Para revertir:
+-- DROP INDEX IF EXISTS idx_quote_issued_id, idx_quote_number_trgm,
+--                      idx_quote_customer_name_trgm, idx_quote_customer_phone_trgm;
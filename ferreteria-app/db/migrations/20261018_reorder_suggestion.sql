@@ -0,0 +1,42 @@
+-- Migration: Reorder suggestions (sales velocity)
+-- min_stock_qty is a static threshold. reorder_suggestion holds a purchase
+-- suggestion per product computed from recent sales, rebuilt nightly with
+-- `flask compute-reorder` and read as-is by /products/reorder/suggestions.
+
+BEGIN;
+
+-- Reorder suggestions precomputed nightly by `flask compute-reorder`
+-- (reorder_service.compute_reorder_suggestions). The table is rebuilt in
+-- one INSERT ... SELECT; it only holds products with suggested_qty > 0.
+--   daily_velocity = max(sold in short window / short days,
+--                        sold in long window / long days)   (net sale moves:
+--                                                       OUT minus voided IN)
+--   days_of_cover  = on_hand_qty / daily_velocity
+--   suggested_qty  = max(velocity * (lead time + cover days) - on_hand_qty,
+--                        min_stock_qty - on_hand_qty), rounded up
+-- supplier_id / last_unit_cost come from the latest purchase_invoice_line.
+CREATE TABLE IF NOT EXISTS reorder_suggestion (
+  product_id         BIGINT PRIMARY KEY REFERENCES product(id) ON DELETE CASCADE,
+  supplier_id        BIGINT NULL REFERENCES supplier(id) ON DELETE SET NULL,
+  on_hand_qty        NUMERIC(12,3) NOT NULL,
+  min_stock_qty      NUMERIC(12,3) NOT NULL DEFAULT 0,
+  sold_short_qty     NUMERIC(14,3) NOT NULL DEFAULT 0,
+  sold_long_qty      NUMERIC(14,3) NOT NULL DEFAULT 0,
+  daily_velocity     NUMERIC(14,4) NOT NULL DEFAULT 0,
+  days_of_cover      NUMERIC(10,1) NULL,
+  suggested_qty      NUMERIC(12,3) NOT NULL CHECK (suggested_qty > 0),
+  last_unit_cost     NUMERIC(14,2) NULL,
+  last_purchase_date DATE NULL,
+  computed_at        TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reorder_suggestion_supplier ON reorder_suggestion(supplier_id);
+
+COMMIT;
+
+-- Verificación (después de `flask compute-reorder`):
+-- SELECT supplier_id, count(*), sum(suggested_qty * coalesce(last_unit_cost, 0))
+--   FROM reorder_suggestion GROUP BY supplier_id;
+--
+-- Para revertir:
+-- DROP TABLE IF EXISTS reorder_suggestion;
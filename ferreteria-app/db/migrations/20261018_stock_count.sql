@@ -0,0 +1,36 @@
+-- Migration: Physical inventory (stock count sessions)
+-- The annual count used adjust_stock_to once per product: one stock_move,
+-- lock and commit each, thousands of transactions for ~8k items. Counts are
+-- now entered into a stock_count and applied in one transaction as a single
+-- ADJUST stock_move with many lines (see stock_count_service).
+
+BEGIN;
+
+-- Physical inventory (stock take): counts are collected here and applied
+-- at once as a single ADJUST stock_move (reference_type MANUAL,
+-- reference_id = stock_count.id) with one line per changed product.
+CREATE TABLE IF NOT EXISTS stock_count (
+  id            BIGSERIAL PRIMARY KEY,
+  status        VARCHAR(20) NOT NULL DEFAULT 'OPEN' CHECK (status IN ('OPEN', 'APPLIED', 'CANCELLED')),
+  notes         TEXT NULL,
+  stock_move_id BIGINT NULL REFERENCES stock_move(id) ON DELETE SET NULL,
+  created_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+  applied_at    TIMESTAMPTZ NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_count_status ON stock_count(status);
+
+-- expected_qty is the system stock when the count was applied
+CREATE TABLE IF NOT EXISTS stock_count_line (
+  stock_count_id BIGINT NOT NULL REFERENCES stock_count(id) ON DELETE CASCADE,
+  product_id     BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  counted_qty    NUMERIC(12,3) NOT NULL CHECK (counted_qty >= 0),
+  expected_qty   NUMERIC(12,3) NULL,
+  updated_at     TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (stock_count_id, product_id)
+);
+
+COMMIT;
+
+-- Para revertir:
+-- DROP TABLE IF EXISTS stock_count_line, stock_count;
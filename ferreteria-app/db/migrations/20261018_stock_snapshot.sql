@@ -0,0 +1,34 @@
+-- Migration: Stock snapshots (stock at any past date)
+-- Answering "how much did we have on Dec 31" meant replaying all of
+-- stock_move_line. Snapshots taken periodically (flask snapshot-stock, e.g.
+-- daily from cron) bound the replay to the moves after the latest snapshot.
+
+BEGIN;
+
+-- Periodic stock snapshots for point-in-time stock (stock_history_service).
+-- A snapshot holds the stock resulting from every move dated before taken_at.
+-- Stock at T = latest snapshot taken at or before T + signed stock_move_line
+-- deltas with taken_at <= stock_move.date < T.
+CREATE TABLE IF NOT EXISTS stock_snapshot (
+  id         BIGSERIAL PRIMARY KEY,
+  taken_at   TIMESTAMPTZ NOT NULL UNIQUE,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Only products with non-zero stock are stored
+CREATE TABLE IF NOT EXISTS stock_snapshot_line (
+  snapshot_id BIGINT NOT NULL REFERENCES stock_snapshot(id) ON DELETE CASCADE,
+  product_id  BIGINT NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+  on_hand_qty NUMERIC(12,3) NOT NULL,
+  PRIMARY KEY (snapshot_id, product_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_snapshot_line_product ON stock_snapshot_line(product_id);
+
+COMMIT;
+
+-- Primer snapshot (después de aplicar la migración):
+--   docker compose exec web flask snapshot-stock
+--
+-- Para revertir:
+-- DROP TABLE IF EXISTS stock_snapshot_line, stock_snapshot;
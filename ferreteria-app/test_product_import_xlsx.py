@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Product import: XLSX numeric cells must keep their decimals.
+
+openpyxl returns numeric cells as int/float. They used to be turned into
+text and parsed as AR numbers, where "1523.456" reads as 1.523.456.
+Runs without a database: the import is fed an in-memory XLSX and the
+chunk writer is replaced by a collector.
+"""
+import io
+import os
+import sys
+from decimal import Decimal
+from unittest import mock
+
+# Add app to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.services import product_import_service
+
+MAPS = {'uoms': {'u': 1, 'unidad': 1}, 'categories': {}}
+
+
+def _xlsx(rows):
+    """Build an XLSX file in memory."""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _import(stream, filename):
+    """Run import_products and return the parsed rows by SKU and the result."""
+    parsed = {}
+
+    def collect(session, chunk, maps, result, create_categories):
+        for _, row in chunk:
+            parsed[row['sku']] = row
+
+    with mock.patch.object(product_import_service, '_load_maps', return_value=MAPS), \
+            mock.patch.object(product_import_service, '_import_chunk', side_effect=collect):
+        result = product_import_service.import_products(mock.Mock(), stream, filename)
+    return parsed, result
+
+
+def test_xlsx_numeric_cells():
+    """3-decimal and long-float numeric cells are imported as written."""
+    stream = _xlsx([
+        ['sku', 'nombre', 'unidad', 'precio', 'stock_minimo', 'codigo_barras'],
+        ['A1', 'Tornillo', 'u', 1523.456, 2.5, 7790001234567],
+        ['A2', 'Arandela', 'u', 0.125, 10, None],
+        ['A3', 'Tuerca', 'u', 12.3456789, None, None],
+        ['A4', 'Clavo', 'u', 1500, None, None],
+        ['A5', 'Grampa', 'u', '1.234,56', '3,5', None],
+    ])
+    parsed, result = _import(stream, 'lista.xlsx')
+
+    assert result.errors == [], f"Unexpected errors: {result.errors}"
+    assert parsed['A1']['price'] == Decimal('1523.456'), parsed['A1']['price']
+    assert parsed['A1']['min_stock_qty'] == Decimal('2.5'), parsed['A1']['min_stock_qty']
+    assert parsed['A1']['barcode'] == '7790001234567', parsed['A1']['barcode']
+    assert parsed['A2']['price'] == Decimal('0.125'), parsed['A2']['price']
+    assert parsed['A3']['price'] == Decimal('12.3456789'), parsed['A3']['price']
+    assert parsed['A4']['price'] == Decimal('1500'), parsed['A4']['price']
+    # Text cells keep the AR format
+    assert parsed['A5']['price'] == Decimal('1234.56'), parsed['A5']['price']
+    assert parsed['A5']['min_stock_qty'] == Decimal('3.5'), parsed['A5']['min_stock_qty']
+    print("✅ XLSX numeric cells keep their decimals")
+
+
+def test_csv_ar_format():
+    """CSV cells are text and use the AR format."""
+    stream = io.BytesIO('sku;nombre;unidad;precio\nB1;Cinta;u;1.523,45\nB2;Cable;u;0,125\n'.encode('utf-8'))
+    parsed, result = _import(stream, 'lista.csv')
+
+    assert result.errors == [], f"Unexpected errors: {result.errors}"
+    assert parsed['B1']['price'] == Decimal('1523.45'), parsed['B1']['price']
+    assert parsed['B2']['price'] == Decimal('0.125'), parsed['B2']['price']
+    print("✅ CSV prices use the AR format")
+
+
+def main():
+    print("\n" + "="*60)
+    print("TEST: Product import number parsing (XLSX / CSV)")
+    print("="*60)
+
+    try:
+        test_xlsx_numeric_cells()
+        test_csv_ar_format()
+        print("\n✅ ALL TESTS PASSED\n")
+    except Exception as e:
+        print(f"\n❌ TESTS FAILED: {e}\n")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()